@@ -0,0 +1,136 @@
+import os
+import glob
+import concurrent.futures
+
+import day5_virtual_machine as machine
+
+from compile_cache import write_atomic
+
+
+SOURCE_SUFFIX = '.code'
+OUTPUT_SUFFIX = '.byte'
+
+
+def find_sources(patterns: [str]) -> ([str], [(str, str)]):
+    """
+    The source files of directories (searched recursively) and glob
+    patterns, and the (pattern, error) of the ones that match nothing.
+    """
+
+    sources = set()
+    errors = []
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found = glob.glob(
+                os.path.join(pattern, '**', '*' + SOURCE_SUFFIX),
+                recursive=True
+            )
+        else:
+            found = [i for i in glob.glob(pattern, recursive=True)
+                     if os.path.isfile(i)]
+
+        if not found:
+            errors.append((pattern, 'No source file found'))
+
+        sources.update(os.path.normpath(i) for i in found)
+
+    return sorted(sources), errors
+
+
+def output_paths(sources: [str], output_dir: str = None) -> [str]:
+    """
+    The bytecode file of every source: next to it, or under 'output_dir'
+    at the same path relative to the directory common to all sources.
+    """
+
+    stems = [os.path.splitext(i)[0] for i in sources]
+
+    if output_dir is None:
+        return [i + OUTPUT_SUFFIX for i in stems]
+
+    root = os.path.commonpath(
+        [os.path.dirname(os.path.abspath(i)) for i in sources]
+    )
+
+    return [
+        os.path.join(output_dir, os.path.relpath(os.path.abspath(i), root)) +
+        OUTPUT_SUFFIX
+        for i in stems
+    ]
+
+
+def compile_file(job: tuple) -> str:
+    """
+    Compiles a source file into its bytecode file. Returns the error, if
+    any, instead of raising it, so that one source cannot stop the others.
+    """
+
+    source, output, compile_code, binary, options = job
+
+    try:
+        with open(source, 'r') as f:
+            code = compile_code(f.read(), **options)
+
+        data = machine.encode_bytecode(code) if binary \
+               else '\n'.join(code).encode('utf-8')
+
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        write_atomic(output, data)
+
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+
+    return None
+
+
+def compile_batch(
+        sources: [str],
+        outputs: [str],
+        compile_code,
+        workers: int = None,
+        binary: bool = False,
+        **options
+    ) -> [(str, str)]:
+    """
+    Compiles every source with 'compile_code(source, **options)' into the
+    output at the same index, on a pool of 'workers' processes (one per CPU
+    by default). Returns the (source, error) of the sources that failed.
+    """
+
+    jobs = [
+        (source, output, compile_code, binary, options)
+        for source, output in zip(sources, outputs)
+    ]
+
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        results = list(map(compile_file, jobs))
+
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            # a few chunks per worker, to balance sources of unequal size
+            # without sending them one by one
+            chunk = max(1, len(jobs) // (4 * workers))
+            results = list(pool.map(compile_file, jobs, chunksize=chunk))
+
+    return [
+        (job[0], error) for job, error in zip(jobs, results)
+        if error is not None
+    ]
+
+
+def format_report(total: int, failed: int, errors: [(str, str)]) -> [str]:
+    """
+    The summary of a batch of 'total' sources of which 'failed' could not
+    be compiled, and every (path or pattern, error).
+    """
+
+    lines = [f'{total - failed} of {total} files compiled']
+
+    if errors:
+        lines.append(f'{len(errors)} errors:')
+        lines += [f'  {path}: {error}' for path, error in errors]
+
+    return lines
@@ -0,0 +1,89 @@
+"""
+Memory of the AST of generated programs, the time to hash them (the first
+time, then again once a function is replaced, since the hashes are cached)
+and to compare two parses of them, in order and with their declarations
+shuffled (which Program compares regardless of order).
+
+Usage: python -m benchmarks.ast_nodes [--funcs N ...]
+"""
+
+import random
+import argparse
+import tracemalloc
+
+import day1_lexer as lexer
+import day2_parser as parser
+
+from day2_parser.ast import children, copy_tree
+
+from .common import best_time, print_table, generate_program
+
+
+def parse(code: str):
+    return parser.parse_table_driven(parser.Reader(lexer.lex_stream(code)))
+
+
+def count_nodes(root) -> int:
+    count = 0
+    work = [root]
+
+    while work:
+        count += 1
+        work += children(work.pop())
+
+    return count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '--funcs', type=int, nargs='+', default=[1000, 5000, 20000]
+    )
+    args = arg_parser.parse_args()
+
+    rows = []
+    for count in args.funcs:
+        code = generate_program(count)
+        tokens = lexer.lex_stream(code)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        ast = parser.parse_table_driven(parser.Reader(tokens))
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        nodes = count_nodes(ast)
+        other = parse(code)
+
+        hash_time = best_time(lambda: hash(ast), 1)
+
+        shuffled = parse(code)
+        random.shuffle(shuffled.func_decl)
+
+        equal_time = best_time(lambda: ast == other)
+        shuffled_time = best_time(lambda: ast == shuffled)
+
+        # only the new function and the program are hashed again
+        ast.func_decl[0] = copy_tree(ast.func_decl[0])
+        rehash_time = best_time(lambda: hash(ast), 1)
+
+        rows.append([
+            count,
+            nodes,
+            '%.1f MB' % (size / 2 ** 20),
+            '%.0f B' % (size / nodes),
+            '%.0f ms' % (hash_time * 1000),
+            '%.1f ms' % (rehash_time * 1000),
+            '%.1f ms' % (equal_time * 1000),
+            '%.1f ms' % (shuffled_time * 1000)
+        ])
+
+    print_table(
+        ['functions', 'nodes', 'memory', 'per node', 'hash', 'rehash',
+         'equal', 'equal (shuffled)'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    main()
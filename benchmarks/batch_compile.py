@@ -0,0 +1,61 @@
+"""
+Throughput of the batch compilation of run.py (see batch.py) on a generated
+corpus of source files, by number of worker processes.
+
+Usage: python -m benchmarks.batch_compile [--files N] [--funcs N]
+                                          [--workers N ...]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from batch import find_sources, output_paths, compile_batch
+
+from .common import compile_source, generate_program, print_table
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--files', type=int, default=200)
+    arg_parser.add_argument('--funcs', type=int, default=50)
+    arg_parser.add_argument(
+        '--workers', type=int, nargs='+', default=[1, 2, 4, 8]
+    )
+    args = arg_parser.parse_args()
+
+    print(f'{os.cpu_count()} CPUs')
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.files):
+            with open(os.path.join(tmp, f'{i}.code'), 'w') as f:
+                f.write(generate_program(args.funcs))
+
+        sources, _ = find_sources([tmp])
+        outputs = output_paths(sources, os.path.join(tmp, 'out'))
+        size = sum(os.path.getsize(i) for i in sources)
+
+        base = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            errors = compile_batch(sources, outputs, compile_source, workers)
+            seconds = time.perf_counter() - start
+
+            assert not errors, errors
+            base = base or seconds
+
+            rows.append([
+                workers,
+                '%.2f s' % seconds,
+                '%.0f' % (len(sources) / seconds),
+                '%.2f' % (size / seconds / 2 ** 20),
+                '%.1fx' % (base / seconds)
+            ])
+
+    print_table(['workers', 'time', 'files/s', 'MB/s', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
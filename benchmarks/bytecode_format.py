@@ -0,0 +1,67 @@
+"""
+Compares the file size and load time of the text and binary bytecode formats
+on generated programs with thousands of functions.
+
+Usage: python -m benchmarks.bytecode_format [--funcs N [N ...]]
+"""
+
+import argparse
+import os
+import tempfile
+
+import day5_virtual_machine as machine
+
+from .common import compile_source, generate_program, best_time, print_table
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '--funcs', type=int, nargs='+', default=[1000, 5000, 20000]
+    )
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.funcs:
+            code = compile_source(generate_program(count))
+
+            text_path = os.path.join(tmp, f'{count}.byte')
+            binary_path = os.path.join(tmp, f'{count}.bin')
+
+            with open(text_path, 'w') as f:
+                f.write('\n'.join(code))
+
+            with open(binary_path, 'wb') as f:
+                f.write(machine.encode_bytecode(code))
+
+            sizes = [os.path.getsize(i) for i in (text_path, binary_path)]
+            times = [
+                best_time(
+                    lambda i=i: machine.load_bytecode_file(i), args.repeat
+                )
+                for i in (text_path, binary_path)
+            ]
+
+            rows.append([
+                count,
+                len(code),
+                '%.0f KiB' % (sizes[0] / 1024),
+                '%.0f KiB' % (sizes[1] / 1024),
+                '%.1f ms' % (times[0] * 1000),
+                '%.1f ms' % (times[1] * 1000),
+                '%.1fx' % (times[0] / times[1])
+            ])
+
+    print_table(
+        [
+            'functions', 'lines', 'text size', 'binary size',
+            'text load', 'binary load', 'gain'
+        ],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    main()
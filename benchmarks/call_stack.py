@@ -0,0 +1,107 @@
+"""
+Compares the per-call locals of the reference and decoded engines with the
+single value stack of the flat engine: calls per second on a call heavy
+program, and the peak memory of deep (non-tail) recursion.
+
+Usage: python -m benchmarks.call_stack [--depths N ...]
+"""
+
+import argparse
+import tracemalloc
+
+import day5_virtual_machine as machine
+
+from day5_virtual_machine.byte_loader import read_bytecode
+
+from .common import compile_source, best_time, print_table
+
+
+ENGINES = ['reference', 'decoded', 'flat']
+
+# fib(n) makes 2 * fib(n + 1) - 1 calls
+FIBONACCI = '''
+fib(n) {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+main() {
+    print(fib(%d));
+}
+'''
+
+DEPTH = '''
+depth(n, a, b) {
+    decl c, d;
+    if (n == 0) {
+        return 0;
+    }
+    return depth(n - 1, a, b) + 1;
+}
+
+main() {
+    print(depth(%d, 1, 2));
+}
+'''
+
+
+def fib_calls(n: int) -> int:
+    a, b = 0, 1
+    for _ in range(n + 1):
+        a, b = b, a + b
+
+    return 2 * a - 1
+
+
+def run(file_rep: dict, engine: str):
+    machine.run_file_rep(file_rep, machine.RecordingHandler([]), engine)
+
+
+def peak_memory(file_rep: dict, engine: str) -> int:
+    tracemalloc.start()
+    try:
+        run(file_rep, engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--fib', type=int, default=20)
+    arg_parser.add_argument(
+        '--depths', type=int, nargs='+', default=[1000, 10000, 100000]
+    )
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    file_rep = read_bytecode(compile_source(FIBONACCI % args.fib))
+    calls = fib_calls(args.fib)
+
+    rows = []
+    for engine in ENGINES:
+        seconds = best_time(lambda: run(file_rep, engine), args.repeat)
+        rows.append([engine, calls, '%.0f' % (calls / seconds)])
+
+    print_table(['engine', 'calls', 'calls/s'], rows)
+    print()
+
+    rows = []
+    for depth in args.depths:
+        file_rep = read_bytecode(compile_source(DEPTH % depth))
+
+        row = [depth]
+        for engine in ENGINES:
+            seconds = best_time(lambda: run(file_rep, engine), 1)
+            memory = peak_memory(file_rep, engine)
+            row.append('%.0f ms, %.1f MB' % (seconds * 1000, memory / 2**20))
+
+        rows.append(row)
+
+    print_table(['depth'] + ENGINES, rows)
+
+
+if __name__ == '__main__':
+    main()
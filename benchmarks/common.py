@@ -0,0 +1,137 @@
+import os
+import time
+import collections
+
+import day1_lexer as lexer
+import day2_parser as parser
+import day3_semantic_analysis as semantics
+import day4_code_generation as codegen
+import day5_virtual_machine as machine
+
+from day5_virtual_machine.machine import VirtualMachine, load_code
+
+
+CODE_DIR = 'test_code'
+
+
+def load_test_code(name: str) -> str:
+    return lexer.load_source_file(os.path.join(CODE_DIR, name))
+
+
+def compile_source(code: str, tail_calls: bool = True) -> [str]:
+    """
+    Same pipeline as 'run.py', without importing the command line script.
+    """
+
+    tokens = lexer.lex_stream(code)
+    ast = parser.parse(parser.Reader(tokens))
+    semantics.analysis(ast, tail_calls)
+
+    return codegen.generate(ast)
+
+
+class CountingVirtualMachine(VirtualMachine):
+    """
+    The reference engine, counting the executed instructions and the pairs
+    of consecutively executed instructions.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CountingVirtualMachine, self).__init__(*args, **kwargs)
+        self.count = 0
+        self.pairs = collections.Counter()
+        self.prev = None
+
+    def execute(self):
+        op = self.get_curr_frame().get_code()[0]
+
+        self.count += 1
+        self.pairs[self.prev, op] += 1
+        self.prev = op
+
+        super(CountingVirtualMachine, self).execute()
+
+
+def run_counting(code: [str], inputs: [str]) -> CountingVirtualMachine:
+    glob_var_count, funcs = load_code(code)
+    vm = CountingVirtualMachine(
+        machine.RecordingHandler(inputs), glob_var_count, funcs
+    )
+    vm.run()
+
+    return vm
+
+
+def count_instructions(code: [str], inputs: [str]) -> int:
+    return run_counting(code, inputs).count
+
+
+def best_time(runnable, repeat: int = 3) -> float:
+    """
+    Returns the fastest wall time of several runs, in seconds.
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        runnable()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def print_table(header: [str], rows: [list]):
+    rows = [[str(i) for i in row] for row in rows]
+    widths = [
+        max(len(row[i]) for row in rows + [header])
+        for i in range(len(header))
+    ]
+
+    fmt = '  '.join(f'{{:>{i}}}' for i in widths)
+    print(fmt.format(*header))
+    print(fmt.format(*('-' * i for i in widths)))
+
+    for row in rows:
+        print(fmt.format(*row))
+
+
+def generate_program(func_count: int, main_body: str = None) -> str:
+    """
+    Generates a source file with 'func_count' small functions that call one
+    another, plus a 'main' that calls the last one, or runs 'main_body'.
+    """
+
+    if main_body is None:
+        main_body = f'''
+    total = 0;
+    print(f{func_count - 1}(20));
+    print(total);'''
+
+    lines = ['decl total, label;']
+
+    for i in range(func_count):
+        callee = f'f{i - 1}(n - 1)' if i else 'n'
+        lines.append(f'''
+f{i}(n) {{
+    decl i, acc;
+    i = 0;
+    acc = {i};
+
+    while (i < n && acc >= 0) {{
+        acc = acc + i * {i % 7 + 1} - (i / 2);
+        i = i + 1;
+    }}
+
+    if (n > 0) {{
+        total = total + acc;
+        return {callee};
+    }} else {{
+        label = "leaf {i}";
+    }}
+
+    return acc;
+}}''')
+
+    lines.append(f'\nmain() {{{main_body}\n}}')
+
+    return '\n'.join(lines)
@@ -0,0 +1,78 @@
+"""
+Startup time of 'run.py run' with an empty compile cache (cold), with the
+program already in the cache (warm) and without the cache, on programs that
+do little work once compiled.
+
+Usage: python -m benchmarks.compile_cache [--funcs N ...] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from .common import generate_program, print_table
+
+
+def run_time(args: [str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, 'run.py', 'run'] + args,
+        check=True, stdout=subprocess.DEVNULL, input=b'10\n'
+    )
+
+    return time.perf_counter() - start
+
+
+def measure(path: str, repeat: int) -> [float]:
+    cold, warm, uncached = [], [], []
+
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cache:
+            args = ['-s', path, '--cache-dir', cache]
+
+            cold.append(run_time(args))
+            warm.append(run_time(args))
+
+        uncached.append(run_time(['-s', path, '--no-cache']))
+
+    return [min(cold), min(warm), min(uncached)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '--funcs', type=int, nargs='+', default=[100, 1000, 5000]
+    )
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    sources = [('pyramid.code', os.path.join('test_code', 'pyramid.code'))]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.funcs:
+            path = os.path.join(tmp, f'{count}.code')
+            with open(path, 'w') as f:
+                # only 'main' runs
+                f.write(generate_program(count, 'print(1);'))
+
+            sources.append((f'{count} functions', path))
+
+        for name, path in sources:
+            times = measure(path, args.repeat)
+            rows.append(
+                [name, os.path.getsize(path)] +
+                ['%.0f ms' % (i * 1000) for i in times] +
+                ['%.1fx' % (times[2] / times[1])]
+            )
+
+    print_table(
+        ['source', 'bytes', 'cold', 'warm', '--no-cache', 'speedup'], rows
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compares the decoded engine with the compilation tier (bytecode translated
+to Python functions) on loop heavy programs.
+
+Usage: python -m benchmarks.compiled [--scale N]
+"""
+
+import argparse
+
+import day5_virtual_machine as machine
+
+from .common import compile_source, load_test_code, best_time, print_table
+from .vm_dispatch import FIBONACCI
+
+
+NESTED_LOOPS = '''
+main() {
+    decl i, j, total;
+    i = 0;
+    total = 0;
+
+    while (i < %d) {
+        j = 0;
+        while (j < 100) {
+            if (j / 3 * 3 == j) {
+                total = total + i * j;
+            } else {
+                total = total - 1;
+            }
+            j = j + 1;
+        }
+        i = i + 1;
+    }
+
+    print(total);
+}
+'''
+
+
+def workloads(scale: int):
+    yield 'fibonacci x%d' % (200 * scale), FIBONACCI % (200 * scale), []
+    yield 'nested loops %d' % (100 * scale), NESTED_LOOPS % (100 * scale), []
+    yield 'pyramid %d' % (300 * scale), load_test_code('pyramid.code'), \
+        [str(300 * scale)]
+    yield 'factorial %d' % (100 * scale), load_test_code('factorial.code'), \
+        [str(100 * scale)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--scale', type=int, default=3)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    for name, source, inputs in workloads(args.scale):
+        code = compile_source(source)
+
+        times = [
+            best_time(
+                lambda engine=engine: machine.run_code(
+                    code, machine.RecordingHandler(inputs), engine
+                ),
+                args.repeat
+            )
+            for engine in ('decoded', 'compiled')
+        ]
+
+        rows.append([
+            name,
+            '%.1f ms' % (times[0] * 1000),
+            '%.1f ms' % (times[1] * 1000),
+            '%.1fx' % (times[0] / times[1])
+        ])
+
+    print_table(['workload', 'decoded', 'compiled', 'gain'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares programs optimized with '-O' with and without the common
+subexpression elimination of day2_parser/common_subexpressions.py: the
+executed instructions and the run time on several engines.
+
+Usage: python -m benchmarks.cse [--scale N]
+"""
+
+import argparse
+
+import day1_lexer as lexer
+import day2_parser as parser
+import day3_semantic_analysis as semantics
+import day4_code_generation as codegen
+import day5_virtual_machine as machine
+
+from .common import load_test_code, count_instructions, best_time, print_table
+
+
+ENGINES = ['reference', 'decoded', 'compiled']
+
+# the squared distances between points on a grid, each written out as it
+# would be by hand
+DISTANCES = '''
+main() {
+    decl x, y, total;
+    x = 0; total = 0;
+    while (x < %d) {
+        y = 0;
+        while (y < 100) {
+            total = total + (x - y) * (x - y) + (x + y) * (x + y);
+            if ((x - y) * (x - y) < (x + y) * (x + y)) {
+                total = total - (x - y) * (x - y);
+            }
+            y = y + 1;
+        }
+        x = x + 1;
+    }
+    print(total);
+}
+'''
+
+
+def workloads(scale: int):
+    yield 'distances %d' % (20 * scale), DISTANCES % (20 * scale), []
+    yield 'pyramid %d' % (100 * scale), load_test_code('pyramid.code'), \
+        [str(100 * scale)]
+
+
+def compile_optimized(code: str, cse: bool) -> [str]:
+    ast = parser.parse_table_driven(parser.Reader(lexer.lex_stream(code)))
+    semantics.analysis(ast, True)
+
+    parser.fold_constants(ast)
+    if cse:
+        parser.eliminate_common_subexpressions(ast)
+
+    return machine.optimize_code(codegen.generate(ast))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--scale', type=int, default=3)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    rows = []
+    for name, source, inputs in workloads(args.scale):
+        for cse in (False, True):
+            code = compile_optimized(source, cse)
+            times = [
+                best_time(
+                    lambda engine=engine: machine.run_code(
+                        code, machine.RecordingHandler(list(inputs)), engine
+                    ),
+                    args.repeat
+                )
+                for engine in ENGINES
+            ]
+
+            rows.append(
+                [name, 'on' if cse else 'off',
+                 count_instructions(code, list(inputs))] +
+                ['%.1f ms' % (i * 1000) for i in times]
+            )
+
+    print_table(['program', 'cse', 'instructions'] + ENGINES, rows)
+
+
+if __name__ == '__main__':
+    main()
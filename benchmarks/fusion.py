@@ -0,0 +1,97 @@
+"""
+Prints the dynamic instruction pair counts that the superinstructions of
+day5_virtual_machine/fusion.py were picked from, and compares the decoded
+engine with fusion on and off.
+
+Usage: python -m benchmarks.fusion [--scale N] [--pairs N]
+"""
+
+import argparse
+import collections
+
+import day5_virtual_machine as machine
+from day5_virtual_machine.fusion import PATTERNS
+
+from .common import (
+    compile_source,
+    load_test_code,
+    generate_program,
+    run_counting,
+    best_time,
+    print_table
+)
+from .vm_dispatch import FIBONACCI
+
+
+def workloads(scale: int):
+    yield 'fibonacci x%d' % (200 * scale), FIBONACCI % (200 * scale), []
+    yield 'pyramid %d' % (300 * scale), load_test_code('pyramid.code'), \
+        [str(300 * scale)]
+    yield 'factorial %d' % (100 * scale), load_test_code('factorial.code'), \
+        [str(100 * scale)]
+    yield 'generated %d' % (100 * scale), generate_program(100 * scale), []
+
+
+def covered(pair: (str, str)) -> bool:
+    """
+    Whether a pair of instructions is the start of any fusion pattern.
+    """
+
+    return any(
+        len(matchers) > 1 and pair[0] in matchers[0] and pair[1] in matchers[1]
+        for _, matchers in PATTERNS
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--scale', type=int, default=3)
+    arg_parser.add_argument('--pairs', type=int, default=15)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    pairs = collections.Counter()
+    rows = []
+
+    for name, source, inputs in workloads(args.scale):
+        code = compile_source(source)
+
+        counting = run_counting(code, inputs)
+        # normalize, so that every workload weighs the same
+        for pair, count in counting.pairs.items():
+            if pair[0] is not None:
+                pairs[pair] += count / counting.count
+
+        times = [
+            best_time(
+                lambda fusion=fusion: machine.run_code(
+                    code, machine.RecordingHandler(inputs), fusion=fusion
+                ),
+                args.repeat
+            )
+            for fusion in (False, True)
+        ]
+
+        rows.append([
+            name,
+            '%.1f ms' % (times[0] * 1000),
+            '%.1f ms' % (times[1] * 1000),
+            '%.2fx' % (times[0] / times[1])
+        ])
+
+    total = sum(pairs.values())
+    print_table(
+        ['pair', 'share', 'fused'],
+        [
+            [' '.join(pair), '%.1f%%' % (100 * count / total),
+             'yes' if covered(pair) else '']
+            for pair, count in pairs.most_common(args.pairs)
+        ]
+    )
+
+    print()
+    print_table(['workload', 'unfused', 'fused', 'gain'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Compile time of a generated program after one of its functions is edited,
+with a full compilation and with the incremental one (see incremental.py),
+whose state is left by the compilation of the program before the edit.
+
+Usage: python -m benchmarks.incremental [--funcs N ...] [--repeat N] [-O]
+"""
+
+import os
+import argparse
+import itertools
+import tempfile
+
+from run import compile_code
+from incremental import IncrementalCompiler
+
+from .common import best_time, generate_program, print_table
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '--funcs', type=int, nargs='+', default=[100, 1000, 5000]
+    )
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('-O', dest='optimize', action='store_true')
+    args = arg_parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.funcs:
+            source = generate_program(count)
+            edited = source.replace('acc = 0;', 'acc = 1;', 1)
+            assert edited != source
+
+            compiler = IncrementalCompiler(os.path.join(tmp, f'{count}.state'))
+
+            def full():
+                compile_code(edited, optimize=args.optimize)
+
+            def cold():
+                os.remove(compiler.path)
+                compiler.compile(edited, optimize=args.optimize)
+
+            # every compilation is an edit of 'f0' since the one before
+            versions = itertools.cycle([edited, source])
+
+            def incremental():
+                compiler.compile(next(versions), optimize=args.optimize)
+
+            full_time = best_time(full, args.repeat)
+            compiler.compile(source, optimize=args.optimize)
+            cold_time = best_time(cold, args.repeat)
+
+            compiler.compile(source, optimize=args.optimize)
+            edit_time = best_time(incremental, args.repeat)
+            assert compiler.recompiled == ['f0'], compiler.recompiled
+
+            rows.append([
+                count,
+                '%.0f ms' % (full_time * 1000),
+                '%.0f ms' % (cold_time * 1000),
+                '%.0f ms' % (edit_time * 1000),
+                '%.1fx' % (full_time / edit_time)
+            ])
+
+    print_table(
+        ['functions', 'full', 'incremental (cold)', 'incremental (edit)',
+         'speedup'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    main()
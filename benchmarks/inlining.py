@@ -0,0 +1,121 @@
+"""
+Compares call-heavy programs compiled with '-O' at several inlining budgets:
+the executed instructions and calls to user functions, the run time on
+several engines and the functions that the 'compiled' engine translates.
+
+Usage: python -m benchmarks.inlining [--scale N] [--budgets N ...]
+"""
+
+import argparse
+
+import day5_virtual_machine as machine
+
+from run import compile_code
+
+from .common import (
+    load_test_code,
+    generate_program,
+    run_counting,
+    best_time,
+    print_table
+)
+
+
+ENGINES = ['decoded', 'compiled']
+
+CALLS = {'call', 'tcall'}
+
+# small helpers called in a loop, with and without early returns
+HELPERS = '''
+decl calls;
+
+square(x) { return x * x; }
+add(a, b) { return a + b; }
+maxi(a, b) { if (a > b) { return a; } return b; }
+clamp(x, low, high) { return maxi(low, 0 - maxi(0 - x, 0 - high)); }
+count() { calls = calls + 1; }
+
+main() {
+    decl i, total;
+    i = 0; total = 0; calls = 0;
+    while (i < %d) {
+        total = add(total, square(i) / (maxi(i, 1) + 1));
+        total = total + clamp(i - 50, 0, 10);
+        count();
+        i = i + 1;
+    }
+    print(total);
+    print(calls);
+}
+'''
+
+
+CHAINS = '''
+    decl i;
+    i = 0; total = 0;
+    while (i < %d) {
+        total = total + f4(i - i / 7 * 7);
+        i = i + 1;
+    }
+    print(total);'''
+
+
+def workloads(scale: int):
+    yield 'helpers %d' % (2000 * scale), HELPERS % (2000 * scale), []
+    # chains of calls to the generated functions, each with a loop
+    yield 'chains %d' % (100 * scale), generate_program(5, CHAINS % (
+        100 * scale
+    )), []
+    yield 'factorial %d' % (100 * scale), load_test_code('factorial.code'), \
+        [str(100 * scale)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--scale', type=int, default=3)
+    arg_parser.add_argument(
+        '--budgets', type=int, nargs='+', default=[0, 10, 30, 100]
+    )
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    for name, source, inputs in workloads(args.scale):
+        for budget in args.budgets:
+            code = compile_code(source, optimize=True, inline_budget=budget)
+
+            counting = run_counting(code, list(inputs))
+            calls = sum(
+                count for (_, op), count in counting.pairs.items()
+                if op in CALLS
+            )
+
+            times = [
+                best_time(
+                    lambda engine=engine: machine.run_code(
+                        code, machine.RecordingHandler(list(inputs)), engine
+                    ),
+                    args.repeat
+                )
+                for engine in ENGINES
+            ]
+
+            vm = machine.run_code(
+                code, machine.RecordingHandler(list(inputs)), 'compiled'
+            )
+
+            rows.append(
+                [name, budget, counting.count, calls] +
+                ['%.1f ms' % (i * 1000) for i in times] +
+                ['%d/%d' % (len(vm.compiled), len(vm.funcs))]
+            )
+
+    print_table(
+        ['program', 'budget', 'instructions', 'calls'] + ENGINES +
+        ['translated'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    main()
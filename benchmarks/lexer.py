@@ -0,0 +1,125 @@
+"""
+Lexer throughput in MB/s on generated multi-megabyte sources: the previous
+lexer (every rule tried at every position, longest match wins) against the
+master regex, from a string, a file handle and an mmap.
+
+Usage: python -m benchmarks.lexer [--sizes MB ...]
+"""
+
+import os
+import re
+import mmap
+import argparse
+import tempfile
+
+import day1_lexer as lexer
+
+from day1_lexer.lexer import KEYWORDS
+from day1_lexer import TokenType
+
+from .common import generate_program, best_time, print_table
+
+
+# the rules of the previous lexer, tried one by one
+PER_RULE_REGEX = {
+    re.compile(r'(NONE|TRUE|FALSE|"[^"]*"|\d+)'): TokenType.LITERAL,
+    re.compile(r'([_a-zA-Z][_a-zA-Z0-9]*)'): TokenType.IDENTIFIER,
+    re.compile(r'(,|;|\(|\)|\{|\})'): TokenType.SYMBOL,
+    re.compile(r'(!=|==|<=|>=|<|>|=|!|\+|-|\*|/|&&|\|\|)'):
+        TokenType.OPERATOR,
+    re.compile(r'(\s+)'): TokenType.WHITESPACE
+}
+
+
+def lex_per_rule(raw_code: str) -> list:
+    tokens = []
+    pos = 0
+
+    while pos < len(raw_code):
+        best, best_type = None, None
+        for regex, token_type in PER_RULE_REGEX.items():
+            match = regex.match(raw_code, pos)
+            if match and (best is None or match.end() > best.end()):
+                best, best_type = match, token_type
+
+        content = best.group(0)
+        pos = best.end()
+
+        if best_type == TokenType.WHITESPACE:
+            continue
+
+        if best_type == TokenType.IDENTIFIER and content in KEYWORDS:
+            best_type = TokenType.KEYWORD
+
+        tokens.append((content, best_type))
+
+    return tokens
+
+
+def generate_source(megabytes: float) -> str:
+    unit = generate_program(200)
+
+    count = max(1, int(megabytes * 2**20 / len(unit)))
+    return unit * count
+
+
+def consume(tokens) -> int:
+    count = 0
+    for _ in tokens:
+        count += 1
+
+    return count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '--sizes', type=float, nargs='+', default=[1, 4, 16]
+    )
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    for megabytes in args.sizes:
+        code = generate_source(megabytes)
+        size = len(code.encode('utf-8')) / 2**20
+
+        with tempfile.NamedTemporaryFile('w', delete=False) as f:
+            f.write(code)
+
+        def from_file():
+            with open(f.name, 'r') as handle:
+                return consume(lexer.iter_tokens(handle))
+
+        def from_mmap():
+            with open(f.name, 'rb') as handle:
+                with mmap.mmap(
+                        handle.fileno(), 0, access=mmap.ACCESS_READ
+                    ) as buffer:
+                    return consume(lexer.iter_tokens(buffer))
+
+        runs = [
+            lambda: lex_per_rule(code),
+            lambda: lexer.lex(code),
+            lambda: consume(lexer.iter_tokens(code)),
+            from_file,
+            from_mmap
+        ]
+
+        # the previous lexer is too slow to repeat on the large sizes
+        times = [best_time(runs[0], 1)]
+        times += [best_time(i, args.repeat) for i in runs[1:]]
+        os.unlink(f.name)
+
+        rows.append(
+            ['%.1f MB' % size] + ['%.1f' % (size / i) for i in times]
+        )
+
+    print('MB/s')
+    print_table(
+        ['source', 'per rule', 'lex()', 'str', 'file', 'mmap'], rows
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Compares programs optimized with '-O' with and without the loop-invariant
+code motion of day2_parser/loop_invariants.py: the executed instructions and
+the run time on several engines.
+
+Usage: python -m benchmarks.loop_invariants [--scale N]
+"""
+
+import argparse
+
+import day1_lexer as lexer
+import day2_parser as parser
+import day3_semantic_analysis as semantics
+import day4_code_generation as codegen
+import day5_virtual_machine as machine
+
+from .common import load_test_code, count_instructions, best_time, print_table
+
+
+ENGINES = ['reference', 'decoded', 'compiled']
+
+# nested loops whose bounds and factors are computed from a size that they
+# do not change
+GRID = '''
+main() {
+    decl x, y, size, total;
+    size = %d; x = 0; total = 0;
+    while (x < size * size / 100) {
+        y = 0;
+        while (y < size * 2 - 1 && !(size == 0)) {
+            total = total + y * (size + 1);
+            total = total - x / (size - 3);
+            y = y + 1;
+        }
+        x = x + 1;
+    }
+    print(total);
+}
+'''
+
+
+def workloads(scale: int):
+    yield 'grid %d' % (50 * scale), GRID % (50 * scale), []
+    yield 'pyramid %d' % (100 * scale), load_test_code('pyramid.code'), \
+        [str(100 * scale)]
+
+
+def compile_optimized(code: str, hoist: bool) -> [str]:
+    ast = parser.parse_table_driven(parser.Reader(lexer.lex_stream(code)))
+    semantics.analysis(ast, True)
+
+    parser.fold_constants(ast)
+    if hoist:
+        parser.hoist_loop_invariants(ast)
+    parser.eliminate_common_subexpressions(ast)
+
+    return machine.optimize_code(codegen.generate(ast))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--scale', type=int, default=3)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    rows = []
+    for name, source, inputs in workloads(args.scale):
+        for hoist in (False, True):
+            code = compile_optimized(source, hoist)
+            times = [
+                best_time(
+                    lambda engine=engine: machine.run_code(
+                        code, machine.RecordingHandler(list(inputs)), engine
+                    ),
+                    args.repeat
+                )
+                for engine in ENGINES
+            ]
+
+            rows.append(
+                [name, 'on' if hoist else 'off',
+                 count_instructions(code, list(inputs))] +
+                ['%.1f ms' % (i * 1000) for i in times]
+            )
+
+    print_table(['program', 'hoisting', 'instructions'] + ENGINES, rows)
+
+
+if __name__ == '__main__':
+    main()
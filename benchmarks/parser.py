@@ -0,0 +1,57 @@
+"""
+Parse time of the recursive descent parser and the table-driven one, on a
+generated program and on long chains of binary operators.
+
+Usage: python -m benchmarks.parser [--size MB] [--terms N ...]
+"""
+
+import argparse
+
+import day1_lexer as lexer
+import day2_parser as parser
+
+from .common import best_time, print_table
+from .lexer import generate_source
+
+
+PARSERS = {
+    'descent': parser.parse,
+    'table': parser.parse_table_driven
+}
+
+
+def measure(parse, tokens) -> str:
+    try:
+        seconds = best_time(lambda: parse(parser.Reader(tokens)), 3)
+    except RecursionError:
+        return 'RecursionError'
+
+    return '%.0f ms' % (seconds * 1000)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--size', type=float, default=1)
+    arg_parser.add_argument(
+        '--terms', type=int, nargs='+', default=[1000, 10000, 100000]
+    )
+    args = arg_parser.parse_args()
+
+    sources = [('program, %.1f MB' % args.size, generate_source(args.size))]
+    for terms in args.terms:
+        chain = ' + '.join(['a * 2'] * terms)
+        sources.append((f'{terms} terms', f'main() {{ x = {chain}; }}'))
+
+    rows = []
+    for name, code in sources:
+        tokens = lexer.lex_stream(code)
+        rows.append(
+            [name, len(tokens)] +
+            [measure(parse, tokens) for parse in PARSERS.values()]
+        )
+
+    print_table(['source', 'tokens'] + list(PARSERS), rows)
+
+
+if __name__ == '__main__':
+    main()
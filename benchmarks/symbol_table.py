@@ -0,0 +1,106 @@
+"""
+Analysis time with names resolved in the single symbol table of
+SemanticContext and by searching the stack of scopes from the innermost
+one, on generated programs with many identifiers and on deeply nested
+scopes whose innermost statements refer to outer and global variables.
+
+Usage: python -m benchmarks.symbol_table [--funcs N ...] [--depths N ...]
+"""
+
+import argparse
+
+import day1_lexer as lexer
+import day2_parser as parser
+
+from day1_lexer import TokenType
+from day1_lexer.token_stream import KIND_CODES
+from day2_parser.traversal import analyse
+from day3_semantic_analysis import (
+    SemanticContext,
+    GlobalScope,
+    LOCAL,
+    GLOBAL
+)
+
+from .common import best_time, print_table, generate_program
+
+
+class ScopeChainContext(SemanticContext):
+    """
+    Resolves names by searching every scope in turn, the innermost first.
+    """
+
+    def has_var(self, name: str) -> bool:
+        return any(i.has_var(name) for i in self.scopes)
+
+    def resolve_var(self, name: str) -> (str, int):
+        for scope in reversed(self.scopes):
+            if scope.has_var(name):
+                storage = GLOBAL if isinstance(scope, GlobalScope) else LOCAL
+                return storage, scope.var_index(name)
+
+        return None
+
+
+CONTEXTS = {
+    'symbol table': SemanticContext,
+    'scope chain': ScopeChainContext
+}
+
+
+def nested_source(depth: int) -> str:
+    """
+    'depth' nested loops and conditionals that each declare a variable and
+    update it from the global and from the variable of the function.
+    """
+
+    levels = [
+        f'while (TRUE) {{ decl y{i}; y{i} = x + g + {i}; if (y{i} > 0) {{ '
+        for i in range(depth)
+    ]
+
+    return (
+        'decl g; main() { decl x; x = 0; g = 1; ' + ''.join(levels) +
+        'x = x + 1; ' + '} else { continue; } break; } ' * depth +
+        'print(x); }'
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '--funcs', type=int, nargs='+', default=[1000, 5000]
+    )
+    arg_parser.add_argument(
+        '--depths', type=int, nargs='+', default=[100, 1000, 5000]
+    )
+    args = arg_parser.parse_args()
+
+    sources = [(f'{i} functions', generate_program(i)) for i in args.funcs]
+    sources += [(f'depth {i}', nested_source(i)) for i in args.depths]
+
+    rows = []
+    for name, code in sources:
+        tokens = lexer.lex_stream(code)
+        identifiers = tokens.kinds.count(KIND_CODES[TokenType.IDENTIFIER])
+
+        # the analysis only overwrites the annotations of the tree, so the
+        # same tree can be analysed again
+        ast = parser.parse_table_driven(parser.Reader(tokens))
+
+        times = [
+            best_time(lambda: analyse(ast, context()), 3)
+            for context in CONTEXTS.values()
+        ]
+
+        rows.append(
+            [name, identifiers] +
+            ['%.0f ms' % (i * 1000) for i in times] +
+            ['%.1fx' % (times[1] / times[0])]
+        )
+
+    print_table(['source', 'identifiers'] + list(CONTEXTS) + ['speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
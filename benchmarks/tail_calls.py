@@ -0,0 +1,64 @@
+"""
+Compares tail recursion compiled with and without the 'tcall' instruction:
+run time and peak memory at increasing depths.
+
+Usage: python -m benchmarks.tail_calls [--depths N ...]
+"""
+
+import argparse
+
+from day5_virtual_machine.byte_loader import read_bytecode
+
+from .common import compile_source, best_time, print_table
+from .call_stack import run, peak_memory
+
+
+ENGINES = ['decoded', 'flat', 'compiled']
+
+COUNT = '''
+count(n, acc) {
+    if (n == 0) {
+        return acc;
+    }
+    return count(n - 1, acc + n);
+}
+
+main() {
+    print(count(%d, 0));
+}
+'''
+
+
+def measure(file_rep: dict, engine: str) -> str:
+    try:
+        seconds = best_time(lambda: run(file_rep, engine), 1)
+    except RecursionError:
+        return 'RecursionError'
+
+    memory = peak_memory(file_rep, engine)
+    return '%.0f ms, %.1f MB' % (seconds * 1000, memory / 2**20)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '--depths', type=int, nargs='+', default=[10000, 100000, 1000000]
+    )
+    args = arg_parser.parse_args()
+
+    rows = []
+    for depth in args.depths:
+        for tail_calls in (False, True):
+            code = compile_source(COUNT % depth, tail_calls)
+            file_rep = read_bytecode(code)
+
+            rows.append(
+                [depth, 'tcall' if tail_calls else 'call; ret'] +
+                [measure(file_rep, engine) for engine in ENGINES]
+            )
+
+    print_table(['depth', 'code'] + ENGINES, rows)
+
+
+if __name__ == '__main__':
+    main()
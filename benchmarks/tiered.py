@@ -0,0 +1,87 @@
+"""
+Compares the tiered engine with the engines that optimize every function up
+front, on programs with many cold functions and on hot loops. Times include
+building the virtual machine, but not parsing the bytecode.
+
+Usage: python -m benchmarks.tiered [--functions N] [--scale N]
+"""
+
+import argparse
+
+import day5_virtual_machine as machine
+
+from day5_virtual_machine.byte_loader import read_bytecode
+
+from .common import compile_source, generate_program, best_time, print_table
+from .vm_dispatch import FIBONACCI
+
+
+ENGINES = ['decoded', 'compiled', 'tiered']
+
+# a small hot function in a program of cold ones
+HOT = '''
+step(i, acc) {
+    if (i / 3 * 3 == i) {
+        return acc + i;
+    }
+    return acc - 1;
+}
+'''
+
+HOT_MAIN = '''
+    decl i, acc;
+    i = 0;
+    acc = 0;
+    while (i < %d) {
+        acc = step(i, acc);
+        i = i + 1;
+    }
+    print(acc);'''
+
+
+def workloads(functions: int, scale: int):
+    yield 'cold x%d' % functions, generate_program(functions)
+    yield 'fibonacci x%d' % (200 * scale), FIBONACCI % (200 * scale)
+    yield 'cold x%d + hot calls' % functions, \
+        generate_program(functions, HOT_MAIN % (20000 * scale)) + HOT
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--functions', type=int, default=3000)
+    arg_parser.add_argument('--scale', type=int, default=3)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    promotions = {}
+    for name, source in workloads(args.functions, args.scale):
+        file_rep = read_bytecode(compile_source(source))
+
+        def run(engine: str):
+            return machine.run_file_rep(
+                file_rep, machine.RecordingHandler([]), engine
+            )
+
+        times = [
+            best_time(lambda engine=engine: run(engine), args.repeat)
+            for engine in ENGINES
+        ]
+        rows.append([name] + ['%.1f ms' % (i * 1000) for i in times])
+
+        promotions[name] = run('tiered').stats()['promotions']
+
+    print_table(['workload'] + ENGINES, rows)
+
+    print()
+    for name, events in promotions.items():
+        print(f'{name}: {len(events)} promotions')
+        for i in events:
+            print(
+                f'    {i["function"]}: {i["from"]} -> {i["to"]} '
+                f'({i["reason"]}, {i["calls"]} calls, {i["loops"]} loops)'
+            )
+
+
+if __name__ == '__main__':
+    main()
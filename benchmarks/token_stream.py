@@ -0,0 +1,72 @@
+"""
+Compares the tokens of 'lex' (a list of (str, TokenType)) with the array
+columns of 'lex_stream': the memory the tokens take, and the time to lex and
+parse generated sources.
+
+Usage: python -m benchmarks.token_stream [--sizes MB ...]
+"""
+
+import argparse
+import tracemalloc
+
+import day1_lexer as lexer
+import day2_parser as parser
+
+from .common import best_time, print_table
+from .lexer import generate_source
+
+
+def token_memory(lex, code: str) -> int:
+    """
+    The memory held by the lexed tokens (not counting the source), in bytes.
+    """
+
+    tracemalloc.start()
+    try:
+        tokens = lex(code)
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+        del tokens
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '--sizes', type=float, nargs='+', default=[1, 4, 16]
+    )
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    for megabytes in args.sizes:
+        code = generate_source(megabytes)
+        size = '%.1f MB' % (len(code) / 2**20)
+        count = len(lexer.lex_stream(code))
+
+        for name, lex in (('list', lexer.lex), ('stream', lexer.lex_stream)):
+            memory = token_memory(lex, code)
+
+            lex_time = best_time(lambda: lex(code), args.repeat)
+            tokens = lex(code)
+            parse_time = best_time(
+                lambda: parser.parse(parser.Reader(tokens)), args.repeat
+            )
+
+            rows.append([
+                size, count, name,
+                '%.1f MB' % (memory / 2**20),
+                '%.0f' % (memory / count),
+                '%.0f ms' % (lex_time * 1000),
+                '%.0f ms' % (parse_time * 1000)
+            ])
+
+    print_table(
+        ['source', 'tokens', 'tokens as', 'memory', 'bytes/token', 'lex',
+         'parse'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Analysis and code generation time of the recursive methods of the AST
+nodes and of the worklist traversal in day2_parser/traversal.py, on a
+generated program and on deeply nested blocks and expressions.
+
+Usage: python -m benchmarks.traversal [--funcs N] [--depths N ...]
+"""
+
+import argparse
+
+import day1_lexer as lexer
+import day2_parser as parser
+import day3_semantic_analysis as semantics
+import day4_code_generation as codegen
+
+from day3_semantic_analysis import SemanticContext
+
+from .common import best_time, print_table, generate_program
+
+
+def recursive(ast):
+    ast.analysis_pass(SemanticContext())
+    return ast.generate_code(None)
+
+
+def iterative(ast):
+    semantics.analysis(ast)
+    return codegen.generate(ast)
+
+
+PASSES = {
+    'recursive': recursive,
+    'worklist': iterative
+}
+
+
+def nested_source(depth: int) -> str:
+    """
+    'depth' nested loops and conditionals around an expression nested as
+    deep, so that the tree is about twice as deep.
+    """
+
+    return (
+        'main() { decl x; x = 0; ' +
+        'while (TRUE) { decl y; if (TRUE) { ' * depth +
+        'x = ' + '(' * depth + 'x + 1' + ')' * depth + '; ' +
+        '} else { continue; } break; } ' * depth + 'print(x); }'
+    )
+
+
+def measure(run, code: str) -> str:
+    # the passes only overwrite the annotations of the tree, so the same
+    # tree can be analysed and generated again
+    ast = parser.parse_table_driven(parser.Reader(lexer.lex_stream(code)))
+
+    try:
+        seconds = best_time(lambda: run(ast), 3)
+    except RecursionError:
+        return 'RecursionError'
+
+    return '%.0f ms' % (seconds * 1000)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--funcs', type=int, default=500)
+    arg_parser.add_argument(
+        '--depths', type=int, nargs='+', default=[100, 1000, 10000]
+    )
+    args = arg_parser.parse_args()
+
+    sources = [(f'{args.funcs} functions', generate_program(args.funcs))]
+    for depth in args.depths:
+        sources.append((f'depth {depth}', nested_source(depth)))
+
+    rows = [
+        [name] + [measure(run, code) for run in PASSES.values()]
+        for name, code in sources
+    ]
+
+    print_table(['source'] + list(PASSES), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Compares the instruction throughput of the execution engines on scaled up
+versions of 'fibonacci.code' and 'pyramid.code'.
+
+Usage: python -m benchmarks.vm_dispatch [--scale N]
+"""
+
+import argparse
+
+import day5_virtual_machine as machine
+
+from .common import (
+    compile_source,
+    load_test_code,
+    count_instructions,
+    best_time,
+    print_table
+)
+
+
+# 'fibonacci.code' with its loop repeated 'rounds' times
+FIBONACCI = '''
+main() {
+    decl whilea, b, round;
+    round = 0;
+
+    while (round < %d) {
+        whilea = 0;
+        b = 1;
+
+        while (b < 1000 && (TRUE || FALSE) && TRUE) {
+            whilea = whilea + b;
+            b = whilea - b;
+            whilea = whilea - b;
+            b = whilea + b;
+
+            print(b + 0);
+        }
+
+        round = round + 1;
+    }
+
+    print("DONE");
+}
+'''
+
+PYRAMID = 'pyramid.code'
+
+
+def workloads(scale: int):
+    yield 'fibonacci x%d' % (200 * scale), FIBONACCI % (200 * scale), []
+    yield 'pyramid %d' % (300 * scale), load_test_code(PYRAMID), \
+        [str(300 * scale)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--scale', type=int, default=5)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    for name, source, inputs in workloads(args.scale):
+        code = compile_source(source)
+        count = count_instructions(code, inputs)
+
+        times = {}
+        for engine in ('reference', 'decoded'):
+            times[engine] = best_time(
+                lambda: machine.run_code(
+                    code, machine.RecordingHandler(inputs), engine,
+                    fusion=False
+                ),
+                args.repeat
+            )
+
+        rows.append([
+            name,
+            count,
+            '%.0f' % (count / times['reference']),
+            '%.0f' % (count / times['decoded']),
+            '%.1fx' % (times['reference'] / times['decoded'])
+        ])
+
+    print_table(
+        ['workload', 'instructions', 'reference ips', 'decoded ips', 'gain'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import os
+import struct
+import hashlib
+import tempfile
+
+import day5_virtual_machine as machine
+
+from day1_lexer import InvalidByteSyntaxError
+
+
+# the packages whose code decides the bytecode compiled from a source, and
+# the top level modules that run them in turn
+COMPILER_PACKAGES = [
+    'day1_lexer',
+    'day2_parser',
+    'day3_semantic_analysis',
+    'day4_code_generation',
+    'day5_virtual_machine'
+]
+COMPILER_MODULES = [
+    'run.py',
+    'incremental.py',
+    'compile_cache.py',
+    'batch.py'
+]
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+    'language-and-compiler-course'
+)
+
+DEFAULT_SIZE = 64 * 1024 * 1024
+
+SUFFIX = '.bin'
+
+# the state of the incremental compilation of a source file
+STATE_SUFFIX = '.state'
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    Writes a file under a temporary name in the same directory, then renames
+    it into place, so that readers see either the old file or the new one.
+    """
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or '.', suffix='.tmp'
+    )
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def compiler_version() -> str:
+    """
+    A hash of the code of the compiler, so that changing it invalidates the
+    bytecode it compiled.
+    """
+
+    paths = list(COMPILER_MODULES)
+    for package in COMPILER_PACKAGES:
+        paths += sorted(
+            f'{package}/{i}' for i in os.listdir(os.path.join(ROOT, package))
+            if i.endswith('.py')
+        )
+
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(os.path.join(ROOT, path), 'rb') as f:
+            digest.update(path.encode('utf-8') + b'\0')
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """
+    Compiled programs in binary bytecode files named by the hash of their
+    source, the compiler options and the compiler version.
+
+    Files are written under a temporary name and renamed into place, so
+    that concurrent runs never read a partial file. Reading a file updates
+    its modification time, and the least recently used files are removed
+    once the directory holds more than 'max_size' bytes. The directory
+    also holds the state of incremental compilations, evicted alike.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIR, max_size=DEFAULT_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.version = None
+
+    def key(self, source: str, options: dict) -> str:
+        if self.version is None:
+            self.version = compiler_version()
+
+        digest = hashlib.sha256(self.version.encode('utf-8'))
+        digest.update(repr(sorted(options.items())).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(source.encode('utf-8'))
+
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def state_path(self, source_path: str, options: dict) -> str:
+        """
+        Where the incremental compilation of a source file (see
+        incremental.py) keeps its state, by the path of the file rather
+        than its content, which changes from one run to the next.
+        """
+
+        key = self.key(os.path.abspath(source_path), options)
+        return os.path.join(self.directory, key + STATE_SUFFIX)
+
+    def load(self, key: str) -> dict:
+        """
+        The loaded bytecode stored under 'key', or None.
+        """
+
+        path = self.path(key)
+
+        try:
+            file_rep = machine.load_bytecode_file(path)
+            os.utime(path)
+        except (
+                OSError, ValueError, IndexError, struct.error,
+                InvalidByteSyntaxError
+            ):
+            # missing, evicted meanwhile or corrupted
+            return None
+
+        return file_rep
+
+    def store(self, key: str, code: [str]):
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(self.path(key), machine.encode_bytecode(code))
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith((SUFFIX, STATE_SUFFIX)):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(i[1] for i in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            total -= size
+
+    def compile(self, source: str, compile_code, **options) -> dict:
+        """
+        The loaded bytecode of a source, compiled with
+        'compile_code(source, **options)' only if it is not in the cache.
+        """
+
+        key = self.key(source, options)
+
+        file_rep = self.load(key)
+        if file_rep is None:
+            code = compile_code(source, **options)
+            self.store(key, code)
+            file_rep = machine.read_bytecode(code)
+
+        return file_rep
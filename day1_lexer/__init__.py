@@ -1,10 +1,14 @@
-from .lexer import lex
+from .lexer import lex, iter_tokens, lex_stream
 from .presets import load_source_file, TokenType
+from .token_stream import TokenStream
 from .errors import *
 
 
 __all__ = [
     'lex',
+    'iter_tokens',
+    'lex_stream',
+    'TokenStream',
     'load_source_file',
     'TokenType',
     'LexerError',
@@ -1,20 +1,59 @@
 import re
-import importlib
 
 from .errors import LexerError
 from .presets import TokenType, load_source_file
+from .token_stream import TokenStream, KIND_CODES
 
 
 KEYWORDS = ['if', 'else', 'while', 'return', 'break', 'continue', 'decl']
-TOKEN_REGEX = {
-    r'(NONE|TRUE|FALSE|".*"|\d+)': TokenType.LITERAL,
-    r'([_a-zA-Z][_a-zA-Z0-9]*)': TokenType.IDENTIFIER,
-    r'(,|;|\(|\)|\{|\})': TokenType.SYMBOL,
-    r'(!=|==|<=|>=|<|>|=|!|\+|-|\*|/|&&|\|\|)': TokenType.OPERATOR,
-    r'(\s+)': TokenType.WHITESPACE
+
+# literals that are spelled like identifiers
+WORD_LITERALS = ['NONE', 'TRUE', 'FALSE']
+
+# (group name, regex, token type), combined into a single alternation whose
+# first matching alternative wins. Identifiers, keywords and word literals
+# share the WORD rule and are told apart by their content, which gives the
+# same result as the longest match: 'TRUE' is a literal, 'TRUEx' is not.
+TOKEN_RULES = [
+    ('WORD', r'[_a-zA-Z][_a-zA-Z0-9]*', TokenType.IDENTIFIER),
+    ('NUMBER', r'\d+', TokenType.LITERAL),
+    ('STRING', r'"[^"]*"', TokenType.LITERAL),
+    ('SYMBOL', r',|;|\(|\)|\{|\}', TokenType.SYMBOL),
+    # the longer operators must come first
+    ('OPERATOR', r'!=|==|<=|>=|<|>|=|!|\+|-|\*|/|&&|\|\|', TokenType.OPERATOR),
+    ('WHITESPACE', r'\s+', TokenType.WHITESPACE),
+    ('MISMATCH', r'.', None)
+]
+
+MASTER_PATTERN = '|'.join(
+    f'(?P<{name}>{regex})' for name, regex, _ in TOKEN_RULES
+)
+
+MASTER_REGEX = re.compile(MASTER_PATTERN, re.DOTALL)
+
+# for bytes-like sources (bytes, mmap); '\d' and '\s' only match ASCII there
+MASTER_REGEX_BYTES = re.compile(MASTER_PATTERN.encode('ascii'), re.DOTALL)
+
+RULE_TYPES = {name: token_type for name, _, token_type in TOKEN_RULES}
+
+WORD_TYPES = {
+    **{i: TokenType.KEYWORD for i in KEYWORDS},
+    **{i: TokenType.LITERAL for i in WORD_LITERALS}
 }
 
-TOKEN_REGEX = {re.compile(k): v for k, v in TOKEN_REGEX.items()}
+# for TokenStream, by group name and by word (as str and as bytes)
+RULE_CODES = {
+    name: KIND_CODES[token_type]
+    for name, _, token_type in TOKEN_RULES if token_type is not None
+}
+
+WORD_CODES = {word: KIND_CODES[kind] for word, kind in WORD_TYPES.items()}
+WORD_CODES.update({
+    word.encode('ascii'): code for word, code in WORD_CODES.items()
+})
+
+# the size of the reads from file handles
+CHUNK_SIZE = 1 << 16
 
 
 def lex(raw_code: str) -> [(str, TokenType)]:
@@ -38,4 +77,149 @@ def lex(raw_code: str) -> [(str, TokenType)]:
         ]
     """
 
-    raise NotImplementedError
\ No newline at end of file
+    return list(iter_tokens(raw_code))
+
+
+def iter_tokens(source, chunk_size: int = CHUNK_SIZE):
+    """
+    Lexes like 'lex', yielding the tokens one at a time.
+
+    'source' is either a string, a bytes-like object such as an mmap (lexed
+    in place, as UTF-8), or a file handle opened in text or binary mode
+    (read 'chunk_size' characters or bytes at a time). Error positions are
+    in characters for strings and text files, and in bytes otherwise.
+    """
+
+    if not hasattr(source, 'read'):
+        yield from scan(source)
+        return
+
+    buffer = None
+    offset = 0
+
+    while True:
+        chunk = source.read(chunk_size)
+        complete = not chunk
+        buffer = chunk if buffer is None else buffer + chunk
+
+        consumed = yield from scan(buffer, offset, complete)
+        if complete:
+            return
+
+        buffer = buffer[consumed:]
+        offset += consumed
+
+
+def scan(buffer, offset: int = 0, complete: bool = True):
+    """
+    Yields the tokens of a string or bytes-like buffer that starts at
+    'offset' in the source.
+
+    If the buffer is not 'complete', its last token may continue in the
+    rest of the source: scanning stops before it, and returns the position
+    to resume from.
+    """
+
+    is_text = isinstance(buffer, str)
+    regex = MASTER_REGEX if is_text else MASTER_REGEX_BYTES
+    end = len(buffer)
+
+    for match in regex.finditer(buffer):
+        kind = match.lastgroup
+
+        # an unterminated string may be terminated later on
+        if not complete and (
+                match.end() == end or
+                kind == 'MISMATCH' and match.group() in ('"', b'"')
+            ):
+            return match.start()
+
+        if kind == 'WHITESPACE':
+            continue
+
+        content = match.group()
+        if not is_text:
+            content = content.decode('utf-8')
+
+        if kind == 'WORD':
+            yield content, WORD_TYPES.get(content, TokenType.IDENTIFIER)
+
+        elif kind == 'MISMATCH':
+            pos = match.start()
+            raise LexerError(
+                f'No matching token rule at position {offset + pos}: '
+                f'{snippet(buffer, pos)!r}'
+            )
+
+        else:
+            yield content, RULE_TYPES[kind]
+
+    return end
+
+
+def lex_stream(source) -> TokenStream:
+    """
+    Lexes like 'lex' into a TokenStream, which keeps every token as an
+    offset into 'source' (a string, or a bytes-like object such as an mmap)
+    along with its line and column.
+    """
+
+    stream = TokenStream(source)
+    is_text = stream.is_text
+    regex = MASTER_REGEX if is_text else MASTER_REGEX_BYTES
+    newline = '\n' if is_text else b'\n'
+    identifier = RULE_CODES['WORD']
+
+    kinds = stream.kinds.append
+    starts = stream.starts.append
+    lengths = stream.lengths.append
+    lines = stream.lines.append
+    columns = stream.columns.append
+
+    line = 1
+    line_start = 0
+
+    for match in regex.finditer(source):
+        kind = match.lastgroup
+        start, end = match.span()
+
+        if kind == 'MISMATCH':
+            raise LexerError(
+                f'No matching token rule at line {line}, column '
+                f'{start - line_start + 1}: {snippet(source, start)!r}'
+            )
+
+        if kind != 'WHITESPACE':
+            if kind == 'WORD':
+                kinds(WORD_CODES.get(match.group(), identifier))
+            else:
+                kinds(RULE_CODES[kind])
+
+            starts(start)
+            lengths(end - start)
+            lines(line)
+            columns(start - line_start + 1)
+
+            if kind != 'STRING':
+                continue
+
+        # only whitespace and strings span lines
+        content = match.group()
+        count = content.count(newline)
+        if count:
+            line += count
+            line_start = start + content.rfind(newline) + 1
+
+    return stream
+
+
+def snippet(buffer, pos: int) -> str:
+    """
+    The source at 'pos', for error messages.
+    """
+
+    content = buffer[pos : pos + 10]
+    if not isinstance(content, str):
+        content = bytes(content).decode('utf-8', 'replace')
+
+    return content
@@ -0,0 +1,95 @@
+from array import array
+
+from .presets import TokenType
+
+
+# token kinds are stored as their index in this list
+KINDS = list(TokenType)
+KIND_CODES = {kind: i for i, kind in enumerate(KINDS)}
+
+
+class TokenStream:
+    """
+    Lexed tokens kept as parallel integer columns instead of a list of
+    (str, TokenType): the kind, start offset and length of every token in
+    'source', and its line and column (both from 1).
+
+    The text of a token is only sliced out of the source when asked for.
+    'source' is a string, or a bytes-like object (e.g. an mmap) whose
+    offsets and columns are in bytes.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.is_text = isinstance(source, str)
+
+        self.kinds = array('i')
+        self.starts = array('i')
+        self.lengths = array('i')
+        self.lines = array('i')
+        self.columns = array('i')
+
+    @classmethod
+    def from_tokens(cls, tokens: [(str, TokenType)]) -> 'TokenStream':
+        """
+        Packs the tokens returned by 'lex' into a stream over their
+        space-separated text. Those tokens have no line and column.
+        """
+
+        stream = cls(' '.join(content for content, _ in tokens))
+
+        offset = 0
+        for content, kind in tokens:
+            stream.kinds.append(KIND_CODES[kind])
+            stream.starts.append(offset)
+            stream.lengths.append(len(content))
+            offset += len(content) + 1
+
+        stream.lines = stream.columns = None
+        return stream
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, i: int) -> (str, TokenType):
+        return self.text(i), self.kind(i)
+
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self[i]
+
+    def kind(self, i: int) -> TokenType:
+        return KINDS[self.kinds[i]]
+
+    def text(self, i: int) -> str:
+        start = self.starts[i]
+        content = self.source[start : start + self.lengths[i]]
+
+        return content if self.is_text else content.decode('utf-8')
+
+    def matches(self, i: int, matcher) -> bool:
+        """
+        Whether token 'i' has the type or the content 'matcher', without
+        materializing its text when the source is a string.
+        """
+
+        if type(matcher) is TokenType:
+            return self.kinds[i] == KIND_CODES[matcher]
+
+        if self.lengths[i] != len(matcher):
+            return False
+
+        if self.is_text:
+            return self.source.startswith(matcher, self.starts[i])
+
+        return self.text(i) == matcher
+
+    def position(self, i: int) -> str:
+        """
+        Where token 'i' is, for error messages.
+        """
+
+        if self.lines is None:
+            return f'token {i + 1}'
+
+        return f'line {self.lines[i]}, column {self.columns[i]}'
@@ -1,10 +1,20 @@
 from .ast import *
 from .parser import Reader, parse
+from .table_parser import parse_table_driven
+from .folding import fold_constants
+from .common_subexpressions import eliminate_common_subexpressions
+from .inlining import inline_functions
+from .loop_invariants import hoist_loop_invariants
 
 
 __all__ = [
     'Reader',
     'parse',
+    'parse_table_driven',
+    'fold_constants',
+    'eliminate_common_subexpressions',
+    'inline_functions',
+    'hoist_loop_invariants',
     'Exp',
     'Declare',
     'Assign',
@@ -7,12 +7,16 @@ from day3_semantic_analysis.semantic_context import (
     SemanticContext,
     Scope,
     GlobalScope,
-    NATIVE_FUNCS,
-    NATIVE_INDEX
+    LOCAL,
+    GLOBAL,
+    NATIVE
 )
 from day4_code_generation import (
     UNOP_CODE,
     BINOP_CODE,
+    LOAD_CODE,
+    STORE_CODE,
+    CALL_CODE,
     CodeGenContext
 )
 
@@ -20,8 +24,53 @@ from day4_code_generation import (
 class AST:
     """
     The base class of all abstract syntax tree nodes.
+
+    Nodes compare and hash by structure: by type and by their FIELDS, in
+    order except for the UNORDERED ones. The hash of a node is computed
+    once, children first and without recursion, and cached on it; every
+    child then remembers the node it was hashed under. Assigning a field,
+    or changing the list of a field in place (fields store their lists as
+    NodeLists), forgets the hashes of the node and of those ancestors, so
+    passes can rewrite a tree in place and it hashes by its new structure.
+    This assumes that a node is the child of a single node at a time,
+    which the passes keep: they move or copy nodes, never share them.
     """
 
+    # the child nodes and values that make up the structure of a node, and
+    # those of them that are compared regardless of order
+    FIELDS = ()
+    UNORDERED = ()
+
+    # the cached hash, or None, and the node it was last hashed under
+    __slots__ = ('_hash', '_parent')
+
+    def __new__(cls, *args, **kwargs):
+        node = object.__new__(cls)
+        object.__setattr__(node, '_hash', None)
+
+        return node
+
+    def __setattr__(self, name: str, value):
+        if isinstance(value, list) and name in self.FIELDS:
+            value = NodeList(value)
+            value.owner = self
+
+        object.__setattr__(self, name, value)
+
+        if self._hash is not None and name in self.FIELDS:
+            self.forget_hash()
+
+    def forget_hash(self) -> None:
+        """
+        Drops the cached hash of this node and of the nodes above it, once
+        its structure changed. Called by __setattr__ and NodeList.
+        """
+
+        node = self
+        while node is not None and node._hash is not None:
+            object.__setattr__(node, '_hash', None)
+            node = node._parent
+
     def analysis_pass(self, context: SemanticContext) -> None:
         """
         The analysis pass whether this node contains valid code.
@@ -60,26 +109,74 @@ class AST:
         # for debugging purposes
         return str(self)
 
+    def __hash__(self):
+        return structural_hash(self)
+
+    def __eq__(self, other):
+        return structural_equal(self, other)
+
+
+def changing(method):
+    """
+    A list method that also forgets the hash of the node holding the list.
+    """
+
+    def change(self, *args):
+        result = method(self, *args)
+        self.owner.forget_hash()
+        return result
+
+    return change
+
+
+class NodeList(list):
+    """
+    The list of a field of a node, which forgets the hash of the node (see
+    AST.forget_hash) when it changes in place.
+    """
+
+    # the node whose field holds the list
+    __slots__ = ('owner',)
+
+    __setitem__ = changing(list.__setitem__)
+    __delitem__ = changing(list.__delitem__)
+    __iadd__ = changing(list.__iadd__)
+    __imul__ = changing(list.__imul__)
+    append = changing(list.append)
+    extend = changing(list.extend)
+    insert = changing(list.insert)
+    pop = changing(list.pop)
+    remove = changing(list.remove)
+    clear = changing(list.clear)
+    reverse = changing(list.reverse)
+
+    def sort(self, *, key=None, reverse=False):
+        list.sort(self, key=key, reverse=reverse)
+        self.owner.forget_hash()
+
 
 class Exp(AST):
     """
     Represents an expression.
     """
-    pass
+
+    __slots__ = ()
 
 
 class Stmt(AST):
     """
     An interface for all statement-related nodes.
     """
-    pass
+
+    __slots__ = ()
 
 
 class Decl(AST):
     """
     An interface for all global-scope declaration-related nodes.
     """
-    pass
+
+    __slots__ = ()
 
 
 class Declare(Stmt, Decl):
@@ -87,24 +184,36 @@ class Declare(Stmt, Decl):
     Represents a declare statement (e.g. 'decl a, b;').
     """
 
+    FIELDS = ('vars',)
+    UNORDERED = ('vars',)
+    __slots__ = FIELDS + ('slots', 'storage')
+
     def __init__(self, vars: [str]):
         self.vars = vars
 
     def __str__(self):
         return 'Declare([%s])'%(', '.join(f"'{i}'" for i in self.vars))
 
-    def __eq__(self, other):
-        return type(other) == Declare and \
-               compare_unordered(self.vars, other.vars)
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        self.slots = [context.add_var(i) for i in self.vars]
+        self.storage = GLOBAL if isinstance(context.curr(), GlobalScope) \
+                       else LOCAL
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        # local variables are reset to NONE whenever their declaration is
+        # reached, since slots are shared between sibling scopes
+        return 0 if self.storage == GLOBAL else 2 * len(self.vars)
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        if self.storage == GLOBAL:
+            return []
+
+        code = []
+        for _, index in self.slots:
+            code += ['lnon', f'lstore {index}']
+
+        context.increment(len(code))
+        return code
 
     def var_count(self) -> int:
         return len(self.vars)
@@ -115,6 +224,9 @@ class Assign(Stmt):
     Represents an assignment statement (e.g. 'a = 20').
     """
 
+    FIELDS = ('var', 'value')
+    __slots__ = FIELDS + ('storage', 'slot')
+
     def __init__(self, var: str, value: Exp):
         self.var = var
         self.value = value
@@ -122,19 +234,25 @@ class Assign(Stmt):
     def __str__(self):
         return f'Assign(\'{self.var}\', {self.value})'
 
-    def __eq__(self, other):
-        return type(other) == Assign and \
-               self.var == other.var and \
-               self.value == other.value
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        binding = context.resolve_var(self.var)
+        if binding is None:
+            raise UndeclaredIdentifierError(
+                f'Variable {self.var} is not declared'
+            )
+
+        self.value.analysis_pass(context)
+        self.storage, self.slot = binding
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return self.value.code_length() + 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        code = self.value.generate_code(context)
+        code.append(f'{STORE_CODE[self.storage]} {self.slot}')
+        context.increment()
+
+        return code
 
 
 class Return(Stmt):
@@ -142,24 +260,38 @@ class Return(Stmt):
     Represents an return statement.
     """
 
+    FIELDS = ('value',)
+    __slots__ = FIELDS + ('tail_call',)
+
     def __init__(self, value: Exp):
         self.value = value
 
     def __str__(self):
         return f'Return({self.value})'
 
-    def __eq__(self, other):
-        return type(other) == Return and \
-               self.value == other.value
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        self.value.analysis_pass(context)
+
+        self.tail_call = context.tail_calls and \
+                         type(self.value) == FuncCall and \
+                         self.value.storage != NATIVE
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        # a tail call replaces the 'call' and the 'ret' with a 'tcall'
+        if self.tail_call:
+            return self.value.code_length()
+
+        return self.value.code_length() + 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        if self.tail_call:
+            return self.value.generate_code(context, tail=True)
+
+        code = self.value.generate_code(context)
+        code.append('ret')
+        context.increment()
+
+        return code
 
 
 class Break(Stmt):
@@ -167,37 +299,45 @@ class Break(Stmt):
     Represents a 'break' statement.
     """
 
+    FIELDS = ()
+    __slots__ = FIELDS
+
     def __str__(self):
         return 'Break'
 
-    def __eq__(self, other):
-        return type(other) == Break
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        if not context.in_loop():
+            raise MisplacedControlFlowError('\'break\' outside of a loop')
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        context.increment()
+        return [f'jmp {context.break_pos()}']
 
 
 class Continue(Stmt):
     """
     Represents a 'continue' statement.
     """
+
+    FIELDS = ()
+    __slots__ = FIELDS
+
     def __str__(self):
         return 'Continue'
 
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        if not context.in_loop():
+            raise MisplacedControlFlowError('\'continue\' outside of a loop')
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        context.increment()
+        return [f'jmp {context.continue_pos()}']
 
 
 class If(Stmt):
@@ -207,6 +347,9 @@ class If(Stmt):
     Let else be an empty list if the 'else' statement is empty.
     """
 
+    FIELDS = ('cond', 'if_code', 'else_code')
+    __slots__ = FIELDS
+
     def __init__(self, cond: Exp, if_code: [Stmt], else_code: [Stmt]):
         self.cond = cond
         self.if_code = if_code
@@ -218,20 +361,36 @@ class If(Stmt):
 
         return f'If({self.cond}, {self.if_code}, {self.else_code})'
 
-    def __eq__(self, other):
-        return type(other) == If and \
-                self.cond == other.cond and \
-               self.if_code == other.if_code and \
-               self.else_code == other.else_code
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        self.cond.analysis_pass(context)
+
+        for block in (self.if_code, self.else_code):
+            context.push_scope(self)
+            analyse_block(block, context)
+            context.pop_scope()
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return self.cond.code_length() + 2 + \
+               block_length(self.if_code) + block_length(self.else_code)
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        # cond; cjmp IF; <else>; jmp END; IF: <if>; END:
+        code = self.cond.generate_code(context)
+
+        start = context.get_counter()
+        if_pos = start + 2 + block_length(self.else_code)
+        end_pos = if_pos + block_length(self.if_code)
+
+        code.append(f'cjmp {if_pos}')
+        context.increment()
+
+        code += generate_block(self.else_code, context)
+        code.append(f'jmp {end_pos}')
+        context.increment()
+
+        code += generate_block(self.if_code, context)
+
+        return code
 
 
 class While(Stmt):
@@ -239,6 +398,9 @@ class While(Stmt):
     Represents a while statement.
     """
 
+    FIELDS = ('cond', 'code')
+    __slots__ = FIELDS
+
     def __init__(self, cond: Exp, code: [Stmt]):
         self.cond = cond
         self.code = code
@@ -246,19 +408,40 @@ class While(Stmt):
     def __str__(self):
         return f'While({self.cond}, {self.code})'
 
-    def __eq__(self, other):
-        return type(other) == While and \
-               self.cond == other.cond and \
-               self.code == other.code
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        self.cond.analysis_pass(context)
+
+        context.push_scope(self)
+        context.loop_depth += 1
+        analyse_block(self.code, context)
+        context.loop_depth -= 1
+        context.pop_scope()
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return self.cond.code_length() + 2 + block_length(self.code)
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        # the condition is placed after the body so that each iteration
+        # only takes a single conditional jump:
+        #
+        # jmp COND; BODY: <code>; COND: <cond>; cjmp BODY; END:
+        start = context.get_counter()
+        body_pos = start + 1
+        cond_pos = body_pos + block_length(self.code)
+        end_pos = cond_pos + self.cond.code_length() + 1
+
+        code = [f'jmp {cond_pos}']
+        context.increment()
+
+        context.push_loop(cond_pos, end_pos)
+        code += generate_block(self.code, context)
+        context.pop_loop()
+
+        code += self.cond.generate_code(context)
+        code.append(f'cjmp {body_pos}')
+        context.increment()
+
+        return code
 
 
 class FuncDecl(Decl):
@@ -266,6 +449,9 @@ class FuncDecl(Decl):
     Represents a function declaration.
     """
 
+    FIELDS = ('func_name', 'params', 'code')
+    __slots__ = FIELDS + ('local_count',)
+
     def __init__(self, func_name: str, params: [str], code: [Stmt]):
         self.func_name = func_name
         self.params = params
@@ -274,12 +460,6 @@ class FuncDecl(Decl):
     def __str__(self):
         return f'FuncDecl(\'{self.func_name}\', {self.params}, {self.code})'
 
-    def __eq__(self, other):
-        return type(other) == FuncDecl and \
-               self.func_name == other.func_name and \
-               self.params == other.params and \
-               self.code == other.code
-
     def register(self, context: SemanticContext) -> None:
         """
         Registers a function to the global scope.
@@ -289,14 +469,37 @@ class FuncDecl(Decl):
 
         context.glob().add_func(self.func_name, self)
 
+    def reserve_local(self) -> int:
+        """
+        Adds a slot to the frame of an analysed function, after those of
+        its variables, for a value kept by an optimization (see
+        'hidden_local'). Returns its index.
+        """
+
+        self.local_count += 1
+        return self.local_count - 1
+
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        context.enter_func(self)
+
+        for i in self.params:
+            context.add_var(i)
+
+        analyse_block(self.code, context)
+        self.local_count = context.exit_func()
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        # the implicit 'return NONE' at the end of every function
+        return block_length(self.code) + 2
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        # every function has its own program counter
+        context = CodeGenContext()
+
+        header = f'{self.func_name} {len(self.params)} {self.local_count}'
+        code = generate_block(self.code, context) + ['lnon', 'ret']
+
+        return [header] + code + [f':{self.func_name}']
 
 
 class Program(AST):
@@ -304,6 +507,10 @@ class Program(AST):
     The root node of our AST.
     """
 
+    FIELDS = ('var_decl', 'func_decl')
+    UNORDERED = ('var_decl', 'func_decl')
+    __slots__ = FIELDS + ('glob_var_count',)
+
     def __init__(self, declarations: [Decl]):
         self.var_decl = [i for i in declarations if isinstance(i, Declare)]
         self.func_decl = [i for i in declarations if isinstance(i, FuncDecl)]
@@ -311,13 +518,19 @@ class Program(AST):
     def __str__(self):
         return f'Program({self.var_decl}, {self.func_decl})'
 
-    def __eq__(self, other):
-        return type(other) == Program and \
-               compare_unordered(self.var_decl, other.var_decl) and \
-               compare_unordered(self.func_decl, other.func_decl)
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        glob = context.enter_global(self)
+
+        for i in self.func_decl:
+            i.register(context)
+
+        for i in self.var_decl:
+            i.analysis_pass(context)
+
+        for i in self.func_decl:
+            i.analysis_pass(context)
+
+        self.glob_var_count = glob.var_count()
 
     def code_length(self) -> int:
 
@@ -325,7 +538,12 @@ class Program(AST):
         pass
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        code = [str(self.glob_var_count), str(len(self.func_decl))]
+
+        for i in self.func_decl:
+            code += i.generate_code(context)
+
+        return code
 
 
 class BinOp(Exp):
@@ -340,29 +558,32 @@ class BinOp(Exp):
     be abused.
     """
 
+    FIELDS = ('op', 'left', 'right')
+    __slots__ = FIELDS + ('save',)
+
     def __init__(self, op: str, left: Exp, right: Exp):
         self.op = op
         self.left = left
         self.right = right
 
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        self.left.analysis_pass(context)
+        self.right.analysis_pass(context)
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return self.left.code_length() + self.right.code_length() + 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        code = self.left.generate_code(context)
+        code += self.right.generate_code(context)
+        code.append(BINOP_CODE[self.op])
+        context.increment()
+
+        return code
 
     def __str__(self):
         return f'{self.op}({self.left}, {self.right})'
 
-    def __eq__(self, other):
-        return type(other) == BinOp and \
-               self.op == other.op and \
-               self.left == other.left and \
-               self.right == other.right
-
 
 class UnOp(Exp):
     """
@@ -370,51 +591,63 @@ class UnOp(Exp):
     for you.
     """
 
+    FIELDS = ('op', 'value')
+    __slots__ = FIELDS + ('save',)
+
     def __init__(self, op: str, value: Exp):
         self.op = op
         self.value = value
 
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        self.value.analysis_pass(context)
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return self.value.code_length() + 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        code = self.value.generate_code(context)
+        code.append(UNOP_CODE[self.op])
+        context.increment()
+
+        return code
 
     def __str__(self):
         return f'{self.op}({self.value})'
 
-    def __eq__(self, other):
-        return type(other) == UnOp and \
-               self.op == other.op and \
-               self.value == other.value
-
 
 class Literal(Exp):
     """
     Represents a single literal value.
     """
 
+    FIELDS = ('value',)
+    __slots__ = FIELDS
+
     def __init__(self, value: str):
         self.value = value
 
     def __str__(self):
         return f'Literal(\'{self.value}\')'
 
-    def __eq__(self, other):
-        return type(other) == Literal and \
-               self.value == other.value
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        pass
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        context.increment()
+
+        if self.value == 'NONE':
+            return ['lnon']
+
+        elif self.value in ('TRUE', 'FALSE'):
+            return [f'lboo {int(self.value == "TRUE")}']
+
+        elif self.value.startswith('"'):
+            return [f'lstr {self.value}']
+
+        return [f'lint {self.value}']
 
 
 class VarExp(Exp):
@@ -422,24 +655,30 @@ class VarExp(Exp):
     Represents the evaluation of a variable.
     """
 
+    FIELDS = ('name',)
+    __slots__ = FIELDS + ('storage', 'slot')
+
     def __init__(self, name: str):
         self.name = name
 
     def __str__(self):
         return f'VarExp(\'{self.name}\')'
 
-    def __eq__(self, other):
-        return type(other) == VarExp and \
-               self.name == other.name
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        binding = context.resolve_var(self.name)
+        if binding is None:
+            raise UndeclaredIdentifierError(
+                f'Variable {self.name} is not declared'
+            )
+
+        self.storage, self.slot = binding
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        context.increment()
+        return [f'{LOAD_CODE[self.storage]} {self.slot}']
 
 
 class FuncCall(Exp):
@@ -447,6 +686,9 @@ class FuncCall(Exp):
     Represents a function invocation.
     """
 
+    FIELDS = ('name', 'params')
+    __slots__ = FIELDS + ('storage', 'slot')
+
     def __init__(self, name: str, params: [Exp]):
         self.name = name
         self.params = params
@@ -454,19 +696,43 @@ class FuncCall(Exp):
     def __str__(self):
         return f'FuncCall(\'{self.name}\', {self.params})'
 
-    def __eq__(self, other):
-        return type(other) == FuncCall and \
-               self.name == other.name and \
-               self.params == other.params
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        binding = context.resolve_func(self.name)
+        if binding is None:
+            raise UndeclaredIdentifierError(
+                f'Function {self.name} is not declared'
+            )
+
+        self.storage, self.slot, expected = binding
+
+        if len(self.params) != expected:
+            raise InvalidParametersError(
+                f'Function {self.name} takes {expected} parameters '
+                f'but {len(self.params)} were given'
+            )
+
+        for i in self.params:
+            i.analysis_pass(context)
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return sum(i.code_length() for i in self.params) + 1
 
-    def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+    def generate_code(
+            self,
+            context: CodeGenContext,
+            tail: bool = False
+        ) -> [str]:
+        code = []
+        for i in self.params:
+            code += i.generate_code(context)
+
+        if tail:
+            code.append(f'tcall {self.slot}')
+        else:
+            code.append(f'{CALL_CODE[self.storage]} {self.slot}')
+
+        context.increment()
+        return code
 
 
 class ExpStmt(Stmt):
@@ -474,38 +740,339 @@ class ExpStmt(Stmt):
     A statement where there is a single discarded expression value.
     """
 
+    FIELDS = ('value',)
+    __slots__ = FIELDS
+
     def __init__(self, value: Exp):
         self.value = value
 
     def __str__(self):
         return f'ExpStmt({self.value})'
 
-    def __eq__(self, other):
-        return type(other) == ExpStmt and \
-               self.value == other.value
-
     def analysis_pass(self, context: SemanticContext) -> None:
-        raise NotImplementedError
+        self.value.analysis_pass(context)
 
     def code_length(self) -> int:
-        raise NotImplementedError
+        return self.value.code_length() + 1
 
     def generate_code(self, context: CodeGenContext) -> [str]:
-        raise NotImplementedError
+        code = self.value.generate_code(context)
+        code.append('pop')
+        context.increment()
+
+        return code
 
 
-def compare_unordered(a, b):
+class Inlined(Exp):
     """
-    Compares two lists without considering their order.
-    Kinda ugly but AST nodes are not hashable.
+    The body of a user function spliced into a call by an optimization (see
+    inlining.py), with its locals moved to slots of the caller: runs 'code'
+    and evaluates to the value stored in the 'result' slot by its returns.
+    Only codegen.generate compiles it (see traversal.generate_inlined).
     """
 
-    b = list(b)
+    FIELDS = ('func_name', 'code')
+    __slots__ = FIELDS + ('result',)
+
+    def __init__(self, func_name: str, code: [Stmt], result: int):
+        self.func_name = func_name
+        self.code = code
+        self.result = result
+
+    def __str__(self):
+        return f'Inlined(\'{self.func_name}\', {self.code})'
 
-    try:
-        for i in a:
-            b.remove(i)
-    except ValueError:
+    def analysis_pass(self, context: SemanticContext) -> None:
+        # made of nodes that are already analysed
+        pass
+
+
+class InlinedReturn(Stmt):
+    """
+    A return statement of an inlined body: stores its value in the result
+    slot of the innermost Inlined and jumps after its code, unless it is
+    'last' and the code ends right after it anyway.
+    """
+
+    FIELDS = ('value',)
+    __slots__ = FIELDS + ('last',)
+
+    def __init__(self, value: Exp):
+        self.value = value
+        self.last = False
+
+    def __str__(self):
+        return f'InlinedReturn({self.value})'
+
+    def analysis_pass(self, context: SemanticContext) -> None:
+        # made of nodes that are already analysed
+        pass
+
+
+def hidden_local(slot: int) -> VarExp:
+    """
+    A resolved variable of a slot reserved with FuncDecl.reserve_local,
+    whose name no declaration can have.
+    """
+
+    node = VarExp(f'%{slot}')
+    node.storage, node.slot = LOCAL, slot
+
+    return node
+
+
+def analyse_block(code: [Stmt], context: SemanticContext) -> None:
+    for i in code:
+        i.analysis_pass(context)
+
+
+def block_length(code: [Stmt]) -> int:
+    return sum(i.code_length() for i in code)
+
+
+def generate_block(code: [Stmt], context: CodeGenContext) -> [str]:
+    out = []
+    for i in code:
+        out += i.generate_code(context)
+
+    return out
+
+
+def children(node: AST) -> [AST]:
+    out = []
+    for field in node.FIELDS:
+        value = getattr(node, field)
+
+        if isinstance(value, AST):
+            out.append(value)
+        elif isinstance(value, list):
+            out += [i for i in value if isinstance(i, AST)]
+
+    return out
+
+
+def copy_tree(root: AST, rewrite=None) -> AST:
+    """
+    A copy of the tree under 'root', where every copied node is replaced by
+    'rewrite(node)' if given, after its children.
+    """
+
+    order = []
+    work = [root]
+    while work:
+        node = work.pop()
+        order.append(node)
+        work += children(node)
+
+    copies = {}
+    for node in reversed(order):
+        kind = type(node)
+
+        copy = AST.__new__(kind)
+        for name in kind.__slots__:
+            if name not in kind.FIELDS and hasattr(node, name):
+                setattr(copy, name, getattr(node, name))
+
+        for field in node.FIELDS:
+            value = getattr(node, field)
+
+            if isinstance(value, AST):
+                setattr(copy, field, copies[id(value)])
+            elif isinstance(value, list):
+                setattr(copy, field, [
+                    copies[id(i)] if isinstance(i, AST) else i for i in value
+                ])
+            else:
+                setattr(copy, field, value)
+
+        copies[id(node)] = rewrite(copy) if rewrite else copy
+
+    return copies[id(root)]
+
+
+class ValueNumbers:
+    """
+    Numbers the expressions without calls of an analysed tree, so that
+    equal numbers compute the same value from the same variables: by
+    structure and by the slots of their variables, which can share a name.
+    Every node is numbered once, by id, so a pass takes new numbers after
+    rewriting the tree.
+    """
+
+    def __init__(self):
+        self.numbers = {}
+        self.by_id = {}
+
+    def number(self, root: Exp):
+        """
+        The number of an expression, or None if it calls a function.
+        """
+
+        if id(root) in self.by_id:
+            return self.by_id[id(root)]
+
+        order = []
+        work = [root]
+        while work:
+            node = work.pop()
+
+            if id(node) not in self.by_id:
+                order.append(node)
+                work += children(node)
+
+        for node in reversed(order):
+            kind = type(node)
+
+            if kind is VarExp:
+                key = kind, node.storage, node.slot
+            elif kind is Literal:
+                key = kind, node.value
+            elif kind is BinOp:
+                key = kind, node.op, self.by_id[id(node.left)], \
+                    self.by_id[id(node.right)]
+            elif kind is UnOp:
+                key = kind, node.op, self.by_id[id(node.value)]
+            else:
+                key = None
+
+            if key is not None and None not in key:
+                key = self.numbers.setdefault(key, len(self.numbers))
+            else:
+                key = None
+
+            self.by_id[id(node)] = key
+
+        return self.by_id[id(root)]
+
+
+def field_key(node: AST, field: str):
+    """
+    The hashable value of a field of a node whose children are hashed, which
+    become the children of the node (see AST.forget_hash).
+    """
+
+    value = getattr(node, field)
+
+    if isinstance(value, AST):
+        object.__setattr__(value, '_parent', node)
+        return value._hash
+
+    if isinstance(value, list):
+        keys = []
+        for i in value:
+            if isinstance(i, AST):
+                object.__setattr__(i, '_parent', node)
+                keys.append(i._hash)
+            else:
+                keys.append(i)
+
+        return tuple(sorted(keys) if field in node.UNORDERED else keys)
+
+    return value
+
+
+def structural_hash(root: AST) -> int:
+    """
+    The hash of a node, computed for the nodes under it whose hash is not
+    cached, children first, and cached on them.
+    """
+
+    if root._hash is not None:
+        return root._hash
+
+    if not hasattr(root, '_parent'):
+        object.__setattr__(root, '_parent', None)
+
+    # parents before their children
+    order = []
+    work = [root]
+    while work:
+        node = work.pop()
+        order.append(node)
+        work += [i for i in children(node) if i._hash is None]
+
+    for node in reversed(order):
+        object.__setattr__(node, '_hash', hash(
+            (type(node).__name__,) +
+            tuple(field_key(node, i) for i in node.FIELDS)
+        ))
+
+    return root._hash
+
+
+def structural_equal(a: AST, b: AST) -> bool:
+    """
+    Whether two trees have the same structure, walking them side by side
+    until they differ. Nodes whose cached hashes differ are told apart
+    without walking them; unordered lists whose elements differ in order
+    are matched by hash (see compare_unordered).
+    """
+
+    pairs = [(a, b)]
+
+    while pairs:
+        a, b = pairs.pop()
+
+        if a is b:
+            continue
+
+        if type(a) is not type(b):
+            return False
+
+        if a._hash is not None and b._hash is not None and \
+           a._hash != b._hash:
+            return False
+
+        for field in a.FIELDS:
+            x, y = getattr(a, field), getattr(b, field)
+
+            if isinstance(x, list) and isinstance(y, list):
+                if len(x) != len(y):
+                    return False
+
+                if field in a.UNORDERED:
+                    if not compare_unordered(x, y):
+                        return False
+
+                elif x and isinstance(x[0], AST):
+                    pairs += zip(x, y)
+
+                elif x != y:
+                    return False
+
+            elif isinstance(x, AST):
+                pairs.append((x, y))
+
+            elif x != y:
+                return False
+
+    return True
+
+
+def compare_unordered(a: list, b: list) -> bool:
+    """
+    Compares two lists without considering their order: in order first,
+    otherwise in linear time by matching the elements of equal hashes.
+    """
+
+    if len(a) != len(b):
         return False
 
-    return True
\ No newline at end of file
+    if all(i == j for i, j in zip(a, b)):
+        return True
+
+    buckets = {}
+    for i in b:
+        buckets.setdefault(hash(i), []).append(i)
+
+    for i in a:
+        bucket = buckets.get(hash(i), [])
+
+        for j, candidate in enumerate(bucket):
+            if i == candidate:
+                del bucket[j]
+                break
+        else:
+            return False
+
+    return True
@@ -0,0 +1,260 @@
+from day3_semantic_analysis.semantic_context import GLOBAL, FUNCTION
+
+from .ast import *
+from .traversal import walk
+
+
+# Common subexpression elimination on an analysed AST, within every run of
+# statements that executes straight through (a basic block): an operation
+# without calls that is computed again while none of its variables can have
+# changed keeps its value in a hidden local the first time (see
+# FuncDecl.reserve_local), and loads it the next times. The first occurrence
+# is still computed where it was, so errors happen at the same point.
+#
+# Expressions are matched by their value number (see ValueNumbers), so by
+# structure and by the slots of their variables: a block can hold two
+# variables of the same name once folding splices the body of an 'if' into
+# it. A variable changes when it is assigned or declared again, and a global
+# also when a user function is called.
+
+
+class Available:
+    """
+    A computed operation: its value number, its first occurrence, the equal
+    ones that can load its value instead, its variables (storage, slot) and
+    whether one of them is global, and its amount of instructions.
+    """
+
+    def __init__(
+            self,
+            number: int,
+            node: Exp,
+            variables: set,
+            reads_global: bool,
+            size: int
+        ):
+        self.number = number
+        self.first = node
+        self.uses = []
+        self.variables = variables
+        self.reads_global = reads_global
+        self.size = size
+
+    def worth_it(self) -> bool:
+        # saving the value costs an 'lstore' and an 'lload', and every use
+        # replaces the instructions of the operation by an 'lload'
+        return (self.size - 1) * len(self.uses) >= 2
+
+
+class Blocks:
+    """
+    The state of the pass over a function: the operations available in the
+    current block, by value number and by variable, and those found in the
+    function so far.
+
+    'info' maps the id of every expression visited and without calls to
+    its (variables, reads a global, size).
+    """
+
+    def __init__(self):
+        self.available = {}
+        self.by_variable = {}
+        self.found = []
+        self.info = {}
+        self.numbers = ValueNumbers()
+
+    def reset(self):
+        self.available = {}
+        self.by_variable = {}
+
+    def add(self, entry: Available):
+        self.available[entry.number] = entry
+        self.found.append(entry)
+
+        for variable in entry.variables:
+            self.by_variable.setdefault(variable, []).append(entry)
+
+        if entry.reads_global:
+            self.by_variable.setdefault(None, []).append(entry)
+
+    def kill(self, variable: tuple):
+        """
+        Forgets the operations that read a variable (storage, slot), or a
+        global if 'variable' is None.
+        """
+
+        for entry in self.by_variable.pop(variable, ()):
+            if self.available.get(entry.number) is entry:
+                del self.available[entry.number]
+
+
+def visit_function(node: FuncDecl, blocks: Blocks) -> list:
+    return [(blocks.reset,), *node.code, (finish_function, node, blocks)]
+
+
+def finish_function(node: FuncDecl, blocks: Blocks):
+    replaced = {}
+
+    for entry in blocks.found:
+        if not entry.worth_it():
+            continue
+
+        slot = node.reserve_local()
+        entry.first.save = slot
+
+        for i in entry.uses:
+            replaced[id(i)] = hidden_local(slot)
+
+    if replaced:
+        replace_nodes(node, replaced)
+
+    blocks.found = []
+    blocks.info = {}
+    blocks.numbers = ValueNumbers()
+
+
+def replace_nodes(root: AST, replaced: dict):
+    """
+    Replaces the nodes under 'root' whose id is in 'replaced'.
+    """
+
+    work = [root]
+
+    while work:
+        node = work.pop()
+
+        for field in node.FIELDS:
+            value = getattr(node, field)
+
+            if isinstance(value, AST):
+                if id(value) in replaced:
+                    setattr(node, field, replaced[id(value)])
+                else:
+                    work.append(value)
+
+            elif isinstance(value, list) and \
+                 any(id(i) in replaced for i in value):
+                setattr(node, field, [replaced.get(id(i), i) for i in value])
+                work += [i for i in value if id(i) not in replaced]
+
+            elif isinstance(value, list):
+                work += [i for i in value if isinstance(i, AST)]
+
+
+def visit_operation(node: Exp, blocks: Blocks) -> list:
+    entry = blocks.available.get(blocks.numbers.number(node))
+    if entry is not None:
+        entry.uses.append(node)
+        blocks.info[id(node)] = (
+            entry.variables, entry.reads_global, entry.size
+        )
+        return []
+
+    children = [node.left, node.right] if type(node) is BinOp \
+               else [node.value]
+
+    return children + [(add_operation, node, children, blocks)]
+
+
+def add_operation(node: Exp, children: list, blocks: Blocks):
+    info = [blocks.info.get(id(i)) for i in children]
+    if None in info:
+        # an operand calls a function
+        return
+
+    variables = set().union(*(i[0] for i in info))
+    reads_global = any(i[1] for i in info)
+    size = sum(i[2] for i in info) + 1
+
+    blocks.info[id(node)] = (variables, reads_global, size)
+
+    blocks.add(Available(
+        blocks.numbers.number(node), node, variables, reads_global, size
+    ))
+
+
+def visit_var_exp(node: VarExp, blocks: Blocks) -> list:
+    blocks.info[id(node)] = (
+        {(node.storage, node.slot)}, node.storage == GLOBAL, 1
+    )
+    return []
+
+
+def visit_literal(node: Literal, blocks: Blocks) -> list:
+    blocks.info[id(node)] = (set(), False, 1)
+    return []
+
+
+def visit_func_call(node: FuncCall, blocks: Blocks) -> list:
+    return list(node.params) + [(called, node, blocks)]
+
+
+def called(node: FuncCall, blocks: Blocks):
+    # natives do not change variables
+    if node.storage == FUNCTION:
+        blocks.kill(None)
+
+
+def visit_assign(node: Assign, blocks: Blocks) -> list:
+    return [node.value, (assigned, [(node.storage, node.slot)], blocks)]
+
+
+def assigned(variables: [tuple], blocks: Blocks):
+    for variable in variables:
+        blocks.kill(variable)
+
+
+def visit_if(node: If, blocks: Blocks) -> list:
+    # the condition is the end of the current block
+    return [
+        node.cond,
+        (blocks.reset,), *node.if_code,
+        (blocks.reset,), *node.else_code,
+        (blocks.reset,)
+    ]
+
+
+def visit_while(node: While, blocks: Blocks) -> list:
+    # the condition is a block of its own, run after every iteration
+    return [
+        (blocks.reset,), node.cond,
+        (blocks.reset,), *node.code,
+        (blocks.reset,)
+    ]
+
+
+def visit_inlined(node: Inlined, blocks: Blocks) -> list:
+    # the code of an inlined function is blocks of its own, and its value
+    # is never reused since its returns are jumps
+    return [(blocks.reset,), *node.code, (blocks.reset,)]
+
+
+HANDLERS = {
+    Program: lambda node, blocks: list(node.func_decl),
+    FuncDecl: visit_function,
+    Declare: lambda node, blocks: [(assigned, node.slots, blocks)],
+    Assign: visit_assign,
+    Return: lambda node, blocks: [node.value, (blocks.reset,)],
+    Break: lambda node, blocks: [(blocks.reset,)],
+    Continue: lambda node, blocks: [(blocks.reset,)],
+    If: visit_if,
+    While: visit_while,
+    BinOp: visit_operation,
+    UnOp: visit_operation,
+    Literal: visit_literal,
+    VarExp: visit_var_exp,
+    FuncCall: visit_func_call,
+    ExpStmt: lambda node, blocks: [node.value],
+    Inlined: visit_inlined,
+    InlinedReturn: lambda node, blocks: [node.value, (blocks.reset,)]
+}
+
+
+def eliminate_common_subexpressions(node: AST) -> None:
+    """
+    Computes the operations repeated in the blocks of an analysed program
+    (or function) only once, in place. Runs after fold_constants and
+    hoist_loop_invariants, before codegen.generate.
+    """
+
+    walk(node, HANDLERS, Blocks())
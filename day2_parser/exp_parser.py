@@ -1,51 +1,74 @@
-from typing import Callable
-
 from day1_lexer import TokenType, ParserError
 
 from .ast import *
 from .parser import FIRST_SET, Reader, parse_exp_list
 
 
+# the precedence of every binary operator (higher binds tighter); all of them
+# are left associative, see source_grammar.cf
+BINARY_OPERATORS = {
+    '||': 1,
+    '&&': 2,
+    '==': 3, '!=': 3, '<=': 3, '>=': 3, '<': 3, '>': 3,
+    '+': 4, '-': 4,
+    '*': 5, '/': 5
+}
+
+FIRST_SET['binop'] = set(BINARY_OPERATORS)
+
+
 def parse_exp(reader: Reader) -> Exp:
-    return parse_or(reader)
+    return parse_binary(reader, parse_exp_imm(reader))
 
 
-def exp_parser_template(
-        first_sym: set,
-        upper: Callable[[Reader], Exp]
-    ) -> Callable[[Reader], Exp]:
+def parse_binary(reader: Reader, start: Exp) -> Exp:
     """
-    Just a function builder.
+    Parses the binary operations following an already parsed operand.
+
+    Instead of a function per precedence level, operators wait on a stack
+    until an operator of lower or equal precedence (or the end of the
+    expression) shows that their right operand is complete, so that long
+    chains of operators need neither recursion nor intermediate closures.
     """
 
-    def parse_infix(reader: Reader) -> Exp:
-        """
-        Parses an infix operation whose precedence is the same as 'mul' and 'div'.
+    operands = [start]
+    operators = []
+
+    def reduce():
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(BinOp(operators.pop(), left, right))
+
+    while reader.test_set(FIRST_SET['binop']):
+        op = reader.match(TokenType.OPERATOR)
+        precedence = BINARY_OPERATORS[op]
+
+        while operators and BINARY_OPERATORS[operators[-1]] >= precedence:
+            reduce()
 
-        Check source_grammar.cf for a definitive grammar guide. Note the
-        elimination of left recursions.
-        """
+        operators.append(op)
+        operands.append(parse_exp_imm(reader))
 
-        def parse_partial(reader: Reader) -> Callable[[Exp], Exp]:
-            # since there is no AST node directly corresponding to the
-            # eliminated version of a binary operation, a bit of currying is
-            # used here for generalizablity
+    while operators:
+        reduce()
 
-            if not reader.test_set(first_sym):
-                return lambda x: x
+    return operands[0]
 
-            sym = reader.match(TokenType.OPERATOR)
-            end = upper(reader)
 
-            tail = parse_partial(reader)
-            build = lambda start, sym=sym, end=end: BinOp(sym, start, end)
+def parse_identifier_exp(reader: Reader, name: str) -> Exp:
+    """
+    Parses the rest of a variable or a function call whose name has already
+    been matched.
+    """
 
-            return lambda x: tail(build(x))
+    if reader.test('('):
+        reader.match('(')
+        params = parse_exp_list(reader)
+        reader.match(')')
 
-        start_exp = upper(reader) # non-recursive non-terminals
-        return parse_partial(reader)(start_exp)
+        return FuncCall(name, params)
 
-    return parse_infix
+    return VarExp(name)
 
 
 def parse_exp_imm(reader: Reader) -> Exp:
@@ -68,16 +91,7 @@ def parse_exp_imm(reader: Reader) -> Exp:
         return UnOp(reader.match(TokenType.OPERATOR), parse_exp_imm(reader))
 
     elif reader.test_set(FIRST_SET['identifier']):
-        name = reader.match(TokenType.IDENTIFIER)
-
-        if reader.test('('):
-            reader.match('(')
-            params = parse_exp_list(reader)
-            reader.match(')')
-
-            return FuncCall(name, params)
-
-        return VarExp(name)
+        return parse_identifier_exp(reader, reader.match(TokenType.IDENTIFIER))
 
     elif reader.test_set(FIRST_SET['paren_exp']):
         reader.match('(')
@@ -88,15 +102,7 @@ def parse_exp_imm(reader: Reader) -> Exp:
 
     else:
         raise ParserError(
-            f'Token {reader.peek()} does not match the first '
-            'set of immediate values'
+            f'Token {reader.peek()} at {reader.position()} does not '
+            'match the first set of immediate values'
         )
 
-
-parse_term = exp_parser_template({'*', '/'}, parse_exp_imm)
-parse_numeric = exp_parser_template({'+', '-'}, parse_term)
-parse_compare = exp_parser_template({
-    '==', '!=', '<=', '>=', '<', '>'
-}, parse_numeric)
-parse_and = exp_parser_template({'&&'}, parse_compare)
-parse_or = exp_parser_template({'||'}, parse_and)
\ No newline at end of file
@@ -0,0 +1,256 @@
+from day5_virtual_machine.byte_loader import format_str, quote_str
+
+from .ast import *
+from .traversal import walk
+
+
+# Constant folding and dead branch elimination on an analysed AST: an
+# operation whose operands are all literals is replaced by the literal of
+# its result, computed with the semantics of the virtual machine (see
+# VirtualMachine.execute), and the statements that a literal condition
+# never runs are removed. Operations that fail (e.g. a division by zero)
+# are left to fail at runtime.
+
+# the longest string built at compile time, so that repeating a string
+# does not grow the bytecode
+MAX_STRING = 256
+
+
+def multiply(a, b):
+    if isinstance(a, str) or isinstance(b, str):
+        string, count = (a, b) if isinstance(a, str) else (b, a)
+
+        if isinstance(count, int) and len(string) * count > MAX_STRING:
+            raise OverflowError('string too long to fold')
+
+    return a * b
+
+
+# by operator, on the values of the left and the right operand
+BINARY = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '&&': lambda a, b: a and b,
+    '||': lambda a, b: a or b,
+    '<': lambda a, b: a < b,
+    '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b,
+    '>=': lambda a, b: a >= b,
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': multiply,
+    '/': lambda a, b: a // b
+}
+
+UNARY = {
+    '-': lambda a: -a,
+    '!': lambda a: not a
+}
+
+def literal_value(node: Literal):
+    """
+    The value the virtual machine loads for a literal.
+    """
+
+    if node.value == 'NONE':
+        return None
+
+    if node.value in ('TRUE', 'FALSE'):
+        return node.value == 'TRUE'
+
+    if node.value.startswith('"'):
+        return format_str(node.value)
+
+    return int(node.value)
+
+
+def value_literal(value) -> Literal:
+    """
+    The literal the virtual machine loads as 'value', or None if there is
+    none.
+    """
+
+    if value is None:
+        return Literal('NONE')
+
+    if isinstance(value, bool):
+        return Literal('TRUE' if value else 'FALSE')
+
+    if isinstance(value, int):
+        return Literal(str(value))
+
+    text = quote_str(value)
+
+    # a backslash before 'n', 't' or 'r' would be read as an escape
+    if '"' in value or len(value) > MAX_STRING or format_str(text) != value:
+        return None
+
+    return Literal(text)
+
+
+# operators whose result is always a boolean
+BOOLEAN = {'==', '!=', '<', '>', '<=', '>='}
+
+
+def is_boolean(node: Exp) -> bool:
+    kind = type(node)
+
+    return kind is BinOp and node.op in BOOLEAN or \
+           kind is UnOp and node.op == '!' or \
+           kind is Literal and node.value in ('TRUE', 'FALSE')
+
+
+def simplify(node: BinOp) -> Exp:
+    """
+    The operand that 'x && TRUE', 'x || FALSE' (where x is a boolean),
+    'TRUE && x' and 'FALSE || x' evaluate to, or the operation itself.
+    Both operands are always evaluated, so only a literal is dropped.
+    """
+
+    identity = {'&&': 'TRUE', '||': 'FALSE'}.get(node.op)
+
+    if type(node.left) is Literal and node.left.value == identity:
+        return node.right
+
+    if type(node.right) is Literal and node.right.value == identity and \
+       is_boolean(node.left):
+        return node.left
+
+    return node
+
+
+def fold(node: Exp) -> Exp:
+    """
+    The literal of an operation on literals, or the operation itself.
+    """
+
+    kind = type(node)
+
+    if kind is BinOp and node.op in ('&&', '||'):
+        node = simplify(node)
+        kind = type(node)
+
+    if kind is BinOp and type(node.left) is Literal and \
+       type(node.right) is Literal:
+        operation = BINARY[node.op]
+        operands = (node.left, node.right)
+
+    elif kind is UnOp and type(node.value) is Literal:
+        operation = UNARY[node.op]
+        operands = (node.value,)
+
+    else:
+        return node
+
+    try:
+        value = operation(*(literal_value(i) for i in operands))
+    except (TypeError, ArithmeticError):
+        return node
+
+    return value_literal(value) or node
+
+
+def prune(code: [Stmt]) -> [Stmt]:
+    """
+    Replaces the conditionals on a literal by the branch that runs, and
+    removes the loops that never run and the statements without effects.
+    """
+
+    out = []
+
+    for i in code:
+        kind = type(i)
+
+        if kind is If and type(i.cond) is Literal:
+            out += i.if_code if literal_value(i.cond) else i.else_code
+
+        elif kind is While and type(i.cond) is Literal and \
+             not literal_value(i.cond):
+            pass
+
+        elif kind is ExpStmt and type(i.value) is Literal:
+            pass
+
+        else:
+            out.append(i)
+
+    return out
+
+
+def expand(node: AST, _) -> list:
+    kind = type(node)
+
+    if kind is BinOp:
+        nodes = [node.left, node.right]
+
+    elif kind in (Assign, Return, UnOp, ExpStmt):
+        nodes = [node.value]
+
+    elif kind is If:
+        nodes = [node.cond] + node.if_code + node.else_code
+
+    elif kind is While:
+        nodes = [node.cond] + node.code
+
+    elif kind is FuncCall:
+        nodes = list(node.params)
+
+    elif kind is FuncDecl:
+        nodes = list(node.code)
+
+    elif kind is Program:
+        nodes = list(node.func_decl)
+
+    else:
+        nodes = []
+
+    return nodes + [(rebuild, node)]
+
+
+def rebuild(node: AST):
+    """
+    Folds the expressions and prunes the blocks of a node, once its
+    children are rebuilt.
+    """
+
+    kind = type(node)
+
+    if kind is BinOp:
+        node.left = fold(node.left)
+        node.right = fold(node.right)
+
+    elif kind in (Assign, Return, UnOp, ExpStmt):
+        node.value = fold(node.value)
+
+    elif kind is If:
+        node.cond = fold(node.cond)
+        node.if_code = prune(node.if_code)
+        node.else_code = prune(node.else_code)
+
+    elif kind is While:
+        node.cond = fold(node.cond)
+        node.code = prune(node.code)
+
+    elif kind is FuncCall:
+        node.params = [fold(i) for i in node.params]
+
+    elif kind is FuncDecl:
+        node.code = prune(node.code)
+
+
+HANDLERS = {
+    i: expand for i in (
+        Program, Declare, Assign, Return, Break, Continue, If, While,
+        FuncDecl, BinOp, UnOp, Literal, VarExp, FuncCall, ExpStmt
+    )
+}
+
+
+def fold_constants(node: Program) -> None:
+    """
+    Folds the constant expressions and removes the dead branches of an
+    analysed program, in place. Runs between semantics.analysis and
+    codegen.generate.
+    """
+
+    walk(node, HANDLERS, None)
@@ -0,0 +1,471 @@
+import re
+import sys
+import pprint
+
+
+# Symbols of a production are tuples:
+# - ('T', key): a terminal, matched against the key of a token (see
+#   table_parser.token_key): its content, or '<Name>' for a token category
+# - ('N', name): a nonterminal
+# - ('A', label, size, keep): an action, which replaces the values of the
+#   last 'size' symbols with the node built by 'label' (see
+#   table_parser.build); 'keep' is the position of the value that '_',
+#   'Snoc' and 'Single' keep
+#
+# Actions do not consume input, so that moving them around while
+# rewriting the grammar keeps the trees the same.
+
+# the categories of tokens that are not spelled out in the grammar
+BUILTIN_TOKENS = ['Integer', 'String', 'Char', 'Double', 'Ident']
+
+END = '<$>'
+
+# the action of the rules that pass the value of their only symbol through
+IDENTITY = ('A', '_', 1, 0)
+
+START = "Start'"
+
+# LBNF statements, which all end with a ';' out of quotes
+STATEMENT = re.compile(r'(?:"[^"]*"|[^;"])+')
+RULE = re.compile(r'(\w+)\s*\.\s*(\w+)\s*::=(.*)')
+PRAGMA = re.compile(r'(entrypoints|separator|terminator|coercions|token)\s')
+ITEM = re.compile(r'"([^"]*)"|\[(\w+)\]|(\w+)')
+
+
+def read_grammar(text: str) -> (str, [(str, list)], set):
+    """
+    Reads an LBNF grammar (as in source_grammar.cf) into its start
+    category, its productions as (category, symbols) with their action last,
+    and the categories of tokens.
+
+    Only the subset of LBNF that the grammar uses is supported: labelled
+    rules, 'entrypoints', 'separator', 'terminator', 'coercions' and
+    'token'.
+    """
+
+    start = None
+    productions = []
+    tokens = set(BUILTIN_TOKENS)
+
+    for statement in STATEMENT.findall(re.sub(r'--.*', '', text)):
+        statement = ' '.join(statement.split())
+        if not statement:
+            continue
+
+        match = RULE.fullmatch(statement)
+        if match:
+            label, category, items = match.groups()
+            symbols = read_items(items)
+            keep = next(
+                (i for i, symbol in enumerate(symbols) if symbol[0] == 'N'),
+                None
+            )
+
+            productions.append((
+                category,
+                symbols + [('A', label, len(symbols), keep)]
+            ))
+            continue
+
+        match = PRAGMA.match(statement)
+        if not match:
+            raise ValueError(f'Unknown grammar statement: {statement}')
+
+        pragma, args = match.group(1), statement[match.end():]
+
+        if pragma == 'entrypoints':
+            start = start or args.split(',')[0].strip()
+
+        elif pragma == 'token':
+            tokens.add(args.split()[0])
+
+        elif pragma == 'coercions':
+            category, count = args.split()
+            productions += coercions(category, int(count))
+
+        else:
+            category, separator = args.split(None, 1)
+            productions += list_rules(
+                category,
+                [i for i in read_items(separator) if i[1]],
+                pragma
+            )
+
+    if start is None:
+        raise ValueError('The grammar has no entrypoints')
+
+    # rules refer to the token categories like to any other category
+    productions = [
+        (category, [
+            ('T', f'<{i[1]}>') if i[0] == 'N' and i[1] in tokens else i
+            for i in symbols
+        ])
+        for category, symbols in productions
+    ]
+
+    return start, productions, tokens
+
+
+def read_items(items: str) -> list:
+    symbols = []
+
+    for literal, list_category, category in ITEM.findall(items):
+        if list_category:
+            symbols.append(('N', f'[{list_category}]'))
+        elif category:
+            symbols.append(('N', category))
+        else:
+            symbols.append(('T', literal))
+
+    return symbols
+
+
+def coercions(category: str, count: int) -> [(str, list)]:
+    """
+    'coercions Exp 2' stands for 'Exp ::= Exp1', 'Exp1 ::= Exp2' and
+    'Exp2 ::= "(" Exp ")"', none of which builds a node.
+    """
+
+    levels = [category] + [f'{category}{i}' for i in range(1, count + 1)]
+
+    productions = [
+        (upper, [('N', lower), IDENTITY])
+        for upper, lower in zip(levels, levels[1:])
+    ]
+    productions.append((levels[-1], [
+        ('T', '('), ('N', category), ('T', ')'), ('A', '_', 3, 1)
+    ]))
+
+    return productions
+
+
+def list_rules(category: str, separator: list, pragma: str):
+    """
+    The productions of '[Category]' with the given separator or terminator,
+    as left recursions so that the list is built by appending.
+    """
+
+    name = f'[{category}]'
+    item = ('N', category)
+
+    if pragma == 'terminator':
+        return [
+            (name, [('A', 'Nil', 0, None)]),
+            (name, [('N', name), item] + separator + [
+                ('A', 'Snoc', 2 + len(separator), 1)
+            ])
+        ]
+
+    # a possibly empty list, of a list with at least one item
+    items = f'[{category}]1'
+    return [
+        (name, [('A', 'Nil', 0, None)]),
+        (name, [('N', items), IDENTITY]),
+        (items, [item, ('A', 'Single', 1, 0)]),
+        (items, [('N', items)] + separator + [
+            item, ('A', 'Snoc', 2 + len(separator), 1 + len(separator))
+        ])
+    ]
+
+
+class Grammar:
+    """
+    A context free grammar, rewritten into LL(1) form on construction.
+    """
+
+    def __init__(self, start: str, productions: [(str, list)]):
+        self.start = START
+        self.rules = {START: [[('N', start), ('T', END)]]}
+        for category, symbols in productions:
+            self.rules.setdefault(category, []).append(list(symbols))
+
+        for category in list(self.rules):
+            self.eliminate_left_recursion(category)
+
+        self.make_ll1()
+
+    def fresh(self, category: str, suffix: str) -> str:
+        i = 1
+        while f'{category}_{suffix}{i}' in self.rules:
+            i += 1
+
+        return f'{category}_{suffix}{i}'
+
+    def eliminate_left_recursion(self, category: str):
+        """
+        'A ::= A x | y' becomes 'A ::= y T', 'T ::= x T |' (with T fresh).
+        Only direct left recursion is supported.
+        """
+
+        recursive = [
+            i[1:] for i in self.rules[category] if i[:1] == [('N', category)]
+        ]
+        if not recursive:
+            return
+
+        tail = self.fresh(category, 'tail')
+        self.rules[category] = [
+            i + [('N', tail)] for i in self.rules[category]
+            if i[:1] != [('N', category)]
+        ]
+        self.rules[tail] = [i + [('N', tail)] for i in recursive] + [[]]
+
+    def left_factor(self, category: str) -> bool:
+        """
+        'A ::= x y | x z' becomes 'A ::= x F', 'F ::= y | z' (with F fresh).
+        Returns whether anything was factored.
+        """
+
+        alternatives = self.rules[category]
+
+        for i, first in enumerate(alternatives):
+            group = [j for j in alternatives if j[:1] == first[:1]]
+            if not first or len(group) < 2:
+                continue
+
+            prefix = []
+            for symbols in zip(*group):
+                if any(j != symbols[0] for j in symbols):
+                    break
+                prefix.append(symbols[0])
+
+            factored = self.fresh(category, '')
+            self.rules[factored] = [j[len(prefix):] for j in group]
+            self.rules[category] = [
+                j for j in alternatives if j[:1] != first[:1]
+            ]
+            self.rules[category].insert(i, prefix + [('N', factored)])
+
+            return True
+
+        return False
+
+    def make_ll1(self):
+        """
+        Left factors the grammar, and expands the leading nonterminals of
+        the alternatives whose predictions overlap until they no longer do
+        (e.g. an assignment and an expression statement both start with an
+        identifier, but only the expression's start is visible through
+        'Exp').
+        """
+
+        for _ in range(1000):
+            for category in list(self.rules):
+                while self.left_factor(category):
+                    pass
+
+            self.compute_sets()
+
+            conflict = self.find_conflict()
+            if conflict is None:
+                return
+
+            category, alternatives = conflict
+            expanded = False
+
+            for symbols in alternatives:
+                # the first symbol that is not an action
+                pos = 0
+                while pos < len(symbols) and symbols[pos][0] == 'A':
+                    pos += 1
+
+                if pos == len(symbols) or symbols[pos][0] != 'N' or \
+                   symbols[pos][1] == category:
+                    continue
+
+                rest = symbols[pos + 1:]
+                index = self.rules[category].index(symbols)
+                self.rules[category][index : index + 1] = [
+                    symbols[:pos] + i + rest
+                    for i in self.rules[symbols[pos][1]]
+                ]
+                expanded = True
+                break
+
+            if not expanded:
+                overlap = self.predict(category, alternatives[0]) & \
+                          self.predict(category, alternatives[1])
+                raise ValueError(
+                    f'The grammar is not LL(1): the alternatives of '
+                    f'{category} overlap on {sorted(overlap)}'
+                )
+
+        raise ValueError('The grammar could not be made LL(1)')
+
+    def first_of(self, symbols: list) -> (set, bool):
+        """
+        The terminals that can start 'symbols', and whether 'symbols' can
+        derive the empty string.
+        """
+
+        first = set()
+        for symbol in symbols:
+            if symbol[0] == 'T':
+                first.add(symbol[1])
+                return first, False
+
+            if symbol[0] == 'N':
+                first |= self.first[symbol[1]]
+                if symbol[1] not in self.nullable:
+                    return first, False
+
+        return first, True
+
+    def compute_sets(self):
+        """
+        Computes the FIRST and FOLLOW sets of every nonterminal.
+        """
+
+        self.first = {i: set() for i in self.rules}
+        self.nullable = set()
+
+        changed = True
+        while changed:
+            changed = False
+
+            for category, alternatives in self.rules.items():
+                for symbols in alternatives:
+                    first, nullable = self.first_of(symbols)
+
+                    if not first <= self.first[category]:
+                        self.first[category] |= first
+                        changed = True
+
+                    if nullable and category not in self.nullable:
+                        self.nullable.add(category)
+                        changed = True
+
+        self.follow = {i: set() for i in self.rules}
+
+        changed = True
+        while changed:
+            changed = False
+
+            for category, alternatives in self.rules.items():
+                for symbols in alternatives:
+                    for i, symbol in enumerate(symbols):
+                        if symbol[0] != 'N':
+                            continue
+
+                        follow, nullable = self.first_of(symbols[i + 1:])
+                        if nullable:
+                            follow |= self.follow[category]
+
+                        if not follow <= self.follow[symbol[1]]:
+                            self.follow[symbol[1]] |= follow
+                            changed = True
+
+    def predict(self, category: str, symbols: list) -> set:
+        """
+        The terminals for which the parser picks 'symbols' for 'category'.
+        """
+
+        first, nullable = self.first_of(symbols)
+        return first | self.follow[category] if nullable else first
+
+    def find_conflict(self) -> (str, [list]):
+        for category, alternatives in self.rules.items():
+            seen = {}
+
+            for symbols in alternatives:
+                for terminal in self.predict(category, symbols):
+                    if terminal in seen:
+                        return category, [seen[terminal], symbols]
+
+                    seen[terminal] = symbols
+
+        return None
+
+    def table(self) -> ([str], [list], [dict]):
+        """
+        The parse table: the nonterminals, the productions (with the symbols
+        reversed, in the form used by table_parser) and, by nonterminal, the
+        production to pick for each terminal.
+        """
+
+        names = list(self.rules)
+        index = {name: i for i, name in enumerate(names)}
+
+        def convert(symbol):
+            if symbol[0] == 'N':
+                return index[symbol[1]]
+
+            if symbol[0] == 'T':
+                return symbol[1]
+
+            return symbol[1:]
+
+        productions = []
+        table = []
+
+        for category in names:
+            row = {}
+
+            for symbols in self.rules[category]:
+                for terminal in sorted(self.predict(category, symbols)):
+                    row[terminal] = len(productions)
+
+                productions.append(tuple(
+                    convert(i) for i in symbols[::-1] if i != IDENTITY
+                ))
+
+            table.append(row)
+
+        return names, productions, table
+
+
+def generate(text: str) -> str:
+    """
+    The source of the parse table module of an LBNF grammar.
+    """
+
+    start, rules, tokens = read_grammar(text)
+    grammar = Grammar(start, rules)
+    names, productions, table = grammar.table()
+
+    categories = sorted({i for i, _ in rules})
+
+    def assign(name: str, value) -> str:
+        indent = ' ' * (len(name) + 3)
+        text = pprint.pformat(value, width=79 - len(indent), compact=True)
+
+        return f'{name} = ' + text.replace('\n', '\n' + indent)
+
+    return '\n'.join([
+        "# Generated from source_grammar.cf by 'python -m day2_parser.grammar"
+        "'.",
+        '# Do not edit.',
+        '',
+        assign('START', names.index(START)),
+        '',
+        assign('END', END),
+        '',
+        '# the token categories, as terminals',
+        assign('CATEGORIES', sorted(f'<{i}>' for i in tokens)),
+        '',
+        assign('NONTERMINALS', names),
+        '',
+        '# the symbols of every production, reversed',
+        assign('PRODUCTIONS', productions),
+        '',
+        '# by nonterminal, the production to pick for each terminal',
+        assign('TABLE', table),
+        '',
+        '# for reference, the sets of the categories of the grammar',
+        assign('FIRST', {i: sorted(grammar.first[i]) for i in categories}),
+        '',
+        assign('FOLLOW', {i: sorted(grammar.follow[i]) for i in categories}),
+        ''
+    ])
+
+
+if __name__ == '__main__':
+    grammar_path = sys.argv[1] if len(sys.argv) > 1 else 'source_grammar.cf'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else \
+                  'day2_parser/parse_table.py'
+
+    with open(grammar_path, 'r') as f:
+        source = generate(f.read())
+
+    with open(output_path, 'w') as f:
+        f.write(source)
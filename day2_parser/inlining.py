@@ -0,0 +1,285 @@
+from day3_semantic_analysis.semantic_context import LOCAL, FUNCTION
+from day5_virtual_machine.graphs import strongly_connected, is_cycle
+
+from .ast import *
+
+
+# Inlining of small user functions on an analysed AST: a call to a function
+# whose body has at most 'budget' nodes is replaced by a copy of the body
+# (an Inlined node), whose parameters are assigned the arguments and whose
+# locals are moved to new slots of the caller (see FuncDecl.reserve_local).
+# Its returns store their value in another slot and jump after the copy,
+# where the value is loaded.
+#
+# Functions are processed callees first, so that the body copied is the one
+# with its own calls inlined and the budget bounds the size of every copy.
+# The functions of a recursive cycle are never inlined.
+#
+# A copy with jumps (a conditional, a loop or an early return) is only
+# inlined for the call that a statement evaluates first, on an empty operand
+# stack, so that the 'compiled' engine can still turn the code back into
+# Python statements. Loop conditions are left as they are.
+
+
+def tree_size(code: [Stmt]) -> int:
+    size = 0
+    work = list(code)
+
+    while work:
+        size += 1
+        work += children(work.pop())
+
+    return size
+
+
+def called_functions(func: FuncDecl) -> set:
+    """
+    The names of the user functions that a function calls.
+    """
+
+    names = set()
+    work = list(func.code)
+
+    while work:
+        node = work.pop()
+        if type(node) is FuncCall and node.storage == FUNCTION:
+            names.add(node.name)
+
+        work += children(node)
+
+    return names
+
+
+def callees_first(graph: dict) -> ([str], set):
+    """
+    The functions of a call graph (name: names of its callees), every one
+    after those it calls unless they call it back, and the set of those
+    that are part of a recursive cycle.
+    """
+
+    names = list(graph)
+    index = {name: i for i, name in enumerate(names)}
+    edges = [sorted(index[i] for i in graph[name]) for name in names]
+
+    order = []
+    recursive = set()
+
+    for component in strongly_connected(edges):
+        order += [names[i] for i in component]
+        if is_cycle(component, edges):
+            recursive.update(names[i] for i in component)
+
+    return order, recursive
+
+
+def move_locals(node: AST, base: int) -> AST:
+    """
+    Moves the local slots of a copied node by 'base', names its locals after
+    their slot like hidden locals, and turns a return into an InlinedReturn.
+    """
+
+    kind = type(node)
+
+    if kind in (VarExp, Assign) and node.storage == LOCAL:
+        node.slot += base
+        setattr(node, 'name' if kind is VarExp else 'var', f'%{node.slot}')
+
+    elif kind is Declare and node.storage == LOCAL:
+        node.slots = [(LOCAL, i + base) for _, i in node.slots]
+        node.vars = [f'%{i}' for _, i in node.slots]
+
+    elif kind is Inlined:
+        node.result += base
+
+    elif kind is Return:
+        return InlinedReturn(node.value)
+
+    return node
+
+
+def always_returns(code: [Stmt]) -> bool:
+    if not code:
+        return False
+
+    last = code[-1]
+    if type(last) is If:
+        return always_returns(last.if_code) and \
+               always_returns(last.else_code)
+
+    return type(last) is InlinedReturn
+
+
+def end_with_returns(code: [Stmt]) -> None:
+    """
+    Moves the statements after an 'if' with a branch that always returns
+    to the end of its other branch (they never run after both), so that more
+    returns end the code, and marks the returns that end it as 'last'.
+    Returns NONE at the end of the code if it can reach it.
+    """
+
+    if not always_returns(code):
+        code.append(InlinedReturn(Literal('NONE')))
+
+    work = [code]
+    while work:
+        block = work.pop()
+
+        for i, node in enumerate(block[:-1]):
+            if type(node) is not If:
+                continue
+
+            if always_returns(node.if_code):
+                if not always_returns(node.else_code):
+                    node.else_code += block[i + 1:]
+            elif always_returns(node.else_code):
+                node.if_code += block[i + 1:]
+            else:
+                continue
+
+            del block[i + 1:]
+            break
+
+        last = block[-1] if block else None
+        if type(last) is If:
+            work += [last.if_code, last.else_code]
+        elif type(last) is InlinedReturn:
+            last.last = True
+
+
+def has_jumps(code: [Stmt]) -> bool:
+    work = list(code)
+
+    while work:
+        node = work.pop()
+        if type(node) in (If, While) or \
+           type(node) is InlinedReturn and not node.last:
+            return True
+
+        work += children(node)
+
+    return False
+
+
+class Inliner:
+    """
+    The functions of a program, callees first, and the bodies of those that
+    can be inlined once processed (the statements, in the slots of the
+    callee, and whether they have jumps).
+    """
+
+    def __init__(self, program: Program, budget: int):
+        self.budget = budget
+        self.funcs = {i.func_name: i for i in program.func_decl}
+
+        graph = {name: called_functions(i) for name, i in self.funcs.items()}
+        self.order, self.recursive = callees_first(graph)
+
+        self.bodies = {}
+
+    def run(self):
+        for name in self.order:
+            func = self.funcs[name]
+            self.inline_calls(func)
+
+            if name in self.recursive or tree_size(func.code) > self.budget:
+                continue
+
+            code = [
+                copy_tree(i, lambda node: move_locals(node, 0))
+                for i in func.code
+            ]
+            end_with_returns(code)
+            self.bodies[name] = code, has_jumps(code)
+
+    def inline_calls(self, func: FuncDecl):
+        work = list(func.code)
+
+        while work:
+            node = work.pop()
+            kind = type(node)
+
+            if kind in (ExpStmt, Assign, Return):
+                self.inline_exp(func, node, 'value')
+
+                if kind is Return and type(node.value) is Inlined:
+                    node.tail_call = False
+
+            elif kind is If:
+                self.inline_exp(func, node, 'cond')
+                work += node.if_code + node.else_code
+
+            elif kind is While:
+                # the condition is left as it is, since it runs on every
+                # iteration and must stay a single expression
+                work += node.code
+
+    def inline_exp(self, func: FuncDecl, holder, key):
+        """
+        Inlines the calls in the expression of 'holder' at 'key' (a field of
+        a node or an index in a list of arguments), and in the arguments of
+        the copies.
+        """
+
+        work = [(holder, key, True)]
+
+        while work:
+            holder, key, first = work.pop()
+            node = holder[key] if isinstance(holder, list) \
+                   else getattr(holder, key)
+
+            body = self.bodies.get(node.name) \
+                   if type(node) is FuncCall and node.storage == FUNCTION \
+                   else None
+
+            if body is not None and (first or not body[1]):
+                inlined = self.copy_body(func, node, body[0])
+
+                if isinstance(holder, list):
+                    holder[key] = inlined
+                else:
+                    setattr(holder, key, inlined)
+
+                # every argument is stored before the next one is computed
+                work += [
+                    (i, 'value', first)
+                    for i in inlined.code[:len(node.params)]
+                ]
+
+            elif type(node) is BinOp:
+                work += [(node, 'left', first), (node, 'right', False)]
+            elif type(node) is UnOp:
+                work.append((node, 'value', first))
+            elif type(node) is FuncCall:
+                work += [
+                    (node.params, i, first and i == 0)
+                    for i in range(len(node.params))
+                ]
+
+    def copy_body(self, func: FuncDecl, call: FuncCall, body: list) -> Inlined:
+        callee = self.funcs[call.name]
+
+        base = func.local_count
+        for _ in range(callee.local_count):
+            func.reserve_local()
+
+        code = []
+        for slot, value in enumerate(call.params, base):
+            assign = Assign(f'%{slot}', value)
+            assign.storage, assign.slot = LOCAL, slot
+            code.append(assign)
+
+        code += [
+            copy_tree(i, lambda node: move_locals(node, base)) for i in body
+        ]
+
+        return Inlined(callee.func_name, code, func.reserve_local())
+
+
+def inline_functions(node: Program, budget: int) -> None:
+    """
+    Inlines the calls to the user functions of an analysed program whose
+    body has at most 'budget' nodes, in place. Runs after fold_constants,
+    before eliminate_common_subexpressions and codegen.generate.
+    """
+
+    Inliner(node, budget).run()
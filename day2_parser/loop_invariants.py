@@ -0,0 +1,297 @@
+from day3_semantic_analysis.semantic_context import LOCAL, GLOBAL, FUNCTION
+
+from .ast import *
+
+
+# Loop-invariant code motion on an analysed AST: an operation in a while loop
+# whose variables the loop never changes and without calls has the same
+# value on every iteration, so it is computed once before the loop, into a
+# hidden local (see FuncDecl.reserve_local) that the loop loads instead.
+#
+# A variable changes when the loop assigns or declares it, and a global also
+# when the loop calls a user function, which can assign it. Operations are
+# matched by value number (see ValueNumbers), so their variables by slot.
+#
+# Computing an operation earlier must not raise an error that the loop would
+# not, or raise it before the loop prints something. Comparisons for
+# equality and logical operators never fail, so they are hoisted wherever
+# they are. Other operations are only hoisted if the loop computes them
+# before anything that can fail or call a function: in its condition, when
+# it has no calls, or at the start of its body. These are computed under a
+# copy of the condition, 'if (cond) { <hoisted>; while (cond) ... }', which
+# fails like the loop would, and evaluates the condition once more without
+# side effects.
+#
+# Loops are processed inner ones first, so that an operation hoisted out of
+# a loop can be hoisted again out of the loop around it.
+
+
+OPERATIONS = (BinOp, UnOp)
+
+# the operators that never fail, whatever their operands
+SAFE_OPS = {
+    BinOp: {'==', '!=', '&&', '||'},
+    UnOp: {'!'}
+}
+
+
+def never_fails(root: Exp) -> bool:
+    work = [root]
+
+    while work:
+        node = work.pop()
+        if type(node) in OPERATIONS and \
+           node.op not in SAFE_OPS[type(node)]:
+            return False
+
+        work += children(node)
+
+    return True
+
+
+def find_loops(root: AST) -> [(list, While)]:
+    """
+    The while loops under 'root' with the list of statements that holds
+    each, inner loops before the loops around them.
+    """
+
+    loops = []
+    work = [root]
+
+    while work:
+        node = work.pop()
+
+        for field in node.FIELDS:
+            value = getattr(node, field)
+
+            if isinstance(value, AST):
+                work.append(value)
+            elif isinstance(value, list):
+                loops += [(value, i) for i in value if type(i) is While]
+                work += [i for i in value if isinstance(i, AST)]
+
+    return loops[::-1]
+
+
+def invariant_nodes(loop: While) -> set:
+    """
+    The ids of the expressions of a loop that have the same value on every
+    iteration: literals, variables it does not change and operations of
+    them.
+    """
+
+    order = []
+    changed = set()
+    calls = False
+
+    work = [loop]
+    while work:
+        node = work.pop()
+        order.append(node)
+        kind = type(node)
+
+        if kind is Assign:
+            changed.add((node.storage, node.slot))
+        elif kind is Declare:
+            changed.update(node.slots)
+        elif kind is FuncCall and node.storage == FUNCTION:
+            calls = True
+
+        work += children(node)
+
+    invariant = set()
+    for node in reversed(order):
+        kind = type(node)
+
+        if kind is Literal:
+            pass
+        elif kind is VarExp:
+            if (node.storage, node.slot) in changed or \
+               calls and node.storage == GLOBAL:
+                continue
+        elif kind is BinOp:
+            if id(node.left) not in invariant or \
+               id(node.right) not in invariant:
+                continue
+        elif kind is UnOp:
+            if id(node.value) not in invariant:
+                continue
+        else:
+            continue
+
+        invariant.add(id(node))
+
+    return invariant
+
+
+def has_calls(root: Exp) -> bool:
+    work = [root]
+
+    while work:
+        node = work.pop()
+        if type(node) in (FuncCall, Inlined):
+            return True
+
+        work += children(node)
+
+    return False
+
+
+def computed_first(
+        loop: While,
+        invariant: set,
+        numbers: ValueNumbers
+    ) -> dict:
+    """
+    The value numbers of the invariant operations that the loop computes on
+    its first iteration before any operation that can fail or any call, in
+    the order they are computed: all of those of a condition without calls,
+    which runs again right after its copy before the loop, then those of its
+    body until then.
+    """
+
+    found = {}
+    if has_calls(loop.cond):
+        return found
+
+    def add_operations(root: Exp):
+        work = [root]
+        while work:
+            node = work.pop()
+            if type(node) in OPERATIONS and id(node) in invariant:
+                found.setdefault(numbers.number(node), len(found))
+
+            work += reversed(children(node))
+
+    add_operations(loop.cond)
+
+    for stmt in loop.code:
+        kind = type(stmt)
+
+        if kind is Declare:
+            continue
+        elif kind in (Assign, ExpStmt, Return, InlinedReturn):
+            exp = stmt.value
+        elif kind is If:
+            exp = stmt.cond
+        else:
+            break
+
+        # in the order of evaluation, where a string marks the end of an
+        # operation that can fail or of a call
+        work = [exp]
+        while work:
+            node = work.pop()
+            node_kind = type(node)
+
+            if type(node) is str or node_kind is Inlined:
+                return found
+
+            if node_kind in OPERATIONS and id(node) in invariant:
+                add_operations(node)
+                continue
+
+            if node_kind is FuncCall:
+                work.append('call')
+            elif node_kind in OPERATIONS and \
+                 node.op not in SAFE_OPS[node_kind]:
+                work.append(node.op)
+
+            work += reversed(children(node))
+
+        if kind not in (Assign, ExpStmt):
+            break
+
+    return found
+
+
+class Preheader:
+    """
+    The operations hoisted out of a loop: the hidden local of each by value
+    number, the statements that compute them before the loop, and whether
+    one of them can fail.
+    """
+
+    def __init__(self, func: FuncDecl, numbers: ValueNumbers):
+        self.func = func
+        self.numbers = numbers
+        self.slots = {}
+        self.code = []
+        self.can_fail = False
+
+    def hoist(self, node: Exp) -> VarExp:
+        number = self.numbers.number(node)
+        slot = self.slots.get(number)
+
+        if slot is None:
+            slot = self.slots[number] = self.func.reserve_local()
+
+            assign = Assign(f'%{slot}', node)
+            assign.storage, assign.slot = LOCAL, slot
+            self.code.append(assign)
+
+            self.can_fail = self.can_fail or not never_fails(node)
+
+        return hidden_local(slot)
+
+
+def hoist_invariants(func: FuncDecl, block: [Stmt], loop: While) -> None:
+    """
+    Replaces the invariant operations of a loop that can be computed before
+    it by hidden locals of 'func', assigned before the loop in 'block'.
+    """
+
+    numbers = ValueNumbers()
+    invariant = invariant_nodes(loop)
+    first = computed_first(loop, invariant, numbers)
+    cond = copy_tree(loop.cond) if first else None
+
+    preheader = Preheader(func, numbers)
+    work = [loop]
+
+    while work:
+        node = work.pop()
+
+        for field in node.FIELDS:
+            value = getattr(node, field)
+            items = value if isinstance(value, list) else [value]
+
+            for i, item in enumerate(items):
+                if not isinstance(item, AST):
+                    continue
+
+                if type(item) in OPERATIONS and id(item) in invariant and \
+                   (never_fails(item) or numbers.number(item) in first):
+                    items[i] = preheader.hoist(item)
+                else:
+                    work.append(item)
+
+            if not isinstance(value, list) and items[0] is not value:
+                setattr(node, field, items[0])
+
+    if not preheader.code:
+        return
+
+    # those that can fail in the order the loop computes them
+    preheader.code.sort(key=lambda i: first.get(numbers.number(i.value), -1))
+
+    i = next(i for i, stmt in enumerate(block) if stmt is loop)
+    if preheader.can_fail:
+        block[i] = If(cond, preheader.code + [loop], [])
+    else:
+        block[i:i + 1] = preheader.code + [loop]
+
+
+def hoist_loop_invariants(node: AST) -> None:
+    """
+    Computes the invariant operations of the while loops of an analysed
+    program (or function) once before each loop, in place. Runs after
+    fold_constants and inline_functions, before
+    eliminate_common_subexpressions and codegen.generate.
+    """
+
+    funcs = node.func_decl if type(node) is Program else [node]
+
+    for func in funcs:
+        for block, loop in find_loops(func):
+            hoist_invariants(func, block, loop)
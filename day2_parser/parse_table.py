@@ -0,0 +1,345 @@
+# Generated from source_grammar.cf by 'python -m day2_parser.grammar'.
+# Do not edit.
+
+START = 0
+
+END = '<$>'
+
+# the token categories, as terminals
+CATEGORIES = ['<Char>', '<Double>', '<Iden>', '<Ident>', '<Integer>',
+              '<String>']
+
+NONTERMINALS = ["Start'", 'Program', '[Iden]', '[Iden]1', '[Exp]', '[Exp]1',
+                '[Stmt]', '[Decl]', 'Decl', 'Lit', 'Exp', 'Exp1', 'Exp2',
+                'Exp3', 'Exp4', 'Exp5', 'Exp6', 'Stmt', '[Iden]1_tail1',
+                '[Exp]1_tail1', '[Stmt]_tail1', '[Decl]_tail1', 'Exp_tail1',
+                'Exp1_tail1', 'Exp2_tail1', 'Exp3_tail1', 'Exp4_tail1',
+                'Exp5_1', 'Stmt_1', 'Stmt_2', 'Stmt_3']
+
+# the symbols of every production, reversed
+PRODUCTIONS = [('<$>', 1), (('Prog', 1, 0), 7), (('Nil', 0, None),), (3,),
+               (18, ('Single', 1, 0), '<Iden>'), (('Nil', 0, None),), (5,),
+               (19, ('Single', 1, 0), 10), (20, ('Nil', 0, None)),
+               (21, ('Nil', 0, None)), (('DVar', 3, 1), ';', 2, 'decl'),
+               (('DFun', 7, 0), '}', 6, '{', ')', 2, '(', '<Iden>'),
+               (('LInt', 1, 0), '<Integer>'), (('LStr', 1, 0), '<String>'),
+               (('LTru', 1, None), 'TRUE'), (('LFal', 1, None), 'FALSE'),
+               (('LNon', 1, None), 'NONE'), (22, 11), (23, 12), (24, 13),
+               (25, 14), (26, 15), (('ENeg', 2, 1), 15, '-'),
+               (('ENot', 2, 1), 15, '!'), (('ELit', 1, 0), 9), (27, '<Iden>'),
+               (16,), (('_', 3, 1), ')', 10, '('),
+               (('SDec', 3, 1), ';', 2, 'decl'), (30, '<Iden>'),
+               (28, 'return'), (('SBre', 2, None), ';', 'break'),
+               (('SCon', 2, None), ';', 'continue'),
+               (29, '}', 6, '{', ')', 10, '(', 'if'),
+               (('SWhi', 7, 2), '}', 6, '{', ')', 10, '(', 'while'),
+               (('SExp', 2, 0), ';', 22, 23, 24, 25, 26, ('ENeg', 2, 1), 15,
+                '-'),
+               (('SExp', 2, 0), ';', 22, 23, 24, 25, 26, ('ENot', 2, 1), 15,
+                '!'),
+               (('SExp', 2, 0), ';', 22, 23, 24, 25, 26, ('ELit', 1, 0), 9),
+               (('SExp', 2, 0), ';', 22, 23, 24, 25, 26, 16),
+               (18, ('Snoc', 3, 2), '<Iden>', ','), (),
+               (19, ('Snoc', 3, 2), 10, ','), (), (20, ('Snoc', 2, 1), 17), (),
+               (21, ('Snoc', 2, 1), 8), (), (22, ('EOr', 3, 0), 11, '||'), (),
+               (23, ('EAnd', 3, 0), 12, '&&'), (),
+               (24, ('EEqu', 3, 0), 13, '=='), (24, ('ENeq', 3, 0), 13, '!='),
+               (24, ('ELeq', 3, 0), 13, '<='), (24, ('EGeq', 3, 0), 13, '>='),
+               (24, ('ELes', 3, 0), 13, '<'), (24, ('EGre', 3, 0), 13, '>'),
+               (), (25, ('EAdd', 3, 0), 14, '+'),
+               (25, ('ESub', 3, 0), 14, '-'), (),
+               (26, ('EMul', 3, 0), 15, '*'), (26, ('EDiv', 3, 0), 15, '/'),
+               (), (('EIde', 1, 0),), (('ECal', 4, 0), ')', 4, '('),
+               (('SRet', 3, 1), ';', 10), (('SVoi', 2, None), ';'),
+               (('SIfn', 7, 2),), (('SIfe', 11, 2), '}', 6, '{', 'else'),
+               (('SAsn', 4, 0), ';', 10, '='),
+               (('SExp', 2, 0), ';', 22, 23, 24, 25, 26, 27)]
+
+# by nonterminal, the production to pick for each terminal
+TABLE = [{'<$>': 0, '<Iden>': 0, 'decl': 0},
+         {'<$>': 1, '<Iden>': 1, 'decl': 1}, {')': 2, ';': 2, '<Iden>': 3},
+         {'<Iden>': 4},
+         {'!': 6,
+          '(': 6,
+          ')': 5,
+          '-': 6,
+          '<Iden>': 6,
+          '<Integer>': 6,
+          '<String>': 6,
+          'FALSE': 6,
+          'NONE': 6,
+          'TRUE': 6},
+         {'!': 7,
+          '(': 7,
+          '-': 7,
+          '<Iden>': 7,
+          '<Integer>': 7,
+          '<String>': 7,
+          'FALSE': 7,
+          'NONE': 7,
+          'TRUE': 7},
+         {'!': 8,
+          '(': 8,
+          '-': 8,
+          '<Iden>': 8,
+          '<Integer>': 8,
+          '<String>': 8,
+          'FALSE': 8,
+          'NONE': 8,
+          'TRUE': 8,
+          'break': 8,
+          'continue': 8,
+          'decl': 8,
+          'if': 8,
+          'return': 8,
+          'while': 8,
+          '}': 8},
+         {'<$>': 9, '<Iden>': 9, 'decl': 9}, {'<Iden>': 11, 'decl': 10},
+         {'<Integer>': 12,
+          '<String>': 13,
+          'FALSE': 15,
+          'NONE': 16,
+          'TRUE': 14},
+         {'!': 17,
+          '(': 17,
+          '-': 17,
+          '<Iden>': 17,
+          '<Integer>': 17,
+          '<String>': 17,
+          'FALSE': 17,
+          'NONE': 17,
+          'TRUE': 17},
+         {'!': 18,
+          '(': 18,
+          '-': 18,
+          '<Iden>': 18,
+          '<Integer>': 18,
+          '<String>': 18,
+          'FALSE': 18,
+          'NONE': 18,
+          'TRUE': 18},
+         {'!': 19,
+          '(': 19,
+          '-': 19,
+          '<Iden>': 19,
+          '<Integer>': 19,
+          '<String>': 19,
+          'FALSE': 19,
+          'NONE': 19,
+          'TRUE': 19},
+         {'!': 20,
+          '(': 20,
+          '-': 20,
+          '<Iden>': 20,
+          '<Integer>': 20,
+          '<String>': 20,
+          'FALSE': 20,
+          'NONE': 20,
+          'TRUE': 20},
+         {'!': 21,
+          '(': 21,
+          '-': 21,
+          '<Iden>': 21,
+          '<Integer>': 21,
+          '<String>': 21,
+          'FALSE': 21,
+          'NONE': 21,
+          'TRUE': 21},
+         {'!': 23,
+          '(': 26,
+          '-': 22,
+          '<Iden>': 25,
+          '<Integer>': 24,
+          '<String>': 24,
+          'FALSE': 24,
+          'NONE': 24,
+          'TRUE': 24},
+         {'(': 27},
+         {'!': 36,
+          '(': 38,
+          '-': 35,
+          '<Iden>': 29,
+          '<Integer>': 37,
+          '<String>': 37,
+          'FALSE': 37,
+          'NONE': 37,
+          'TRUE': 37,
+          'break': 31,
+          'continue': 32,
+          'decl': 28,
+          'if': 33,
+          'return': 30,
+          'while': 34},
+         {')': 40, ',': 39, ';': 40}, {')': 42, ',': 41},
+         {'!': 43,
+          '(': 43,
+          '-': 43,
+          '<Iden>': 43,
+          '<Integer>': 43,
+          '<String>': 43,
+          'FALSE': 43,
+          'NONE': 43,
+          'TRUE': 43,
+          'break': 43,
+          'continue': 43,
+          'decl': 43,
+          'if': 43,
+          'return': 43,
+          'while': 43,
+          '}': 44},
+         {'<$>': 46, '<Iden>': 45, 'decl': 45},
+         {')': 48, ',': 48, ';': 48, '||': 47},
+         {'&&': 49, ')': 50, ',': 50, ';': 50, '||': 50},
+         {'!=': 52,
+          '&&': 57,
+          ')': 57,
+          ',': 57,
+          ';': 57,
+          '<': 55,
+          '<=': 53,
+          '==': 51,
+          '>': 56,
+          '>=': 54,
+          '||': 57},
+         {'!=': 60,
+          '&&': 60,
+          ')': 60,
+          '+': 58,
+          ',': 60,
+          '-': 59,
+          ';': 60,
+          '<': 60,
+          '<=': 60,
+          '==': 60,
+          '>': 60,
+          '>=': 60,
+          '||': 60},
+         {'!=': 63,
+          '&&': 63,
+          ')': 63,
+          '*': 61,
+          '+': 63,
+          ',': 63,
+          '-': 63,
+          '/': 62,
+          ';': 63,
+          '<': 63,
+          '<=': 63,
+          '==': 63,
+          '>': 63,
+          '>=': 63,
+          '||': 63},
+         {'!=': 64,
+          '&&': 64,
+          '(': 65,
+          ')': 64,
+          '*': 64,
+          '+': 64,
+          ',': 64,
+          '-': 64,
+          '/': 64,
+          ';': 64,
+          '<': 64,
+          '<=': 64,
+          '==': 64,
+          '>': 64,
+          '>=': 64,
+          '||': 64},
+         {'!': 66,
+          '(': 66,
+          '-': 66,
+          ';': 67,
+          '<Iden>': 66,
+          '<Integer>': 66,
+          '<String>': 66,
+          'FALSE': 66,
+          'NONE': 66,
+          'TRUE': 66},
+         {'!': 68,
+          '(': 68,
+          '-': 68,
+          '<Iden>': 68,
+          '<Integer>': 68,
+          '<String>': 68,
+          'FALSE': 68,
+          'NONE': 68,
+          'TRUE': 68,
+          'break': 68,
+          'continue': 68,
+          'decl': 68,
+          'else': 69,
+          'if': 68,
+          'return': 68,
+          'while': 68,
+          '}': 68},
+         {'!=': 71,
+          '&&': 71,
+          '(': 71,
+          '*': 71,
+          '+': 71,
+          '-': 71,
+          '/': 71,
+          ';': 71,
+          '<': 71,
+          '<=': 71,
+          '=': 70,
+          '==': 71,
+          '>': 71,
+          '>=': 71,
+          '||': 71}]
+
+# for reference, the sets of the categories of the grammar
+FIRST = {'Decl': ['<Iden>', 'decl'],
+         'Exp': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                 'NONE', 'TRUE'],
+         'Exp1': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                  'NONE', 'TRUE'],
+         'Exp2': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                  'NONE', 'TRUE'],
+         'Exp3': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                  'NONE', 'TRUE'],
+         'Exp4': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                  'NONE', 'TRUE'],
+         'Exp5': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                  'NONE', 'TRUE'],
+         'Exp6': ['('],
+         'Lit': ['<Integer>', '<String>', 'FALSE', 'NONE', 'TRUE'],
+         'Program': ['<Iden>', 'decl'],
+         'Stmt': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                  'NONE', 'TRUE', 'break', 'continue', 'decl', 'if', 'return',
+                  'while'],
+         '[Decl]': ['<Iden>', 'decl'],
+         '[Exp]': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                   'NONE', 'TRUE'],
+         '[Exp]1': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                    'NONE', 'TRUE'],
+         '[Iden]': ['<Iden>'],
+         '[Iden]1': ['<Iden>'],
+         '[Stmt]': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                    'NONE', 'TRUE', 'break', 'continue', 'decl', 'if',
+                    'return', 'while']}
+
+FOLLOW = {'Decl': ['<$>', '<Iden>', 'decl'],
+          'Exp': [')', ',', ';'],
+          'Exp1': [')', ',', ';', '||'],
+          'Exp2': ['&&', ')', ',', ';', '||'],
+          'Exp3': ['!=', '&&', ')', ',', ';', '<', '<=', '==', '>', '>=',
+                   '||'],
+          'Exp4': ['!=', '&&', ')', '+', ',', '-', ';', '<', '<=', '==', '>',
+                   '>=', '||'],
+          'Exp5': ['!=', '&&', ')', '*', '+', ',', '-', '/', ';', '<', '<=',
+                   '==', '>', '>=', '||'],
+          'Exp6': ['!=', '&&', ')', '*', '+', ',', '-', '/', ';', '<', '<=',
+                   '==', '>', '>=', '||'],
+          'Lit': ['!=', '&&', ')', '*', '+', ',', '-', '/', ';', '<', '<=',
+                  '==', '>', '>=', '||'],
+          'Program': ['<$>'],
+          'Stmt': ['!', '(', '-', '<Iden>', '<Integer>', '<String>', 'FALSE',
+                   'NONE', 'TRUE', 'break', 'continue', 'decl', 'if', 'return',
+                   'while', '}'],
+          '[Decl]': ['<$>'],
+          '[Exp]': [')'],
+          '[Exp]1': [')'],
+          '[Iden]': [')', ';'],
+          '[Iden]1': [')', ';'],
+          '[Stmt]': ['}']}
@@ -1,6 +1,7 @@
 import functools
 
-from day1_lexer import TokenType, ParserError
+from day1_lexer import TokenType, TokenStream, ParserError
+from day1_lexer.token_stream import KIND_CODES
 
 from .ast import *
 
@@ -39,13 +40,23 @@ class Reader:
     """
     A class that handles the reading, incrementing and restoring of the
     token position while parsing.
+
+    Reads a TokenStream (see lexer.lex_stream), or a list of tokens as
+    returned by lexer.lex. The text of a token is only materialized when it
+    is matched or peeked at.
     """
 
-    def __init__(self, tokens: [(str, TokenType)]):
+    def __init__(self, tokens):
+        if not isinstance(tokens, TokenStream):
+            tokens = TokenStream.from_tokens(tokens)
+
         self.tokens = tokens
         self.pos = 0
         self.len = len(tokens)
 
+        # by id, holding on to the set so that the id is not reused
+        self.split_sets = {}
+
     def match(self, matcher) -> str:
         """
         Increments if matcher matches either the content or the type of the
@@ -60,15 +71,14 @@ class Reader:
         if self.pos >= self.len:
             raise ParserError('End of token sequence')
 
-        upcoming = self.tokens[self.pos]
-        if matcher not in upcoming:
+        if not self.tokens.matches(self.pos, matcher):
             raise ParserError(
-                f'Token {upcoming}  does not match the '
-                f'expected "{matcher}"'
+                f'Token {self.peek()} at {self.position()} does not match '
+                f'the expected "{matcher}"'
             )
 
         self.pos += 1
-        return upcoming[0]
+        return self.tokens.text(self.pos - 1)
 
     def test(self, matcher) -> bool:
         """
@@ -82,7 +92,7 @@ class Reader:
         if self.pos >= self.len:
             return False
 
-        return matcher in self.tokens[self.pos]
+        return self.tokens.matches(self.pos, matcher)
 
     def test_set(self, first_set: set) -> bool:
         """
@@ -90,11 +100,23 @@ class Reader:
         Behaves similarly to Reader.test
         """
 
-        for i in first_set:
-            if self.test(i):
-                return True
+        if self.pos >= self.len:
+            return False
+
+        # the set split into kind codes and contents, once per set
+        key = id(first_set)
+        if key not in self.split_sets:
+            self.split_sets[key] = (
+                first_set,
+                {KIND_CODES[i] for i in first_set if type(i) is TokenType},
+                {i for i in first_set if type(i) is str}
+            )
+
+        _, kinds, contents = self.split_sets[key]
+        if self.tokens.kinds[self.pos] in kinds:
+            return True
 
-        return False
+        return bool(contents) and self.tokens.text(self.pos) in contents
 
     def peek(self) -> (str, TokenType):
         """
@@ -108,12 +130,12 @@ class Reader:
 
         return self.tokens[self.pos]
 
-    def back(self) -> None:
+    def position(self) -> str:
         """
-        Don't use this. It doesn't belong in LL(1) parsers.
+        Where the next token is in the source, for error messages.
         """
 
-        self.pos -= 1
+        return self.tokens.position(self.pos)
 
     def end(self) -> bool:
         return self.pos >= self.len
@@ -129,7 +151,22 @@ def parse(reader: Reader) -> Program:
     incorporated for generalizability and simplicity.
     """
 
-    raise NotImplementedError
+    declarations = []
+
+    while not reader.end():
+        if reader.test_set(FIRST_SET['declare']):
+            declarations.append(parse_declare(reader))
+
+        elif reader.test_set(FIRST_SET['decl_func']):
+            declarations.append(parse_func_decl(reader))
+
+        else:
+            raise ParserError(
+                f'Token {reader.peek()} at {reader.position()} does not '
+                'match the first set of declarations'
+            )
+
+    return Program(declarations)
 
 
 def parse_statement_list(reader: Reader) -> [Stmt]:
@@ -195,7 +232,17 @@ def parse_func_decl(reader: Reader) -> FuncDecl:
     Parses a function declaration.
     """
 
-    raise NotImplementedError
+    name = reader.match(TokenType.IDENTIFIER)
+
+    reader.match('(')
+    params = parse_identifier_list(reader)
+    reader.match(')')
+
+    reader.match('{')
+    code = parse_statement_list(reader)
+    reader.match('}')
+
+    return FuncDecl(name, params, code)
 
 
 def parse_if(reader: Reader) -> If:
@@ -236,7 +283,17 @@ def parse_while(reader: Reader) -> While:
     Parses a while loop. Should be pretty trivial after completing 'parse_if'.
     """
 
-    raise NotImplementedError
+    reader.match('while')
+
+    reader.match('(')
+    cond = parse_exp(reader)
+    reader.match(')')
+
+    reader.match('{')
+    code = parse_statement_list(reader)
+    reader.match('}')
+
+    return While(cond, code)
 
 
 def parse_identifier_start(reader: Reader) -> Stmt:
@@ -253,7 +310,9 @@ def parse_identifier_start(reader: Reader) -> Stmt:
 
     , there is an indirect ambiguity induced by identical starting token.
 
-    Luckily this is trivial to fix; just left factor.
+    Luckily this is trivial to fix; just left factor: once the identifier
+    is matched, the expression continues from it (see
+    exp_parser.parse_identifier_exp) instead of being parsed again.
     """
 
     # nested since this is not used elsewhere
@@ -264,20 +323,13 @@ def parse_identifier_start(reader: Reader) -> Stmt:
 
         return Assign(name, value)
 
-    # note: there should be NO backtracking in LL(1) parsers
-    # however, left factoring the exp production makes the code less
-    # straightforward, which is something that I want to avoid in this course
-    def backtrack_and_parse_exp(reader):
-        reader.back()
-        return parse_exp(reader)
-
     name = reader.match(TokenType.IDENTIFIER)
 
     if reader.test('='):
         return partial_parse_assign(name, reader)
 
     else:
-        value = backtrack_and_parse_exp(reader)
+        value = parse_binary(reader, parse_identifier_exp(reader, name))
         reader.match(';')
         return ExpStmt(value)
 
@@ -289,7 +341,49 @@ def parse_statement(reader: Reader) -> Stmt:
     'continue' or 'exp'.
     """
 
-    raise NotImplementedError
+    if reader.test_set(FIRST_SET['if']):
+        return parse_if(reader)
+
+    elif reader.test_set(FIRST_SET['while']):
+        return parse_while(reader)
+
+    elif reader.test_set(FIRST_SET['declare']):
+        return parse_declare(reader)
+
+    elif reader.test_set(FIRST_SET['return']):
+        reader.match('return')
+
+        # a bare 'return;' returns NONE
+        value = Literal('NONE')
+        if not reader.test(';'):
+            value = parse_exp(reader)
+
+        reader.match(';')
+        return Return(value)
+
+    elif reader.test_set(FIRST_SET['break']):
+        reader.match('break')
+        reader.match(';')
+        return Break()
+
+    elif reader.test_set(FIRST_SET['continue']):
+        reader.match('continue')
+        reader.match(';')
+        return Continue()
+
+    elif reader.test_set(FIRST_SET['iden_start']):
+        return parse_identifier_start(reader)
+
+    elif reader.test_set(FIRST_SET['exp']):
+        value = parse_exp(reader)
+        reader.match(';')
+        return ExpStmt(value)
+
+    else:
+        raise ParserError(
+            f'Token {reader.peek()} at {reader.position()} does not '
+            'match the first set of statements'
+        )
 
 
-from .exp_parser import parse_exp
\ No newline at end of file
+from .exp_parser import parse_exp, parse_binary, parse_identifier_exp
\ No newline at end of file
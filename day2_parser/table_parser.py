@@ -0,0 +1,153 @@
+from day1_lexer import TokenType, ParserError
+from day1_lexer.token_stream import KIND_CODES
+
+from .ast import *
+from .parser import Reader
+from .parse_table import START, END, CATEGORIES, PRODUCTIONS, TABLE
+
+
+IDENTIFIER = KIND_CODES[TokenType.IDENTIFIER]
+LITERAL = KIND_CODES[TokenType.LITERAL]
+
+# the AST node of every label of source_grammar.cf, from the values of the
+# symbols of the rule (the content of the tokens and the nodes of the
+# categories)
+BUILDERS = {
+    'Prog': lambda v: Program(v[0]),
+    'DVar': lambda v: Declare(v[1]),
+    'DFun': lambda v: FuncDecl(v[0], v[2], v[5]),
+    'LInt': lambda v: Literal(v[0]),
+    'LStr': lambda v: Literal(v[0]),
+    'LTru': lambda v: Literal(v[0]),
+    'LFal': lambda v: Literal(v[0]),
+    'LNon': lambda v: Literal(v[0]),
+    'ENeg': lambda v: UnOp(v[0], v[1]),
+    'ENot': lambda v: UnOp(v[0], v[1]),
+    'ELit': lambda v: v[0],
+    'EIde': lambda v: VarExp(v[0]),
+    'ECal': lambda v: FuncCall(v[0], v[2]),
+    'SDec': lambda v: Declare(v[1]),
+    'SAsn': lambda v: Assign(v[0], v[2]),
+    'SRet': lambda v: Return(v[1]),
+    'SVoi': lambda v: Return(Literal('NONE')),
+    'SBre': lambda v: Break(),
+    'SCon': lambda v: Continue(),
+    'SIfn': lambda v: If(v[2], v[5], []),
+    'SIfe': lambda v: If(v[2], v[5], v[9]),
+    'SWhi': lambda v: While(v[2], v[5]),
+    'SExp': lambda v: ExpStmt(v[0])
+}
+for label in (
+        'EOr', 'EAnd', 'EEqu', 'ENeq', 'ELeq', 'EGeq', 'ELes', 'EGre',
+        'EAdd', 'ESub', 'EMul', 'EDiv'
+    ):
+    BUILDERS[label] = lambda v: BinOp(v[1], v[0], v[2])
+
+CATEGORY_SET = set(CATEGORIES)
+
+
+def token_key(tokens, i: int) -> str:
+    """
+    The terminal of the parse table that token 'i' matches: its content,
+    or the category of identifiers, numbers and strings.
+    """
+
+    kind = tokens.kinds[i]
+    if kind == IDENTIFIER:
+        return '<Iden>'
+
+    content = tokens.text(i)
+    if kind == LITERAL:
+        if content[0] == '"':
+            return '<String>'
+
+        if content.isdigit():
+            return '<Integer>'
+
+    return content
+
+
+def build(action: tuple, values: list):
+    """
+    Replaces the values of the symbols of a rule at the top of 'values' by
+    the value of the rule.
+    """
+
+    label, size, keep = action
+
+    start = len(values) - size
+    args = values[start:]
+    del values[start:]
+
+    if label == '_':
+        values.append(args[keep])
+
+    elif label == 'Nil':
+        values.append([])
+
+    elif label == 'Single':
+        values.append([args[keep]])
+
+    elif label == 'Snoc':
+        args[0].append(args[keep])
+        values.append(args[0])
+
+    else:
+        values.append(BUILDERS[label](args))
+
+
+def parse_table_driven(reader: Reader) -> Program:
+    """
+    Parses an entire program like parser.parse, by following the parse
+    table generated from source_grammar.cf (see grammar.py) with an explicit
+    stack, so that nesting is not bound by Python's recursion limit.
+    """
+
+    tokens = reader.tokens
+    pos = reader.pos
+    key = token_key(tokens, pos) if pos < reader.len else END
+
+    # nonterminals (int), terminals (str) and actions (tuple)
+    stack = [START]
+    values = []
+
+    while stack:
+        top = stack.pop()
+        kind = type(top)
+
+        if kind is int:
+            production = TABLE[top].get(key)
+            if production is None:
+                raise unexpected(reader, pos, sorted(TABLE[top]))
+
+            stack.extend(PRODUCTIONS[production])
+
+        elif kind is str:
+            if top != key:
+                raise unexpected(reader, pos, [top])
+
+            if top == END:
+                continue
+
+            values.append(tokens.text(pos) if top in CATEGORY_SET else top)
+
+            pos += 1
+            key = token_key(tokens, pos) if pos < reader.len else END
+
+        else:
+            build(top, values)
+
+    reader.pos = pos
+    return values[0]
+
+
+def unexpected(reader: Reader, pos: int, expected: [str]) -> ParserError:
+    expected = ', '.join(f'"{i}"' for i in expected)
+
+    if pos >= reader.len:
+        return ParserError(f'End of token sequence, expected {expected}')
+
+    return ParserError(
+        f'Token {reader.tokens[pos]} at {reader.tokens.position(pos)} does '
+        f'not match the expected {expected}'
+    )
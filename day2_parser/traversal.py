@@ -0,0 +1,357 @@
+from day1_lexer import (
+    UndeclaredIdentifierError,
+    MisplacedControlFlowError,
+    InvalidParametersError
+)
+from day3_semantic_analysis.semantic_context import (
+    SemanticContext,
+    GlobalScope,
+    LOCAL,
+    GLOBAL,
+    NATIVE
+)
+from day4_code_generation import (
+    UNOP_CODE,
+    BINOP_CODE,
+    LOAD_CODE,
+    STORE_CODE,
+    CALL_CODE,
+    Assembler
+)
+
+from .ast import *
+
+
+# The passes over the AST (analysis and code generation) as tables of
+# handlers by node type, run by 'walk' with an explicit worklist instead of
+# the recursive methods of the nodes, so that the depth of the tree is not
+# bound by Python's recursion limit.
+#
+# A handler does the work of a node that comes before its children, and
+# returns the rest in order: nodes, handled in turn, (function, *args)
+# actions, called when reached, and strings, appended to the generated code.
+
+
+def walk(root: AST, handlers: dict, state) -> None:
+    work = [root]
+    pop = work.pop
+    extend = work.extend
+
+    while work:
+        item = pop()
+        handler = handlers.get(type(item))
+
+        if handler is not None:
+            extend(reversed(handler(item, state)))
+
+        elif type(item) is str:
+            state.code.append(item)
+
+        else:
+            item[0](*item[1:])
+
+
+# analysis, see the 'analysis_pass' methods
+
+
+def analyse_program(node: Program, context: SemanticContext) -> list:
+    glob = context.enter_global(node)
+
+    for i in node.func_decl:
+        i.register(context)
+
+    return node.var_decl + node.func_decl + [(set_glob_count, node, glob)]
+
+
+def set_glob_count(node: Program, glob: GlobalScope):
+    node.glob_var_count = glob.var_count()
+
+
+def analyse_declare(node: Declare, context: SemanticContext) -> list:
+    node.slots = [context.add_var(i) for i in node.vars]
+    node.storage = GLOBAL if isinstance(context.curr(), GlobalScope) \
+                   else LOCAL
+
+    return []
+
+
+def analyse_assign(node: Assign, context: SemanticContext) -> list:
+    binding = context.resolve_var(node.var)
+    if binding is None:
+        raise UndeclaredIdentifierError(f'Variable {node.var} is not declared')
+
+    node.storage, node.slot = binding
+    return [node.value]
+
+
+def analyse_return(node: Return, context: SemanticContext) -> list:
+    return [node.value, (set_tail_call, node, context)]
+
+
+def set_tail_call(node: Return, context: SemanticContext):
+    node.tail_call = context.tail_calls and \
+                     type(node.value) == FuncCall and \
+                     node.value.storage != NATIVE
+
+
+def analyse_break(node: Break, context: SemanticContext) -> list:
+    if not context.in_loop():
+        raise MisplacedControlFlowError('\'break\' outside of a loop')
+
+    return []
+
+
+def analyse_continue(node: Continue, context: SemanticContext) -> list:
+    if not context.in_loop():
+        raise MisplacedControlFlowError('\'continue\' outside of a loop')
+
+    return []
+
+
+def analyse_if(node: If, context: SemanticContext) -> list:
+    return [
+        node.cond,
+        (context.push_scope, node), *node.if_code, (context.pop_scope,),
+        (context.push_scope, node), *node.else_code, (context.pop_scope,)
+    ]
+
+
+def analyse_while(node: While, context: SemanticContext) -> list:
+    return [
+        node.cond,
+        (context.push_scope, node), (change_loop_depth, context, 1),
+        *node.code,
+        (change_loop_depth, context, -1), (context.pop_scope,)
+    ]
+
+
+def change_loop_depth(context: SemanticContext, change: int):
+    context.loop_depth += change
+
+
+def analyse_func_decl(node: FuncDecl, context: SemanticContext) -> list:
+    context.enter_func(node)
+
+    for i in node.params:
+        context.add_var(i)
+
+    return node.code + [(set_local_count, node, context)]
+
+
+def set_local_count(node: FuncDecl, context: SemanticContext):
+    node.local_count = context.exit_func()
+
+
+def analyse_var_exp(node: VarExp, context: SemanticContext) -> list:
+    binding = context.resolve_var(node.name)
+    if binding is None:
+        raise UndeclaredIdentifierError(
+            f'Variable {node.name} is not declared'
+        )
+
+    node.storage, node.slot = binding
+    return []
+
+
+def analyse_func_call(node: FuncCall, context: SemanticContext) -> list:
+    binding = context.resolve_func(node.name)
+    if binding is None:
+        raise UndeclaredIdentifierError(
+            f'Function {node.name} is not declared'
+        )
+
+    node.storage, node.slot, expected = binding
+
+    if len(node.params) != expected:
+        raise InvalidParametersError(
+            f'Function {node.name} takes {expected} parameters '
+            f'but {len(node.params)} were given'
+        )
+
+    return list(node.params)
+
+
+ANALYSIS = {
+    Program: analyse_program,
+    Declare: analyse_declare,
+    Assign: analyse_assign,
+    Return: analyse_return,
+    Break: analyse_break,
+    Continue: analyse_continue,
+    If: analyse_if,
+    While: analyse_while,
+    FuncDecl: analyse_func_decl,
+    BinOp: lambda node, context: [node.left, node.right],
+    UnOp: lambda node, context: [node.value],
+    Literal: lambda node, context: [],
+    VarExp: analyse_var_exp,
+    FuncCall: analyse_func_call,
+    ExpStmt: lambda node, context: [node.value]
+}
+
+
+def analyse(node: AST, context: SemanticContext) -> None:
+    """
+    The analysis pass of the tree under 'node', like node.analysis_pass.
+    """
+
+    walk(node, ANALYSIS, context)
+
+
+# code generation, see the 'generate_code' methods: jumps are emitted to
+# labels, which are placed when the walk reaches their target, and names
+# are emitted as resolved by the analysis
+
+
+def generate_program(node: Program, asm: Assembler) -> list:
+    return [str(node.glob_var_count), str(len(node.func_decl))] + \
+           node.func_decl
+
+
+def generate_declare(node: Declare, asm: Assembler) -> list:
+    # local variables are reset to NONE whenever their declaration is
+    # reached, since slots are shared between sibling scopes
+    if node.storage == GLOBAL:
+        return []
+
+    code = []
+    for _, index in node.slots:
+        code += ['lnon', f'lstore {index}']
+
+    return code
+
+
+def generate_assign(node: Assign, asm: Assembler) -> list:
+    return [node.value, f'{STORE_CODE[node.storage]} {node.slot}']
+
+
+def generate_return(node: Return, asm: Assembler) -> list:
+    if node.tail_call:
+        return node.value.params + [f'tcall {node.value.slot}']
+
+    return [node.value, 'ret']
+
+
+def generate_if(node: If, asm: Assembler) -> list:
+    # cond; cjmp IF; <else>; jmp END; IF: <if>; END:
+    if_label = asm.new_label()
+    end_label = asm.new_label()
+
+    return [
+        node.cond, (asm.jump, 'cjmp', if_label),
+        *node.else_code, (asm.jump, 'jmp', end_label),
+        (asm.place, if_label), *node.if_code,
+        (asm.place, end_label)
+    ]
+
+
+def generate_while(node: While, asm: Assembler) -> list:
+    # jmp COND; BODY: <code>; COND: <cond>; cjmp BODY; END:
+    body_label = asm.new_label()
+    cond_label = asm.new_label()
+    end_label = asm.new_label()
+
+    return [
+        (asm.jump, 'jmp', cond_label), (asm.place, body_label),
+        (asm.push_loop, cond_label, end_label), *node.code, (asm.pop_loop,),
+        (asm.place, cond_label), node.cond, (asm.jump, 'cjmp', body_label),
+        (asm.place, end_label)
+    ]
+
+
+def generate_jump(asm: Assembler, label: int) -> list:
+    asm.jump('jmp', label)
+    return []
+
+
+def generate_inlined(node: Inlined, asm: Assembler) -> list:
+    # <code>; JOIN: lload result
+    join_label = asm.new_label()
+
+    return [
+        (asm.push_join, node.result, join_label), *node.code, (asm.pop_join,),
+        (asm.place, join_label), f'lload {node.result}'
+    ]
+
+
+def generate_inlined_return(node: InlinedReturn, asm: Assembler) -> list:
+    result, join_label = asm.join()
+    code = [node.value, f'lstore {result}']
+
+    if not node.last:
+        code.append((asm.jump, 'jmp', join_label))
+
+    return code
+
+
+def generate_func_decl(node: FuncDecl, asm: Assembler) -> list:
+    # every function has its own program counter
+    header = f'{node.func_name} {len(node.params)} {node.local_count}'
+
+    return [header, (asm.start_func,)] + node.code + [
+        'lnon', 'ret', f':{node.func_name}'
+    ]
+
+
+def generate_literal(node: Literal, asm: Assembler) -> list:
+    if node.value == 'NONE':
+        return ['lnon']
+
+    elif node.value in ('TRUE', 'FALSE'):
+        return [f'lboo {int(node.value == "TRUE")}']
+
+    elif node.value.startswith('"'):
+        return [f'lstr {node.value}']
+
+    return [f'lint {node.value}']
+
+
+def generate_operation(node: Exp, code: list) -> list:
+    # an operation marked by an optimization also keeps its value in a
+    # hidden local (see FuncDecl.reserve_local)
+    save = getattr(node, 'save', None)
+    if save is not None:
+        code += [f'lstore {save}', f'lload {save}']
+
+    return code
+
+
+def generate_func_call(node: FuncCall, asm: Assembler) -> list:
+    return node.params + [f'{CALL_CODE[node.storage]} {node.slot}']
+
+
+GENERATION = {
+    Program: generate_program,
+    Declare: generate_declare,
+    Assign: generate_assign,
+    Return: generate_return,
+    Break: lambda node, asm: generate_jump(asm, asm.break_pos()),
+    Continue: lambda node, asm: generate_jump(asm, asm.continue_pos()),
+    If: generate_if,
+    While: generate_while,
+    FuncDecl: generate_func_decl,
+    BinOp: lambda node, asm: generate_operation(
+        node, [node.left, node.right, BINOP_CODE[node.op]]
+    ),
+    UnOp: lambda node, asm: generate_operation(
+        node, [node.value, UNOP_CODE[node.op]]
+    ),
+    Literal: generate_literal,
+    VarExp: lambda node, asm: [f'{LOAD_CODE[node.storage]} {node.slot}'],
+    FuncCall: generate_func_call,
+    ExpStmt: lambda node, asm: [node.value, 'pop'],
+    Inlined: generate_inlined,
+    InlinedReturn: generate_inlined_return
+}
+
+
+def generate(node: Program) -> [str]:
+    """
+    The code of an analysed program, like node.generate_code, in a single
+    walk over the tree.
+    """
+
+    asm = Assembler()
+    walk(node, GENERATION, asm)
+
+    return asm.assemble()
@@ -5,6 +5,10 @@ from .semantics import analysis
 __all__ = [
     'NATIVE_FUNCS',
     'NATIVE_INDEX',
+    'LOCAL',
+    'GLOBAL',
+    'NATIVE',
+    'FUNCTION',
     'Scope',
     'GlobalScope',
     'SemanticContext',
@@ -16,6 +16,14 @@ NATIVE_INDEX = {
     'int_to_str': 3
 }
 
+# the storage classes that names resolve to: variables live in a slot of the
+# frame or of the globals, natives are called by index and user functions by
+# name
+LOCAL = 'local'
+GLOBAL = 'global'
+NATIVE = 'native'
+FUNCTION = 'function'
+
 
 class Scope:
     """
@@ -30,15 +38,23 @@ class Scope:
     def has_var(self, name):
         return name in self.vars
 
-    def add_var(self, name):
+    def add_var(self, name, index=None):
+        """
+        Declares a variable in the next slot, or in slot 'index' (e.g. to
+        keep the slots of globals across incremental compilations).
+        """
+
         if name in self.vars:
             raise DuplicateDeclarationError(
                 f'Variable {name} declared '
                 'multiple times'
             )
 
-        self.vars[name] = self.counter
-        self.counter += 1
+        if index is None:
+            index = self.counter
+
+        self.vars[name] = index
+        self.counter = max(self.counter, index + 1)
 
     def var_index(self, name):
         return self.vars[name]
@@ -86,8 +102,131 @@ class SemanticContext:
     """
     A context object to be used during semantic analysis.
 
-    Its implementation, including its properties and usage, is completely
-    up to you.
+    Keeps a stack of scopes (the global scope at the bottom), the loop depth
+    for validating control flow statements, and the maximum amount of local
+    slots used by the function currently being analyzed.
+
+    Names are resolved in a single table rather than by searching the stack
+    of scopes: every variable name maps to the (storage class, slot) of its
+    declarations that are in scope, the innermost last. A scope removes its
+    declarations from the table when it is popped.
     """
 
-    pass
\ No newline at end of file
+    def __init__(self, tail_calls: bool = True):
+        self.scopes = []
+        self.symbols = {}
+        self.loop_depth = 0
+        self.local_max = 0
+
+        # whether 'return f(...)' reuses the frame of the caller
+        self.tail_calls = tail_calls
+
+    def enter_global(self, program) -> GlobalScope:
+        """
+        Creates the global scope and registers the native functions in it,
+        so that user functions cannot redeclare them.
+        """
+
+        scope = GlobalScope(program)
+        for name, params in NATIVE_FUNCS.items():
+            scope.add_func(name, params)
+
+        self.scopes.append(scope)
+        return scope
+
+    def glob(self) -> GlobalScope:
+        return self.scopes[0]
+
+    def curr(self) -> Scope:
+        return self.scopes[-1]
+
+    def push_scope(self, node) -> Scope:
+        """
+        Pushes a new local scope. Nested scopes continue the slot numbering
+        of their parent so that the variables of all active scopes can live
+        in the same frame.
+        """
+
+        parent = self.curr()
+        counter = 0 if isinstance(parent, GlobalScope) else parent.var_count()
+
+        scope = Scope(node, counter)
+        self.scopes.append(scope)
+
+        return scope
+
+    def pop_scope(self) -> Scope:
+        scope = self.scopes.pop()
+        self.local_max = max(self.local_max, scope.var_count())
+
+        for name in scope.vars:
+            bindings = self.symbols[name]
+            bindings.pop()
+
+            if not bindings:
+                del self.symbols[name]
+
+        return scope
+
+    def enter_func(self, func) -> Scope:
+        self.local_max = 0
+        self.loop_depth = 0
+
+        return self.push_scope(func)
+
+    def exit_func(self) -> int:
+        """
+        Pops the function scope and returns the amount of local slots the
+        function needs.
+        """
+
+        self.pop_scope()
+        return self.local_max
+
+    def add_var(self, name: str, index: int = None) -> (str, int):
+        """
+        Declares a variable in the current scope (in slot 'index' if given)
+        and returns its storage class and slot index.
+        """
+
+        scope = self.curr()
+        scope.add_var(name, index)
+
+        binding = (
+            GLOBAL if isinstance(scope, GlobalScope) else LOCAL,
+            scope.var_index(name)
+        )
+        self.symbols.setdefault(name, []).append(binding)
+
+        return binding
+
+    def has_var(self, name: str) -> bool:
+        return name in self.symbols
+
+    def resolve_var(self, name: str) -> (str, int):
+        """
+        Returns the storage class (LOCAL or GLOBAL) and the slot index of the
+        closest declaration of a variable, or None if it is not declared.
+        """
+
+        bindings = self.symbols.get(name)
+        return bindings[-1] if bindings else None
+
+    def resolve_func(self, name: str) -> (str, object, int):
+        """
+        Returns the storage class (NATIVE or FUNCTION) of a function, its
+        native index or name, and its amount of parameters, or None if it is
+        not declared.
+        """
+
+        funcs = self.glob().funcs
+        if name not in funcs:
+            return None
+
+        if name in NATIVE_INDEX:
+            return NATIVE, NATIVE_INDEX[name], len(NATIVE_FUNCS[name])
+
+        return FUNCTION, name, len(funcs[name].params)
+
+    def in_loop(self) -> bool:
+        return self.loop_depth > 0
\ No newline at end of file
@@ -1,13 +1,20 @@
 from .semantic_context import SemanticContext
 
 
-def analysis(node):
+def analysis(node, tail_calls: bool = True):
     """
     Returns nothing if the code is valid; otherwise throws an according error.
 
     Also prepares the nodes (e.g. populate fields, resolve dependencies) for
-    code generation.
+    code generation. 'tail_calls' marks the returns of function calls to be
+    compiled to 'tcall'.
+
+    Runs the 'analysis_pass' of the nodes without recursion (see
+    day2_parser/traversal.py).
     """
 
-    context = SemanticContext()
-    node.analysis_pass(context)
\ No newline at end of file
+    # imported here as the AST imports this package
+    from day2_parser.traversal import analyse
+
+    context = SemanticContext(tail_calls)
+    analyse(node, context)
\ No newline at end of file
@@ -1,11 +1,22 @@
-from .op_code import BINOP_CODE, UNOP_CODE
+from .op_code import (
+    BINOP_CODE,
+    UNOP_CODE,
+    LOAD_CODE,
+    STORE_CODE,
+    CALL_CODE
+)
 from .generation import generate
 from .context import CodeGenContext
+from .assembler import Assembler
 
 
 __all__ = [
     'BINOP_CODE',
     'UNOP_CODE',
+    'LOAD_CODE',
+    'STORE_CODE',
+    'CALL_CODE',
     'generate',
-    'CodeGenContext'
+    'CodeGenContext',
+    'Assembler'
 ]
\ No newline at end of file
@@ -0,0 +1,100 @@
+from .context import CodeGenContext
+
+
+class Assembler(CodeGenContext):
+    """
+    Appends the code of every function to a single list, with jumps to
+    symbolic labels instead of program counters, so that the code of a node
+    can be emitted without knowing the length of the code that follows it.
+
+    A jump to a label that is already placed is resolved when it is
+    emitted; the others are patched when their label is placed. The program
+    counter is the position in the list from the start of the function.
+    With 'relative', jumps hold the distance from the jump to the target
+    instead.
+
+    The targets of 'break' and 'continue' (see CodeGenContext) are labels,
+    and so is the end of every inlined function body, with its result slot.
+    """
+
+    def __init__(self, relative: bool = False):
+        super(Assembler, self).__init__()
+        self.code = []
+        self.start = 0
+        self.relative = relative
+
+        # the program counter of every label, None until placed
+        self.labels = []
+        # label: [(position in code, op)] of the jumps waiting for it
+        self.fixups = {}
+        # (result slot, end label) of the inlined bodies being generated
+        self.joins = []
+
+    def get_counter(self) -> int:
+        return len(self.code) - self.start
+
+    def start_func(self):
+        self.check_placed()
+        self.start = len(self.code)
+
+    def new_label(self) -> int:
+        self.labels.append(None)
+        return len(self.labels) - 1
+
+    def push_join(self, result: int, join_label: int):
+        """
+        Registers the result slot and the end of the innermost inlined
+        function body, which its returns jump to.
+        """
+
+        self.joins.append((result, join_label))
+
+    def pop_join(self):
+        self.joins.pop()
+
+    def join(self) -> (int, int):
+        return self.joins[-1]
+
+    def emit(self, instr: str):
+        self.code.append(instr)
+
+    def jump(self, op: str, label: int):
+        target = self.labels[label]
+
+        if target is None:
+            self.fixups.setdefault(label, []).append((len(self.code), op))
+            self.code.append(op)
+
+        else:
+            self.code.append(self.resolve(op, len(self.code), target))
+
+    def place(self, label: int):
+        """
+        Binds a label to the next instruction and patches the jumps to it.
+        """
+
+        target = self.get_counter()
+        self.labels[label] = target
+
+        for index, op in self.fixups.pop(label, ()):
+            self.code[index] = self.resolve(op, index, target)
+
+    def resolve(self, op: str, index: int, target: int) -> str:
+        if self.relative:
+            target -= index - self.start
+
+        return f'{op} {target}'
+
+    def check_placed(self):
+        if self.fixups:
+            raise ValueError(
+                f'Labels {sorted(self.fixups)} are jumped to but never placed'
+            )
+
+    def assemble(self) -> [str]:
+        """
+        The code emitted so far, once every label it jumps to is placed.
+        """
+
+        self.check_placed()
+        return self.code
@@ -2,9 +2,26 @@ class CodeGenContext:
 
     def __init__(self):
         self.counter = 0
+        self.loops = []
 
     def get_counter(self):
         return self.counter
 
     def increment(self, amount: int = 1):
-        self.counter += amount
\ No newline at end of file
+        self.counter += amount
+
+    def push_loop(self, continue_pos: int, break_pos: int):
+        """
+        Registers the jump targets of the innermost loop.
+        """
+
+        self.loops.append((continue_pos, break_pos))
+
+    def pop_loop(self):
+        self.loops.pop()
+
+    def continue_pos(self) -> int:
+        return self.loops[-1][0]
+
+    def break_pos(self) -> int:
+        return self.loops[-1][1]
@@ -1,6 +1,12 @@
 def generate(node) -> [str]:
     """
     Generates the code for a given program.
+
+    Runs the 'generate_code' of the nodes without recursion (see
+    day2_parser/traversal.py).
     """
 
-    return node.generate_code(None) # the program node has no context
\ No newline at end of file
+    # imported here as the AST imports this package
+    from day2_parser.traversal import generate
+
+    return generate(node)
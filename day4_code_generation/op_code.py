@@ -1,3 +1,11 @@
+from day3_semantic_analysis.semantic_context import (
+    LOCAL,
+    GLOBAL,
+    NATIVE,
+    FUNCTION
+)
+
+
 BINOP_CODE = {
     '==': 'equal',
     '!=': 'nequal',
@@ -16,4 +24,20 @@ BINOP_CODE = {
 UNOP_CODE = {
     '-': 'neg',
     '!': 'not'
-}
\ No newline at end of file
+}
+
+# by the storage class of the resolved name (see SemanticContext)
+LOAD_CODE = {
+    LOCAL: 'lload',
+    GLOBAL: 'gload'
+}
+
+STORE_CODE = {
+    LOCAL: 'lstore',
+    GLOBAL: 'gstore'
+}
+
+CALL_CODE = {
+    NATIVE: 'ncall',
+    FUNCTION: 'call'
+}
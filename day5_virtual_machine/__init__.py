@@ -1,9 +1,25 @@
-from .machine import run_code
+from .machine import run_code, run_file_rep, ENGINES
+from .binary_loader import encode_bytecode, load_bytecode_file
+from .linker import link, format_call_graph
+from .byte_loader import read_bytecode, write_bytecode
+from .optimizer import optimize_code, optimize_file_rep
+from .profiler import profile_code
 from .simulation import NativeHandler, RecordingHandler
 
 
 __all__ = [
     'run_code',
+    'run_file_rep',
+    'ENGINES',
+    'encode_bytecode',
+    'load_bytecode_file',
+    'link',
+    'format_call_graph',
+    'read_bytecode',
+    'write_bytecode',
+    'optimize_code',
+    'optimize_file_rep',
+    'profile_code',
     'NativeHandler',
     'RecordingHandler'
 ]
\ No newline at end of file
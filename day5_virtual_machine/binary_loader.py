@@ -0,0 +1,264 @@
+import mmap
+import struct
+
+from day1_lexer import InvalidByteSyntaxError
+
+from .byte_loader import read_bytecode
+
+
+# Binary bytecode layout (all integers little endian):
+#
+#   header          HEADER
+#   constant pool   const_count * (varint byte length, utf-8 bytes)
+#   function table  func_count * FUNC_ENTRY
+#   code            per instruction: opcode byte, then a varint argument
+#                   for the instructions that take one
+#
+# Strings (function names, 'call' targets and 'lstr' values) are stored
+# once in the constant pool and referenced by index.
+
+MAGIC = b'LCBC'
+VERSION = 1
+
+# magic, version, flags, glob_var_count, const_count, func_count
+HEADER = struct.Struct('<4sHHIII')
+
+# name (constant index), param_count, local_count, instruction count,
+# code offset (from the start of the file), code size in bytes
+FUNC_ENTRY = struct.Struct('<IIIIII')
+
+# argument encodings
+NO_ARG, UINT_ARG, SINT_ARG, CONST_ARG = range(4)
+
+# the position of an instruction in this table is its opcode byte; only
+# append to it, or bump VERSION
+BYTE_OPS = [
+    ('ret', NO_ARG),
+    ('lnon', NO_ARG),
+    ('pop', NO_ARG),
+    ('neg', NO_ARG),
+    ('not', NO_ARG),
+    ('add', NO_ARG),
+    ('subtract', NO_ARG),
+    ('mul', NO_ARG),
+    ('div', NO_ARG),
+    ('and', NO_ARG),
+    ('or', NO_ARG),
+    ('equal', NO_ARG),
+    ('nequal', NO_ARG),
+    ('less', NO_ARG),
+    ('great', NO_ARG),
+    ('leq', NO_ARG),
+    ('geq', NO_ARG),
+    ('gload', UINT_ARG),
+    ('gstore', UINT_ARG),
+    ('lload', UINT_ARG),
+    ('lstore', UINT_ARG),
+    ('lboo', UINT_ARG),
+    ('jmp', UINT_ARG),
+    ('cjmp', UINT_ARG),
+    ('ncall', UINT_ARG),
+    ('lint', SINT_ARG),
+    ('lstr', CONST_ARG),
+    ('call', CONST_ARG),
+    ('tcall', CONST_ARG)
+]
+
+OP_BYTE = {name: i for i, (name, _) in enumerate(BYTE_OPS)}
+
+
+def write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+
+    out.append(value)
+
+
+def read_varint(buffer, pos: int) -> (int, int):
+    """
+    Returns the varint at 'pos' and the position after it.
+    """
+
+    byte = buffer[pos]
+    pos += 1
+
+    value = byte & 0x7f
+    shift = 7
+
+    while byte & 0x80:
+        byte = buffer[pos]
+        pos += 1
+
+        value |= (byte & 0x7f) << shift
+        shift += 7
+
+    return value, pos
+
+
+def encode_bytecode(lines: [str]) -> bytes:
+    """
+    Converts a text bytecode into the binary format.
+    """
+
+    file_rep = read_bytecode(lines)
+
+    consts = {}
+
+    def const(value: str) -> int:
+        return consts.setdefault(value, len(consts))
+
+    entries = []
+    code = bytearray()
+    for func in file_rep['funcs']:
+        start = len(code)
+
+        for instr in func['code']:
+            op = instr[0]
+            if op not in OP_BYTE:
+                raise InvalidByteSyntaxError(f'Invalid instruction {op}')
+
+            byte = OP_BYTE[op]
+            kind = BYTE_OPS[byte][1]
+            code.append(byte)
+
+            if kind == UINT_ARG:
+                write_varint(code, instr[1])
+
+            elif kind == SINT_ARG:
+                # zigzag, so that small negative numbers stay short
+                value = instr[1]
+                zigzag = value << 1 if value >= 0 else ~value << 1 | 1
+                write_varint(code, zigzag)
+
+            elif kind == CONST_ARG:
+                write_varint(code, const(instr[1]))
+
+        entries.append((
+            const(func['name']),
+            func['param_count'],
+            func['local_count'],
+            len(func['code']),
+            start,
+            len(code) - start
+        ))
+
+    pool = bytearray()
+    for value in consts:
+        data = value.encode('utf-8')
+        write_varint(pool, len(data))
+        pool += data
+
+    code_offset = HEADER.size + len(pool) + FUNC_ENTRY.size * len(entries)
+
+    out = bytearray(HEADER.pack(
+        MAGIC,
+        VERSION,
+        0,
+        file_rep['glob_var_count'],
+        len(consts),
+        len(entries)
+    ))
+    out += pool
+
+    for name, params, local_count, count, start, size in entries:
+        out += FUNC_ENTRY.pack(
+            name, params, local_count, count, code_offset + start, size
+        )
+
+    return bytes(out + code)
+
+
+def decode_code(buffer, pos: int, count: int, consts: [str]) -> [list]:
+    """
+    Decodes 'count' instructions starting at 'pos' into the same form as
+    byte_loader.preprocess.
+    """
+
+    ops = BYTE_OPS
+    code = []
+
+    for _ in range(count):
+        name, kind = ops[buffer[pos]]
+        pos += 1
+
+        if kind == NO_ARG:
+            code.append([name])
+            continue
+
+        # single byte fast path for the varint argument
+        arg = buffer[pos]
+        pos += 1
+        if arg & 0x80:
+            arg, pos = read_varint(buffer, pos - 1)
+
+        if kind == SINT_ARG:
+            arg = ~(arg >> 1) if arg & 1 else arg >> 1
+
+        elif kind == CONST_ARG:
+            arg = consts[arg]
+
+        code.append([name, arg])
+
+    return code
+
+
+def is_binary(buffer) -> bool:
+    return buffer[:len(MAGIC)] == MAGIC
+
+
+def read_binary_bytecode(buffer) -> dict:
+    """
+    Loads a binary bytecode from any buffer (bytes, mmap) into the same
+    structure as byte_loader.read_bytecode.
+    """
+
+    if len(buffer) < HEADER.size or not is_binary(buffer):
+        raise InvalidByteSyntaxError('Not a binary bytecode file')
+
+    magic, version, flags, glob_var_count, const_count, func_count = \
+        HEADER.unpack_from(buffer, 0)
+
+    if version != VERSION:
+        raise InvalidByteSyntaxError(
+            f'Unsupported binary bytecode version {version}'
+        )
+
+    pos = HEADER.size
+    consts = []
+    for _ in range(const_count):
+        size, pos = read_varint(buffer, pos)
+        consts.append(str(buffer[pos : pos + size], 'utf-8'))
+        pos += size
+
+    table = buffer[pos : pos + FUNC_ENTRY.size * func_count]
+
+    funcs = []
+    for name, params, local_count, count, start, size in \
+            FUNC_ENTRY.iter_unpack(table):
+        funcs.append({
+            'name': consts[name],
+            'param_count': params,
+            'local_count': local_count,
+            'code': decode_code(buffer, start, count, consts)
+        })
+
+    return {
+        'glob_var_count': glob_var_count,
+        'funcs': funcs
+    }
+
+
+def load_bytecode_file(path: str) -> dict:
+    """
+    Loads a bytecode file of either format. Binary files are memory mapped
+    and decoded in place.
+    """
+
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            return read_bytecode(f.read().decode('utf-8').splitlines())
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return read_binary_bytecode(buffer)
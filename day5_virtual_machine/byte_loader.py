@@ -14,6 +14,16 @@ def format_str(s: str) -> str:
                     .replace('\\r', '\r')
 
 
+def quote_str(s: str) -> str:
+    """
+    The inverse of format_str.
+    """
+
+    return '"' + s.replace('\n', '\\n') \
+                  .replace('\t', '\\t') \
+                  .replace('\r', '\\r') + '"'
+
+
 SPLIT_REGEX = re.compile(r'(?:[^\s"]+|"[^"]*")+')
 
 INT_PARAM = {
@@ -83,4 +93,28 @@ def preprocess(code: [[str]]):
     to int).
     """
 
-    return [PREP_FUNCS[i[0]](i) if i[0] in PREP_FUNCS else i for i in code]
\ No newline at end of file
+    return [PREP_FUNCS[i[0]](i) if i[0] in PREP_FUNCS else i for i in code]
+
+
+def write_bytecode(file_rep: dict) -> [str]:
+    """
+    The lines of the text bytecode of a loaded bytecode; the inverse of
+    read_bytecode.
+    """
+
+    lines = [str(file_rep['glob_var_count']), str(len(file_rep['funcs']))]
+
+    for func in file_rep['funcs']:
+        lines.append(
+            f'{func["name"]} {func["param_count"]} {func["local_count"]}'
+        )
+
+        for instr in func['code']:
+            if instr[0] == 'lstr':
+                lines.append(f'lstr {quote_str(instr[1])}')
+            else:
+                lines.append(' '.join(str(i) for i in instr))
+
+        lines.append(f':{func["name"]}')
+
+    return lines
\ No newline at end of file
@@ -0,0 +1,496 @@
+from .simulation import InteractionHandler
+from .machine import Function
+from .graphs import strongly_connected, is_cycle
+from .decoded_machine import (
+    DecodedVirtualMachine, LLOAD, CALL, PYCALL, RET, decode
+)
+
+
+# kinds of symbolic stack values, from the most to the least restricted
+CONST, TRIVIAL, PURE, IMPURE = range(4)
+
+BINOP_FORMATS = {
+    'add': '({} + {})',
+    'subtract': '({} - {})',
+    'mul': '({} * {})',
+    'div': '({} // {})',
+    'equal': '({} == {})',
+    'nequal': '({} != {})',
+    'less': '({} < {})',
+    'great': '({} > {})',
+    'leq': '({} <= {})',
+    'geq': '({} >= {})'
+}
+
+UNOP_FORMATS = {
+    'neg': '(-{})',
+    'not': '(not {})'
+}
+
+
+class CannotStructure(Exception):
+    """
+    When the control flow of a function cannot be expressed with Python's
+    structured statements.
+    """
+    pass
+
+
+def parts_of(instr: list) -> [list]:
+    """
+    The plain instructions of a (possibly fused) instruction. Jumps can only
+    be the last part of a superinstruction.
+    """
+
+    if len(instr) > 1 and isinstance(instr[1], list): # fused
+        return instr[1:]
+
+    return [instr]
+
+
+class FunctionTranslator:
+    """
+    Translates the bytecode of a function into the source of an equivalent
+    Python function.
+
+    Stack slots become Python expressions that are only evaluated when they
+    are consumed, and the jumps emitted by the code generator for 'if' and
+    'while' are turned back into the matching Python statements. Anything
+    else raises CannotStructure.
+    """
+
+    def __init__(self, index: int, funcs: [Function]):
+        self.index = index
+        self.func = funcs[index]
+        self.funcs = funcs
+        self.name = self.func.name
+        self.code = self.func.code
+        self.lines = []
+        self.temp_count = 0
+
+    def translate(self) -> str:
+        params = [f'l{i}' for i in range(self.func.get_param_count())]
+        others = [
+            f'l{i}' for i in
+            range(self.func.get_param_count(), self.func.get_local_count())
+        ]
+
+        self.emit(f'def F_{self.name}({", ".join(params)}):', 0)
+        if others:
+            self.emit(' = '.join(others) + ' = None', 1)
+
+        # tail calls to itself restart the function in a loop
+        depth = 1
+        if any(
+                i == ['tcall', self.index]
+                for instr in self.code for i in parts_of(instr)
+            ):
+            self.emit('while True:', 1)
+            depth = 2
+
+        self.block(0, len(self.code), depth, None)
+
+        return '\n'.join(self.lines) + '\n'
+
+    def emit(self, line: str, depth: int):
+        self.lines.append('    ' * depth + line)
+
+    def spill(self, stack: list, depth: int):
+        """
+        Evaluates every pending stack value into a temporary, so that the
+        values keep their evaluation order relative to a statement.
+        """
+
+        for i, (expr, kind) in enumerate(stack):
+            if kind > CONST:
+                temp = f't{self.temp_count}'
+                self.temp_count += 1
+
+                self.emit(f'{temp} = {expr}', depth)
+                stack[i] = (temp, TRIVIAL)
+
+    def simple(self, instr: list, stack: list, depth: int):
+        """
+        Symbolically executes a straight-line instruction.
+        """
+
+        op = instr[0]
+
+        if op == 'lload':
+            stack.append((f'l{instr[1]}', TRIVIAL))
+
+        elif op == 'gload':
+            stack.append((f'G[{instr[1]}]', TRIVIAL))
+
+        elif op in ('lint', 'lstr'):
+            stack.append((repr(instr[1]), CONST))
+
+        elif op == 'lboo':
+            stack.append((repr(bool(instr[1])), CONST))
+
+        elif op == 'lnon':
+            stack.append(('None', CONST))
+
+        elif op in BINOP_FORMATS or op in ('and', 'or'):
+            a, a_kind = stack.pop()
+            b, b_kind = stack.pop()
+            kind = max(a_kind, b_kind, PURE)
+
+            if op in BINOP_FORMATS:
+                expr = BINOP_FORMATS[op].format(b, a)
+
+            # the bytecode evaluates both operands, so Python's short
+            # circuiting is only safe for operands that cannot fail
+            elif a_kind <= TRIVIAL:
+                expr = f'({b} {op} {a})'
+
+            else:
+                expr = f'{op.upper()}({b}, {a})'
+
+            stack.append((expr, kind))
+
+        elif op in UNOP_FORMATS:
+            value, kind = stack.pop()
+            stack.append((UNOP_FORMATS[op].format(value), max(kind, PURE)))
+
+        elif op == 'call':
+            callee = self.funcs[instr[1]]
+
+            params = callee.get_param_count()
+            args = [stack.pop()[0] for _ in range(params)][::-1]
+            stack.append((f'F_{callee.name}({", ".join(args)})', IMPURE))
+
+        elif op == 'ncall':
+            value = stack.pop()[0]
+            stack.append((f'N{instr[1]}({value})', IMPURE))
+
+        elif op == 'pop':
+            value, kind = stack.pop()
+            self.spill(stack, depth)
+
+            if kind > TRIVIAL:
+                self.emit(value, depth)
+
+        elif op in ('lstore', 'gstore'):
+            value = stack.pop()[0]
+            self.spill(stack, depth)
+
+            target = 'l%d' if op == 'lstore' else 'G[%d]'
+            self.emit(f'{target % instr[1]} = {value}', depth)
+
+        else:
+            raise CannotStructure(f'Unexpected instruction {op}')
+
+    def tail_call(self, index: int, stack: list, depth: int, loop):
+        callee = self.funcs[index]
+
+        params = callee.get_param_count()
+        args = [stack.pop()[0] for _ in range(params)][::-1]
+        self.spill(stack, depth)
+
+        if index != self.index:
+            self.emit(f'return F_{callee.name}({", ".join(args)})', depth)
+            return
+
+        # 'continue' would restart the innermost loop instead
+        if loop is not None:
+            raise CannotStructure('Tail call to itself in a loop')
+
+        if params:
+            names = ', '.join(f'l{i}' for i in range(params))
+            self.emit(f'{names} = {", ".join(args)}', depth)
+
+        others = [
+            f'l{i}' for i in range(params, self.func.get_local_count())
+        ]
+        if others:
+            self.emit(' = '.join(others) + ' = None', depth)
+
+        self.emit('continue', depth)
+
+    def block(self, start: int, end: int, depth: int, loop) -> int:
+        """
+        Translates the instructions in [start, end). 'loop' holds the
+        (continue, break) targets of the innermost loop.
+
+        Returns the number of lines emitted.
+        """
+
+        emitted = len(self.lines)
+        stack = []
+
+        pc = start
+        while pc < end:
+            parts = parts_of(self.code[pc])
+            for i in parts[:-1]:
+                self.simple(i, stack, depth)
+
+            instr = parts[-1]
+            op = instr[0]
+
+            if op == 'ret':
+                value = stack.pop()[0]
+                self.spill(stack, depth)
+                self.emit(f'return {value}', depth)
+
+                stack = []
+
+            elif op == 'tcall':
+                self.tail_call(instr[1], stack, depth, loop)
+                stack = []
+
+            elif op == 'jmp':
+                if stack:
+                    raise CannotStructure('Jump with a non-empty stack')
+
+                target = instr[1]
+                if loop is not None and target == loop[1]:
+                    self.emit('break', depth)
+
+                elif loop is not None and target == loop[0]:
+                    self.emit('continue', depth)
+
+                elif target > pc:
+                    pc = self.while_loop(pc, target, end, depth)
+                    continue
+
+                else:
+                    raise CannotStructure(f'Unstructured jump at {pc}')
+
+            elif op == 'cjmp':
+                cond = stack.pop()[0]
+                if stack:
+                    raise CannotStructure('Branch with a non-empty stack')
+
+                pc = self.if_else(pc, instr[1], cond, end, depth, loop)
+                continue
+
+            else:
+                self.simple(instr, stack, depth)
+
+            pc += 1
+
+        if stack:
+            raise CannotStructure('Values left on the stack')
+
+        return len(self.lines) - emitted
+
+    def while_loop(self, pc: int, cond_pos: int, end: int, depth: int) -> int:
+        """
+        jmp COND; BODY: <code>; COND: <cond>; cjmp BODY; END:
+        """
+
+        # the condition must be straight-line code ending at the back edge
+        back = cond_pos
+        while back < end:
+            last = parts_of(self.code[back])[-1]
+            if last[0] == 'cjmp' and last[1] == pc + 1:
+                break
+
+            if last[0] in ('jmp', 'cjmp', 'ret', 'tcall'):
+                raise CannotStructure(f'Unstructured loop at {pc}')
+
+            back += 1
+
+        else:
+            raise CannotStructure(f'Loop without a back edge at {pc}')
+
+        stack = []
+        emitted = len(self.lines)
+        for i in range(cond_pos, back + 1):
+            for j in parts_of(self.code[i]):
+                if j[0] != 'cjmp':
+                    self.simple(j, stack, depth)
+
+        # the condition is re-evaluated by the 'while' statement itself, so
+        # it must be a single expression
+        if len(stack) != 1 or len(self.lines) != emitted:
+            raise CannotStructure(f'Complex loop condition at {pc}')
+
+        self.emit(f'while {stack[0][0]}:', depth)
+        if not self.block(pc + 1, cond_pos, depth + 1, (cond_pos, back + 1)):
+            self.emit('pass', depth + 1)
+
+        return back + 1
+
+    def if_else(
+            self,
+            pc: int,
+            if_pos: int,
+            cond: str,
+            end: int,
+            depth: int,
+            loop
+        ) -> int:
+        """
+        <cond>; cjmp IF; <else>; jmp END; IF: <if>; END:
+        """
+
+        if not pc < if_pos <= end:
+            raise CannotStructure(f'Unstructured branch at {pc}')
+
+        jump = parts_of(self.code[if_pos - 1])[-1]
+        if jump[0] != 'jmp' or not if_pos <= jump[1] <= end:
+            raise CannotStructure(f'Unstructured branch at {pc}')
+
+        end_pos = jump[1]
+
+        self.emit(f'if {cond}:', depth)
+        if not self.block(if_pos, end_pos, depth + 1, loop):
+            self.emit('pass', depth + 1)
+
+        if pc + 1 < if_pos - 1:
+            self.emit('else:', depth)
+            if not self.block(pc + 1, if_pos - 1, depth + 1, loop):
+                self.lines.pop()
+
+        return end_pos
+
+
+def translate(index: int, funcs: [Function]) -> str:
+    return FunctionTranslator(index, funcs).translate()
+
+
+def can_translate(index: int, funcs: [Function]) -> bool:
+    try:
+        translate(index, funcs)
+    except (CannotStructure, IndexError, RecursionError):
+        return False
+
+    return True
+
+
+def recursive_functions(funcs: [Function]) -> set:
+    """
+    The indices of the functions that can call themselves again through
+    calls that stay calls once compiled: any call but a tail call of a
+    function to itself, which becomes a loop. Compiled, their recursion
+    would be bound by Python's recursion limit.
+    """
+
+    edges = [
+        [
+            i[1] for instr in func.code for i in parts_of(instr)
+            if i[0] == 'call' or i[0] == 'tcall' and i[1] != index
+        ]
+        for index, func in enumerate(funcs)
+    ]
+
+    return {
+        i for component in strongly_connected(edges)
+        if is_cycle(component, edges) for i in component
+    }
+
+
+def make_namespace(vm: DecodedVirtualMachine) -> dict:
+    """
+    The globals of the generated Python functions of a virtual machine.
+    Every function is expected to be bound to 'F_<its name>' in it.
+    """
+
+    namespace = {
+        'G': vm.glob_vars,
+        'AND': lambda b, a: b and a,
+        'OR': lambda b, a: b or a
+    }
+
+    for i, native in enumerate(vm.natives):
+        namespace[f'N{i}'] = native
+
+    return namespace
+
+
+def compile_function(index: int, funcs: [Function], namespace: dict):
+    """
+    Compiles a function into 'namespace' and returns it, or returns None if
+    the function cannot be translated.
+    """
+
+    name = funcs[index].name
+
+    try:
+        source = translate(index, funcs)
+        exec(compile(source, f'<{name}>', 'exec'), namespace)
+    except (CannotStructure, IndexError, SyntaxError, RecursionError):
+        return None
+
+    return namespace[f'F_{name}']
+
+
+def python_stub(compiled, params: int) -> Function:
+    """
+    A decoded function that calls a compiled one, for the interpreted code
+    that cannot call it directly.
+    """
+
+    code = [(LLOAD, i) for i in range(params)]
+    code += [(PYCALL, (compiled, params)), (RET, None)]
+
+    return Function(params, params, code)
+
+
+class CompiledVirtualMachine(DecodedVirtualMachine):
+    """
+    A virtual machine that translates every function it can into a Python
+    function, and interprets the others with the decoded engine.
+
+    Calls between compiled functions are plain Python calls, so the
+    functions that can recurse through them (see recursive_functions) are
+    interpreted, where the depth of the calls is only bound by memory.
+    """
+
+    def decode_functions(self, funcs) -> [Function]:
+        self.namespace = make_namespace(self)
+
+        # by function index
+        self.compiled = {}
+
+        recursive = recursive_functions(funcs)
+        for i in range(len(funcs)):
+            if i in recursive:
+                continue
+
+            compiled = compile_function(i, funcs, self.namespace)
+            if compiled is not None:
+                self.compiled[i] = compiled
+
+        decoded = []
+        for i, func in enumerate(funcs):
+            if i in self.compiled:
+                # for the tail calls of the interpreted functions
+                params = func.get_param_count()
+                decoded.append(python_stub(self.compiled[i], params))
+
+            else:
+                decoded.append(self.decode_function(func))
+                self.namespace[f'F_{func.name}'] = \
+                    self.interpreted(decoded[i])
+
+        return decoded
+
+    def interpreted(self, func: Function):
+        """
+        Wraps an interpreted function so that compiled code can call it.
+        """
+
+        def call(*args):
+            return self.run_function(func, list(args))
+
+        return call
+
+    def decode_function(self, func: Function) -> Function:
+        """
+        Decodes a function, calling the compiled functions directly.
+        """
+
+        func = decode(func)
+
+        for i, (op, arg) in enumerate(func.code):
+            if op == CALL and arg in self.compiled:
+                params = self.funcs[arg].get_param_count()
+                func.code[i] = (PYCALL, (self.compiled[arg], params))
+
+        return func
+
+    def run(self):
+        self.namespace['F_main']()
@@ -0,0 +1,390 @@
+import re
+import operator
+import textwrap
+import linecache
+
+from .simulation import InteractionHandler
+from .machine import Function, VirtualMachine, format_value
+
+
+# integer opcodes of the decoded instruction set
+(
+    LLOAD,
+    LSTORE,
+    GLOAD,
+    GSTORE,
+    PUSH,
+    POP,
+    JMP,
+    CJMP,
+    CALL,
+    TCALL,
+    NCALL,
+    RET,
+    UNOP,
+    BINOP,
+    LLOAD_LLOAD_BINOP_LSTORE,
+    LLOAD_CONST_BINOP_LSTORE,
+    LLOAD_LLOAD_BINOP,
+    LLOAD_CONST_BINOP,
+    BINOP_CJMP,
+    BINOP_LSTORE,
+    NCALL_POP,
+    PYCALL,
+    ENTRY,
+    BACK_JMP,
+    BACK_CJMP
+) = range(25)
+
+OP_NAMES = [
+    'LLOAD', 'LSTORE', 'GLOAD', 'GSTORE', 'PUSH', 'POP', 'JMP', 'CJMP',
+    'CALL', 'TCALL', 'NCALL', 'RET', 'UNOP', 'BINOP',
+    'LLOAD_LLOAD_BINOP_LSTORE', 'LLOAD_CONST_BINOP_LSTORE',
+    'LLOAD_LLOAD_BINOP', 'LLOAD_CONST_BINOP',
+    'BINOP_CJMP', 'BINOP_LSTORE', 'NCALL_POP', 'PYCALL', 'ENTRY', 'BACK_JMP',
+    'BACK_CJMP'
+]
+
+# the handlers are called as handler(b, a), where 'a' is the top of the stack
+BINOP_HANDLERS = {
+    'add': operator.add,
+    'subtract': operator.sub,
+    'mul': operator.mul,
+    'div': operator.floordiv,
+    'and': lambda b, a: b and a,
+    'or': lambda b, a: b or a,
+    'equal': operator.eq,
+    'nequal': operator.ne,
+    'less': operator.lt,
+    'great': operator.gt,
+    'leq': operator.le,
+    'geq': operator.ge
+}
+
+UNOP_HANDLERS = {
+    'neg': operator.neg,
+    'not': operator.not_
+}
+
+# superinstructions of fusion.PATTERNS; their argument is the tuple of the
+# decoded arguments of their parts
+FUSED_OPS = {
+    'lload_lload_binop_lstore': LLOAD_LLOAD_BINOP_LSTORE,
+    'lload_const_binop_lstore': LLOAD_CONST_BINOP_LSTORE,
+    'lload_lload_binop': LLOAD_LLOAD_BINOP,
+    'lload_const_binop': LLOAD_CONST_BINOP,
+    'binop_cjmp': BINOP_CJMP,
+    'binop_lstore': BINOP_LSTORE,
+    'ncall_pop': NCALL_POP
+}
+
+# instructions whose argument is kept as is
+DIRECT_OPS = {
+    'lload': LLOAD,
+    'lstore': LSTORE,
+    'gload': GLOAD,
+    'gstore': GSTORE,
+    'lint': PUSH,
+    'lstr': PUSH,
+    'jmp': JMP,
+    'cjmp': CJMP,
+    'call': CALL,
+    'tcall': TCALL,
+    'ncall': NCALL
+}
+
+
+def decode_instr(instr: list) -> (int, object):
+    """
+    Decodes a single preprocessed instruction into an (opcode, arg) pair.
+
+    Constants are materialized and operators are bound to their handler, so
+    that the dispatch loop does no further lookups on them.
+    """
+
+    op = instr[0]
+
+    if op in DIRECT_OPS:
+        return DIRECT_OPS[op], instr[1]
+
+    elif op in BINOP_HANDLERS:
+        return BINOP, BINOP_HANDLERS[op]
+
+    elif op in UNOP_HANDLERS:
+        return UNOP, UNOP_HANDLERS[op]
+
+    elif op == 'lboo':
+        return PUSH, bool(instr[1])
+
+    elif op == 'lnon':
+        return PUSH, None
+
+    elif op == 'pop':
+        return POP, None
+
+    elif op == 'ret':
+        return RET, None
+
+    elif op in FUSED_OPS:
+        return FUSED_OPS[op], tuple(decode_instr(i)[1] for i in instr[1:])
+
+    raise RuntimeError(f'Invalid instruction {op}')
+
+
+def decode(func: Function) -> Function:
+    """
+    Returns a copy of a function whose code is decoded into integer opcodes.
+    """
+
+    code = [decode_instr(i) for i in func.code]
+    return Function(
+        func.get_param_count(), func.get_local_count(), code, func.name
+    )
+
+
+# the dispatch loop of the engines that run decoded code, as the source of
+# the handler of every opcode, in the order of the chain: by how often each
+# instruction is executed. LOCAL(x) stands for the slot of local 'x', and
+# the opcodes that enter and leave frames (None here) are handled as the
+# frame layout of each engine says (see dispatch_loop).
+HANDLERS = {
+    LLOAD: 'push(LOCAL(arg))',
+    LLOAD_LLOAD_BINOP_LSTORE: '''
+        a, b, handler, c = arg
+        LOCAL(c) = handler(LOCAL(a), LOCAL(b))
+    ''',
+    LLOAD_CONST_BINOP_LSTORE: '''
+        a, value, handler, c = arg
+        LOCAL(c) = handler(LOCAL(a), value)
+    ''',
+    LLOAD_LLOAD_BINOP: '''
+        a, b, handler = arg
+        push(handler(LOCAL(a), LOCAL(b)))
+    ''',
+    LLOAD_CONST_BINOP: '''
+        a, value, handler = arg
+        push(handler(LOCAL(a), value))
+    ''',
+    BINOP_CJMP: '''
+        handler, target = arg
+        a = pop()
+        if handler(pop(), a):
+            pc = target
+    ''',
+    PUSH: 'push(arg)',
+    BINOP: '''
+        a = pop()
+        stack[-1] = arg(stack[-1], a)
+    ''',
+    LSTORE: 'LOCAL(arg) = pop()',
+    BINOP_LSTORE: '''
+        handler, c = arg
+        a = pop()
+        LOCAL(c) = handler(pop(), a)
+    ''',
+    CJMP: '''
+        if pop():
+            pc = arg
+    ''',
+    JMP: 'pc = arg',
+    GLOAD: 'push(glob_vars[arg])',
+    GSTORE: 'glob_vars[arg] = pop()',
+    CALL: None,
+    RET: None,
+    TCALL: None,
+    PYCALL: '''
+        # a function compiled to Python (see compiled_machine.py)
+        handler, params = arg
+        if params:
+            value = handler(*stack[-params:])
+            del stack[-params:]
+            push(value)
+        else:
+            push(handler())
+    ''',
+    NCALL: 'stack[-1] = natives[arg](stack[-1])',
+    NCALL_POP: 'natives[arg[0]](pop())',
+    POP: 'pop()',
+    UNOP: 'stack[-1] = arg(stack[-1])',
+
+    # counters of tiered_machine.py, only in code of the lower tiers
+    ENTRY: '''
+        arg.calls += 1
+        if arg.calls >= arg.next_calls:
+            self.promote(arg, 'calls')
+    ''',
+    BACK_CJMP: '''
+        state, target = arg
+        if pop():
+            pc = target
+            state.loops += 1
+            if state.loops >= state.next_loops:
+                code, pc = self.promote_loop(state, code, pc)
+    ''',
+    BACK_JMP: '''
+        state, pc = arg
+        state.loops += 1
+        if state.loops >= state.next_loops:
+            code, pc = self.promote_loop(state, code, pc)
+    '''
+}
+
+
+def block(source: str, depth: int) -> str:
+    """
+    A handler of HANDLERS, or a part of a frame layout, indented to 'depth'.
+    """
+
+    return textwrap.indent(textwrap.dedent(source).strip('\n'), '    ' * depth)
+
+
+def dispatch_loop(name: str, local: str, setup: str, frame_ops: dict):
+    """
+    Generates the 'run_function' method of an engine that runs decoded
+    code, from HANDLERS and the layout of its frames: the source of the
+    slot of a local ('{}' for its index), the 'setup' of the stack, the
+    frames, 'code', 'pc' and the locals of 'func' called with 'args', and
+    the handlers of the opcodes that enter and leave frames.
+    """
+
+    handlers = {**HANDLERS, **frame_ops}
+
+    lines = [
+        'def run_function(self, func, args):',
+        '    """',
+        '    Runs a decoded function, and all the functions it calls,',
+        '    until it returns. Returns its return value.',
+        '    """',
+        '',
+        '    funcs = self.decoded',
+        '    glob_vars = self.glob_vars',
+        '    natives = self.natives',
+        '',
+        block(setup, 1),
+        '',
+        '    while True:',
+        '        op, arg = code[pc]',
+        '        pc += 1',
+        ''
+    ]
+
+    keyword = 'if'
+    for op, source in handlers.items():
+        lines.append(f'        {keyword} op == {OP_NAMES[op]}:')
+        lines.append(block(source, 3))
+        lines.append('')
+        keyword = 'elif'
+
+    lines += [
+        '        else:',
+        "            raise RuntimeError(f'Invalid opcode {op}')"
+    ]
+
+    source = re.sub(
+        r'LOCAL\((\w+)\)',
+        lambda match: local.format(match.group(1)),
+        '\n'.join(lines) + '\n'
+    )
+
+    # so that tracebacks show the lines of the generated loop
+    filename = f'<{name} dispatch loop>'
+    linecache.cache[filename] = (
+        len(source), None, source.splitlines(True), filename
+    )
+
+    namespace = dict(globals())
+    exec(compile(source, filename, 'exec'), namespace)
+
+    return namespace['run_function']
+
+
+class DecodedVirtualMachine(VirtualMachine):
+    """
+    A virtual machine that decodes every function once when it is loaded and
+    then runs all of them in a single dispatch loop, with the stack, the
+    locals and the program counter kept in local variables.
+
+    Behaves identically to VirtualMachine, which is kept as the reference
+    engine. Also runs the superinstructions of fusion.PATTERNS.
+    """
+
+    supports_fusion = True
+
+    def __init__(self, io: InteractionHandler, glob_var_count: int, funcs):
+        super(DecodedVirtualMachine, self).__init__(
+            io, glob_var_count, funcs
+        )
+
+        self.natives = [
+            self.native_print,
+            self.io.get_input,
+            int,
+            str
+        ]
+        self.decoded = self.decode_functions(funcs)
+
+    def decode_functions(self, funcs) -> [Function]:
+        """
+        Returns the functions to run, by index. Called once on construction.
+        """
+
+        return [decode(i) for i in funcs]
+
+    def native_print(self, value):
+        self.io.output(format_value(value))
+
+    def run(self):
+        self.run_function(self.decoded[self.main], [])
+
+    # the locals of every call in a list of their own
+    run_function = dispatch_loop(
+        'decoded',
+        local='local_vars[{}]',
+        setup='''
+            stack = []
+            push = stack.append
+            pop = stack.pop
+
+            # saved (code, pc, locals) of the callers
+            frames = []
+
+            code = func.code
+            local_vars = [None] * func.local_count
+            local_vars[:len(args)] = args
+            pc = 0
+        ''',
+        frame_ops={
+            CALL: '''
+                frames.append((code, pc, local_vars))
+
+                func = funcs[arg]
+                code = func.code
+                pc = 0
+
+                # the arguments are on top of the stack in parameter order
+                params = func.param_count
+                local_vars = [None] * func.local_count
+                if params:
+                    local_vars[:params] = stack[-params:]
+                    del stack[-params:]
+            ''',
+            RET: '''
+                if not frames:
+                    return pop()
+
+                code, pc, local_vars = frames.pop()
+            ''',
+            TCALL: '''
+                # same as CALL, but replaces the frame of the caller
+                func = funcs[arg]
+                code = func.code
+                pc = 0
+
+                params = func.param_count
+                local_vars = [None] * func.local_count
+                if params:
+                    local_vars[:params] = stack[-params:]
+                    del stack[-params:]
+            '''
+        }
+    )
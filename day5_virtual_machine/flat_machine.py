@@ -0,0 +1,76 @@
+from .decoded_machine import (
+    DecodedVirtualMachine, CALL, TCALL, RET, dispatch_loop
+)
+
+
+class FlatVirtualMachine(DecodedVirtualMachine):
+    """
+    The decoded engine with a single value stack instead of a list of
+    locals per call.
+
+    A frame is the part of the stack above its base pointer: the arguments
+    already pushed by the caller become the first locals in place, the
+    other locals are pushed on top of them, and the values the function
+    computes go above its locals. 'ret' drops the frame and resets the base
+    to the caller's one.
+
+        caller values | arg 0 ... arg n | other locals | values
+                        ^ base
+
+    Only the frames differ: the rest of the dispatch loop is generated from
+    the same handlers as the decoded engine's (see dispatch_loop).
+    """
+
+    run_function = dispatch_loop(
+        'flat',
+        local='stack[base + {}]',
+        setup='''
+            stack = list(args)
+            push = stack.append
+            pop = stack.pop
+
+            # saved code, pc and base of the callers, three entries per call
+            frames = []
+
+            code = func.code
+            base = 0
+            stack += [None] * (func.local_count - len(args))
+            pc = 0
+        ''',
+        frame_ops={
+            CALL: '''
+                frames += (code, pc, base)
+
+                func = funcs[arg]
+                code = func.code
+                pc = 0
+
+                base = len(stack) - func.param_count
+                extra = func.local_count - func.param_count
+                if extra:
+                    stack += [None] * extra
+            ''',
+            RET: '''
+                value = pop()
+                if not frames:
+                    return value
+
+                del stack[base:]
+                push(value)
+                base = frames.pop()
+                pc = frames.pop()
+                code = frames.pop()
+            ''',
+            TCALL: '''
+                # the arguments move down to the base of the current frame
+                func = funcs[arg]
+                code = func.code
+                pc = 0
+
+                stack[base:] = stack[len(stack) - func.param_count:]
+                extra = func.local_count - func.param_count
+                if extra:
+                    stack += [None] * extra
+            '''
+        }
+    )
@@ -0,0 +1,123 @@
+BINOPS = {
+    'add', 'subtract', 'mul', 'div', 'and', 'or',
+    'equal', 'nequal', 'less', 'great', 'leq', 'geq'
+}
+
+CONSTS = {'lint', 'lstr', 'lboo', 'lnon'}
+
+JUMPS = {'jmp', 'cjmp'}
+
+# Superinstructions, tried longest first at every position. Each pattern is
+# a sequence of sets of instruction names; a matching run of instructions is
+# replaced by [name, *instructions], keeping the original instructions as its
+# parts. Engines with 'supports_fusion' must be able to decode every name in
+# this table.
+#
+# The patterns were picked from the dynamic instruction pair counts of our
+# workloads (see benchmarks/fusion.py).
+PATTERNS = [
+    # a = b <op> c;
+    ('lload_lload_binop_lstore', ({'lload'}, {'lload'}, BINOPS, {'lstore'})),
+    # i = i + 1;
+    ('lload_const_binop_lstore', ({'lload'}, CONSTS, BINOPS, {'lstore'})),
+    ('lload_lload_binop', ({'lload'}, {'lload'}, BINOPS)),
+    ('lload_const_binop', ({'lload'}, CONSTS, BINOPS)),
+    # loop and if conditions
+    ('binop_cjmp', (BINOPS, {'cjmp'})),
+    ('binop_lstore', (BINOPS, {'lstore'})),
+    # discarded 'print' results
+    ('ncall_pop', ({'ncall'}, {'pop'}))
+]
+
+
+def index_patterns(patterns: list) -> {str: list}:
+    """
+    Groups the patterns by the instructions they can start with, keeping the
+    longest first.
+    """
+
+    by_first = {}
+    for name, matchers in sorted(patterns, key=lambda i: -len(i[1])):
+        for op in matchers[0]:
+            by_first.setdefault(op, []).append((name, matchers))
+
+    return by_first
+
+
+PATTERN_INDEX = index_patterns(PATTERNS)
+
+
+def match_pattern(code: [list], pc: int, targets: set, index: dict):
+    """
+    Returns the (name, length) of the longest pattern starting at 'pc', or
+    None. A pattern never spans a jump target, since jumping into the middle
+    of a superinstruction is impossible.
+    """
+
+    for name, matchers in index.get(code[pc][0], ()):
+        if pc + len(matchers) > len(code):
+            continue
+
+        # the first instruction already matched through the index
+        for k in range(1, len(matchers)):
+            if code[pc + k][0] not in matchers[k] or pc + k in targets:
+                break
+        else:
+            return name, len(matchers)
+
+    return None
+
+
+def remap_jump(instr: list, new_index: [int]) -> list:
+    if instr[0] in JUMPS:
+        return [instr[0], new_index[instr[1]]]
+
+    return instr
+
+
+def fuse(code: [list], patterns: list = None) -> [list]:
+    """
+    Rewrites runs of preprocessed instructions into superinstructions and
+    remaps the jump targets to the new positions.
+    """
+
+    return fuse_with_map(code, patterns)[0]
+
+
+def fuse_with_map(code: [list], patterns: list = None) -> ([list], [int]):
+    """
+    Same as fuse, but also returns the new position of every instruction
+    (and of the end of the code).
+    """
+
+    index = PATTERN_INDEX if patterns is None else index_patterns(patterns)
+    targets = {i[1] for i in code if i[0] in JUMPS}
+
+    out = []
+    new_index = [0] * (len(code) + 1)
+
+    pc = 0
+    while pc < len(code):
+        match = match_pattern(code, pc, targets, index)
+        length = 1 if match is None else match[1]
+
+        for i in range(pc, pc + length):
+            new_index[i] = len(out)
+
+        if match is None:
+            out.append(code[pc])
+        else:
+            out.append([match[0]] + code[pc : pc + length])
+
+        pc += length
+
+    new_index[len(code)] = len(out)
+
+    for i, instr in enumerate(out):
+        if instr[0] in JUMPS:
+            out[i] = remap_jump(instr, new_index)
+
+        elif len(instr) > 1 and isinstance(instr[1], list): # fused
+            out[i] = [instr[0]] + [remap_jump(j, new_index) for j in instr[1:]]
+
+    return out, new_index
@@ -0,0 +1,73 @@
+# Graph algorithms shared by the linker and the inliner of day2_parser, on
+# graphs whose nodes are the indices of a list of edge targets.
+
+
+def strongly_connected(edges: [[int]]) -> [[int]]:
+    """
+    The strongly connected components of a graph given as the targets of
+    the edges from each node, sorted, every one after those it has edges to
+    unless they lead back to it.
+
+    Tarjan's algorithm, with an explicit stack so that long call chains do
+    not hit Python's recursion limit.
+    """
+
+    order = [None] * len(edges)
+    low = [0] * len(edges)
+    on_stack = [False] * len(edges)
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(len(edges)):
+        if order[root] is not None:
+            continue
+
+        # (node, position of the next edge to visit)
+        work = [(root, 0)]
+        while work:
+            node, pos = work.pop()
+
+            if pos == 0:
+                order[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+
+            for i in range(pos, len(edges[node])):
+                target = edges[node][i]
+
+                if order[target] is None:
+                    work.append((node, i + 1))
+                    work.append((target, 0))
+                    break
+
+                if on_stack[target]:
+                    low[node] = min(low[node], order[target])
+
+            else:
+                if low[node] == order[node]:
+                    component = []
+                    while True:
+                        top = stack.pop()
+                        on_stack[top] = False
+                        component.append(top)
+                        if top == node:
+                            break
+
+                    components.append(sorted(component))
+
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+
+    return components
+
+
+def is_cycle(component: [int], edges: [[int]]) -> bool:
+    """
+    Whether a component of strongly_connected is a cycle: several nodes, or
+    one with an edge to itself.
+    """
+
+    return len(component) > 1 or component[0] in edges[component[0]]
@@ -0,0 +1,120 @@
+from day1_lexer import InvalidByteSyntaxError
+
+from .graphs import strongly_connected, is_cycle
+
+
+# instructions whose argument is the name of a user function
+CALL_OPS = {'call', 'tcall'}
+
+NATIVE_COUNT = 4
+
+
+def link(file_rep: dict) -> dict:
+    """
+    Resolves the targets of the calls of a loaded bytecode (see
+    byte_loader.read_bytecode) to the index of the function in 'funcs', and
+    rejects the bytecodes that call unknown functions.
+
+    Returns a new file representation with the same functions in the same
+    order, with the index of 'main' and the call graph (see call_graph).
+    """
+
+    index = {}
+    for i, func in enumerate(file_rep['funcs']):
+        if func['name'] in index:
+            raise InvalidByteSyntaxError(
+                f'Function {func["name"]} is defined multiple times'
+            )
+
+        index[func['name']] = i
+
+    if 'main' not in index:
+        raise InvalidByteSyntaxError('No main function')
+
+    funcs = []
+    for func in file_rep['funcs']:
+        code = []
+        for instr in func['code']:
+            op = instr[0]
+
+            if op in CALL_OPS:
+                if instr[1] not in index:
+                    raise InvalidByteSyntaxError(
+                        f'Function {func["name"]} calls unknown function '
+                        f'{instr[1]}'
+                    )
+
+                instr = [op, index[instr[1]]]
+
+            elif op == 'ncall' and not 0 <= instr[1] < NATIVE_COUNT:
+                raise InvalidByteSyntaxError(
+                    f'Function {func["name"]} calls unknown native function '
+                    f'{instr[1]}'
+                )
+
+            code.append(instr)
+
+        funcs.append({**func, 'code': code})
+
+    callees = [
+        sorted({i[1] for i in func['code'] if i[0] in CALL_OPS})
+        for func in funcs
+    ]
+
+    return {
+        'glob_var_count': file_rep['glob_var_count'],
+        'funcs': funcs,
+        'main': index['main'],
+        'call_graph': call_graph(callees)
+    }
+
+
+def call_graph(callees: [[int]]) -> dict:
+    """
+    Summarizes the calls between functions, by function index: the functions
+    each one calls, the functions calling each one, and the recursion cycles
+    (groups of functions that can call themselves through one another).
+    """
+
+    callers = [[] for _ in callees]
+    for caller, targets in enumerate(callees):
+        for callee in targets:
+            callers[callee].append(caller)
+
+    cycles = [
+        component for component in strongly_connected(callees)
+        if is_cycle(component, callees)
+    ]
+
+    return {
+        'callees': callees,
+        'callers': callers,
+        'cycles': cycles
+    }
+
+
+def format_call_graph(linked: dict) -> [str]:
+    """
+    The call graph of a linked bytecode as readable lines.
+    """
+
+    names = [i['name'] for i in linked['funcs']]
+    graph = linked['call_graph']
+
+    def name_list(indices: [int]) -> str:
+        return ', '.join(names[i] for i in indices) or '-'
+
+    lines = []
+    for i, name in enumerate(names):
+        lines.append(name)
+        lines.append(f'    calls: {name_list(graph["callees"][i])}')
+        lines.append(f'    called by: {name_list(graph["callers"][i])}')
+
+    lines.append('')
+    if graph['cycles']:
+        lines.append('recursion cycles:')
+        lines += [f'    {name_list(i)}' for i in graph['cycles']]
+    else:
+        lines.append('no recursion')
+
+    return lines
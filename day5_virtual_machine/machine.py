@@ -1,37 +1,132 @@
 from .simulation import InteractionHandler, NativeHandler
 from .byte_loader import read_bytecode
+from .fusion import fuse
+from .linker import link
 
 
-def run_code(code: [str], io_handler: InteractionHandler = None):
+def run_code(
+        code: [str],
+        io_handler: InteractionHandler = None,
+        engine: str = 'decoded',
+        fusion: bool = True,
+        **engine_options
+    ):
     """
-    Runs a given bytecode.
+    Runs a given bytecode and returns the virtual machine that ran it.
 
     Note that all IO actions must be performed with 'io_handler' to
     pass the tests.
+
+    'engine' selects the execution engine (see ENGINES); 'reference' is the
+    original instruction-by-instruction interpreter. 'fusion' enables the
+    superinstructions of fusion.py on the engines that support them. Any
+    other keyword argument is passed on to the engine.
+    """
+
+    return run_file_rep(
+        read_bytecode(code), io_handler, engine, fusion, **engine_options
+    )
+
+
+def run_file_rep(
+        file_rep: dict,
+        io_handler: InteractionHandler = None,
+        engine: str = 'decoded',
+        fusion: bool = True,
+        **engine_options
+    ):
+    """
+    Runs an already loaded bytecode (see byte_loader.read_bytecode).
     """
 
     if io_handler is None:
             io_handler = NativeHandler()
 
-    file_rep = read_bytecode(code)
-    funcs = {
-        i['name']: Function(i['param_count'], i['local_count'], i['code'])
-        for i in file_rep['funcs']
-    }
+    vm_type = ENGINES[engine]
+    glob_var_count, funcs = load_file_rep(
+        file_rep, fusion and vm_type.supports_fusion
+    )
 
-    vm = VirtualMachine(io_handler, file_rep['glob_var_count'], funcs)
+    vm = vm_type(io_handler, glob_var_count, funcs, **engine_options)
     vm.run()
 
+    return vm
+
+
+def load_code(code: [str], fusion: bool = False) -> (int, ['Function']):
+    """
+    Loads a bytecode into its global variable count and its functions.
+    """
+
+    return load_file_rep(read_bytecode(code), fusion)
+
+
+def load_file_rep(
+        file_rep: dict,
+        fusion: bool = False
+    ) -> (int, ['Function']):
+    """
+    Links a loaded bytecode (see linker.link) into the function array of
+    the virtual machines, where calls refer to functions by index.
+    """
+
+    linked = link(file_rep)
+
+    funcs = [
+        Function(
+            i['param_count'],
+            i['local_count'],
+            fuse(i['code']) if fusion else i['code'],
+            i['name']
+        )
+        for i in linked['funcs']
+    ]
+
+    return linked['glob_var_count'], funcs
+
+
+def find_function(funcs: ['Function'], name: str) -> int:
+    """
+    Returns the index of a function in a function array.
+    """
+
+    for i, func in enumerate(funcs):
+        if func.name == name:
+            return i
+
+    raise RuntimeError(f'No function {name}')
+
+
+def format_value(value) -> str:
+    """
+    Converts a value to the string shown by the 'print' native function.
+    """
+
+    table = {
+        True: 'TRUE',
+        False: 'FALSE',
+        None: 'NONE'
+    }
+
+    return str(value) if isinstance(value, int) else table.get(value, value)
+
 
 class Function:
     """
     Represents a function in the code.
     """
 
-    def __init__(self, param_count: int, local_count: int, code):
+    def __init__(
+            self,
+            param_count: int,
+            local_count: int,
+            code,
+            name: str = None
+        ):
         self.param_count = param_count
         self.local_count = local_count
         self.code = code
+        self.name = name
 
     def get_code(self, pc: int):
         """
@@ -53,6 +148,13 @@ class Frame:
     """
 
     def __init__(self, func: Function):
+        self.reset(func)
+
+    def reset(self, func: Function):
+        """
+        Starts the frame over with another function.
+        """
+
         self.func = func
         self.locals = [None] * self.func.get_local_count()
         self.pc = 0
@@ -80,9 +182,13 @@ class VirtualMachine:
     Implement it however you like. Feel free to add new methods to this class.
     """
 
+    # whether the loader should fuse the code for this engine (see fusion.py)
+    supports_fusion = False
+
     def __init__(self, io: InteractionHandler, glob_var_count: int, funcs):
         self.glob_vars = [None] * glob_var_count
-        self.funcs = funcs
+        self.funcs = funcs # linked, see load_file_rep
+        self.main = find_function(funcs, 'main')
         self.io = io
         self.frame_stack = []
         self.exec_stack = []
@@ -95,18 +201,38 @@ class VirtualMachine:
         Executes the 'main' function.
         """
 
-        raise NotImplementedError
+        self.prep_func(self.main)
+
+        while self.frame_stack:
+            self.execute()
 
-    def prep_func(self, func_name: str):
+    def prep_func(self, func_index: int):
         """
         Prepares to run a function.
         """
 
-        func = self.funcs[func_name]
+        func = self.funcs[func_index]
         curr_frame = Frame(func)
         self.frame_stack.append(curr_frame)
 
-        # load params
+        self.load_params(func)
+
+    def tail_call(self, func_index: int):
+        """
+        Runs a function in the frame of the current one, which returns
+        whatever the function returns.
+        """
+
+        func = self.funcs[func_index]
+        self.get_curr_frame().reset(func)
+
+        self.load_params(func)
+
+    def load_params(self, func: Function):
+        """
+        Moves the arguments from the stack into the current frame.
+        """
+
         params = func.get_param_count()
         for i in range(params):
             self.lstore(params - i - 1) # reverse stack order
@@ -168,6 +294,10 @@ class VirtualMachine:
             increment = False
             frame.pc = code[1]
 
+        elif op == 'tcall':
+            increment = False
+            self.tail_call(code[1])
+
         elif op == 'cjmp':
             value = self.exec_stack.pop()
 
@@ -214,15 +344,7 @@ class VirtualMachine:
         arg = self.exec_stack.pop()
 
         if index == 0: # print
-            table = {
-                True: 'TRUE',
-                False: 'FALSE',
-                None: 'NONE'
-            }
-
-            value = str(arg) if isinstance(arg, int) else table.get(arg, arg)
-
-            self.io.output(value)
+            self.io.output(format_value(arg))
             self.exec_stack.append(None)
 
         elif index == 1: # input
@@ -235,4 +357,18 @@ class VirtualMachine:
             self.exec_stack.append(str(arg))
 
         else:
-            raise RuntimeError(f'Invalid native function with index {index}')
\ No newline at end of file
+            raise RuntimeError(f'Invalid native function with index {index}')
+
+
+from .decoded_machine import DecodedVirtualMachine
+from .flat_machine import FlatVirtualMachine
+from .compiled_machine import CompiledVirtualMachine
+from .tiered_machine import TieredVirtualMachine
+
+ENGINES = {
+    'reference': VirtualMachine,
+    'decoded': DecodedVirtualMachine,
+    'flat': FlatVirtualMachine,
+    'compiled': CompiledVirtualMachine,
+    'tiered': TieredVirtualMachine
+}
@@ -0,0 +1,375 @@
+from day1_lexer import InvalidByteSyntaxError
+
+from .byte_loader import read_bytecode, write_bytecode
+from .linker import link
+from .machine import Function
+from .compiled_machine import can_translate
+
+
+# Optimizations of a loaded bytecode (see byte_loader.read_bytecode) on the
+# control flow graph of every function: the code is split into basic blocks
+# whose jumps refer to blocks, rewritten, then laid out again with the
+# jumps fixed up to the new program counters.
+#
+# Threading jumps and dropping unreachable code or jumps to the next block
+# can leave shapes other than those of the 'if' and 'while' of the code
+# generator, which the 'compiled' engine cannot translate back into Python
+# (see compiled_machine.FunctionTranslator). A function that it could
+# translate before but not after is optimized again keeping every jump.
+
+JUMPS = {'jmp', 'cjmp'}
+
+# instructions after which the next one never runs
+EXITS = {'jmp', 'ret', 'tcall'}
+
+# instructions that push a value without any other effect
+PURE_PUSHES = {'lload', 'gload', 'lint', 'lstr', 'lboo', 'lnon'}
+
+# instructions that may read the globals, or leave the function
+GLOBAL_READERS = {'call', 'tcall', 'ret'}
+
+# rounds of the passes at most, as each can enable the others
+MAX_ROUNDS = 8
+
+
+def build_blocks(code: [list]) -> ([[list]], set):
+    """
+    Splits the code of a function into basic blocks. Every block ends with
+    a 'ret', a 'tcall' or a 'jmp' (possibly after a 'cjmp'), whose targets
+    are block indices, so that blocks can be removed and moved freely.
+    Also returns the blocks that fall through to the next one, whose 'jmp'
+    is added.
+
+    Returns None, None if the code can run past its end.
+    """
+
+    if not code or code[-1][0] not in EXITS:
+        return None, None
+
+    leaders = {0}
+    for pc, instr in enumerate(code):
+        if instr[0] in JUMPS:
+            if not 0 <= instr[1] < len(code):
+                return None, None
+
+            leaders.add(instr[1])
+
+        if instr[0] in JUMPS or instr[0] in EXITS:
+            leaders.add(pc + 1)
+
+    starts = sorted(i for i in leaders if i < len(code))
+    block_index = {pc: i for i, pc in enumerate(starts)}
+
+    blocks = []
+    falls = set()
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(code)
+
+        block = []
+        for instr in code[start : end]:
+            if instr[0] in JUMPS:
+                instr = [instr[0], block_index[instr[1]]]
+
+            block.append(list(instr))
+
+        # make the fall through explicit
+        if block[-1][0] not in EXITS:
+            block.append(['jmp', i + 1])
+            falls.add(i)
+
+        blocks.append(block)
+
+    return blocks, falls
+
+
+def successors(block: [list]) -> [int]:
+    return [i[1] for i in block[-2:] if i[0] in JUMPS]
+
+
+def thread_jumps(blocks: [[list]]):
+    """
+    Retargets the jumps to a block that only jumps elsewhere.
+    """
+
+    for block in blocks:
+        for instr in block[-2:]:
+            if instr[0] not in JUMPS:
+                continue
+
+            seen = set()
+            target = instr[1]
+
+            while blocks[target] is not None and \
+                  len(blocks[target]) == 1 and \
+                  blocks[target][0][0] == 'jmp' and target not in seen:
+                seen.add(target)
+                target = blocks[target][0][1]
+
+            instr[1] = target
+
+        # 'cjmp X; jmp X' only discards the condition
+        if len(block) > 1 and block[-2][0] == 'cjmp' and \
+           block[-2][1] == block[-1][1]:
+            block[-2] = ['pop']
+
+
+def remove_unreachable(blocks: [[list]]):
+    """
+    Replaces the blocks that are never reached from the entry by None.
+    """
+
+    reached = {0}
+    work = [0]
+
+    while work:
+        for i in successors(blocks[work.pop()]):
+            if i not in reached:
+                reached.add(i)
+                work.append(i)
+
+    for i in range(len(blocks)):
+        if i not in reached:
+            blocks[i] = None
+
+
+def live_locals(blocks: [[list]]) -> [set]:
+    """
+    The local slots that may be read after the end of every block, before
+    being stored again.
+    """
+
+    # the slots read before being stored in every block, and those stored
+    uses = []
+    defs = []
+    for block in blocks:
+        used, defined = set(), set()
+
+        for instr in block or ():
+            if instr[0] == 'lload' and instr[1] not in defined:
+                used.add(instr[1])
+
+            elif instr[0] == 'lstore':
+                defined.add(instr[1])
+
+        uses.append(used)
+        defs.append(defined)
+
+    live_in = [set() for _ in blocks]
+    live_out = [set() for _ in blocks]
+
+    changed = True
+    while changed:
+        changed = False
+
+        for i in reversed(range(len(blocks))):
+            if blocks[i] is None:
+                continue
+
+            out = set()
+            for j in successors(blocks[i]):
+                out |= live_in[j]
+
+            new_in = uses[i] | out - defs[i]
+            if new_in != live_in[i] or out != live_out[i]:
+                live_in[i], live_out[i] = new_in, out
+                changed = True
+
+    return live_out
+
+
+def remove_dead_stores(block: [list], live_out: set) -> [list]:
+    """
+    Drops the stores to locals that are never read again and to globals
+    that are overwritten in the block before anything can read them, the
+    pairs 'lload x; lstore x', and the pairs 'lstore x; lload x' when x is
+    not read again (the value just stays on the stack).
+    """
+
+    # the live locals after every instruction
+    live = set(live_out)
+    live_after = [None] * len(block)
+    for k in reversed(range(len(block))):
+        live_after[k] = live
+        op = block[k][0]
+
+        if op == 'lstore':
+            live = live - {block[k][1]}
+        elif op == 'lload':
+            live = live | {block[k][1]}
+
+    # the globals stored again before being read, after every instruction
+    overwritten = set()
+    dead_globals = set()
+    for k in reversed(range(len(block))):
+        op = block[k][0]
+
+        if op == 'gstore':
+            if block[k][1] in overwritten:
+                dead_globals.add(k)
+            overwritten.add(block[k][1])
+
+        elif op == 'gload':
+            overwritten.discard(block[k][1])
+
+        elif op in GLOBAL_READERS:
+            overwritten = set()
+
+    out = []
+    k = 0
+    while k < len(block):
+        instr = block[k]
+        following = block[k + 1] if k + 1 < len(block) else None
+
+        if instr[0] == 'lload' and following == ['lstore', instr[1]]:
+            k += 2
+            continue
+
+        if instr[0] == 'lstore' and following == ['lload', instr[1]] and \
+           instr[1] not in live_after[k + 1]:
+            k += 2
+            continue
+
+        if instr[0] == 'lstore' and instr[1] not in live_after[k] or \
+           k in dead_globals:
+            instr = ['pop']
+
+        # a value that is pushed only to be discarded
+        if instr == ['pop'] and out and out[-1][0] in PURE_PUSHES:
+            out.pop()
+        else:
+            out.append(instr)
+
+        k += 1
+
+    return out
+
+
+def lay_out(blocks: [[list]], falls: set = None) -> [list]:
+    """
+    Concatenates the remaining blocks in order, without the jumps to the
+    next block (only those of the blocks in 'falls' if given), and resolves
+    the jumps to program counters.
+    """
+
+    order = [i for i, block in enumerate(blocks) if block is not None]
+
+    kept = []
+    for n, i in enumerate(order):
+        block = blocks[i]
+        following = order[n + 1] if n + 1 < len(order) else None
+
+        if block[-1] == ['jmp', following] and (falls is None or i in falls):
+            block = block[:-1]
+
+        kept.append(block)
+
+    starts = {}
+    pc = 0
+    for i, block in zip(order, kept):
+        starts[i] = pc
+        pc += len(block)
+
+    code = []
+    for block in kept:
+        for instr in block:
+            if instr[0] in JUMPS:
+                instr = [instr[0], starts[instr[1]]]
+
+            code.append(instr)
+
+    return code
+
+
+def optimize_function(code: [list], keep_jumps: bool = False) -> [list]:
+    """
+    Optimizes the preprocessed code of a function until it stops changing.
+    With 'keep_jumps', only the stores are optimized, and the jumps and
+    blocks stay as they are.
+    """
+
+    for _ in range(MAX_ROUNDS):
+        blocks, falls = build_blocks(code)
+        if blocks is None:
+            return code
+
+        if not keep_jumps:
+            thread_jumps(blocks)
+            remove_unreachable(blocks)
+
+        live_out = live_locals(blocks)
+        for i, block in enumerate(blocks):
+            if block is not None:
+                blocks[i] = remove_dead_stores(block, live_out[i])
+
+        optimized = lay_out(blocks, falls if keep_jumps else None)
+        if optimized == code:
+            break
+
+        code = optimized
+
+    return code
+
+
+def translatable(file_rep: dict) -> [bool]:
+    """
+    Whether the 'compiled' engine can translate every function of a loaded
+    bytecode, or None if the bytecode cannot be linked.
+    """
+
+    try:
+        linked = link(file_rep)
+    except InvalidByteSyntaxError:
+        return None
+
+    funcs = [
+        Function(i['param_count'], i['local_count'], i['code'], i['name'])
+        for i in linked['funcs']
+    ]
+
+    return [can_translate(i, funcs) for i in range(len(funcs))]
+
+
+def optimize_file_rep(file_rep: dict) -> dict:
+    """
+    Optimizes every function of a loaded bytecode, into a new one.
+
+    Threading jumps can turn the control flow of an 'if' or a 'while' into
+    one the 'compiled' engine cannot translate, so the functions that were
+    translatable and no longer are keep their jumps. A bytecode that cannot
+    be linked cannot be checked, and keeps the jumps of every function.
+    """
+
+    def optimize_all(keep_jumps: bool) -> dict:
+        return {
+            'glob_var_count': file_rep['glob_var_count'],
+            'funcs': [
+                dict(func, code=optimize_function(func['code'], keep_jumps))
+                for func in file_rep['funcs']
+            ]
+        }
+
+    optimized = optimize_all(keep_jumps=False)
+
+    after = translatable(optimized)
+    if after is None:
+        return optimize_all(keep_jumps=True)
+
+    if all(after):
+        return optimized
+
+    before = translatable(file_rep)
+    for i, func in enumerate(file_rep['funcs']):
+        if before[i] and not after[i]:
+            optimized['funcs'][i] = dict(
+                func, code=optimize_function(func['code'], keep_jumps=True)
+            )
+
+    return optimized
+
+
+def optimize_code(code: [str]) -> [str]:
+    """
+    Optimizes a text bytecode, e.g. the output of codegen.generate.
+    """
+
+    return write_bytecode(optimize_file_rep(read_bytecode(code)))
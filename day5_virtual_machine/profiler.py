@@ -0,0 +1,197 @@
+import time
+import collections
+
+from .simulation import InteractionHandler, NativeHandler
+from .byte_loader import read_bytecode
+from .machine import VirtualMachine, load_file_rep
+
+
+def profile_code(
+        code: [str],
+        io_handler: InteractionHandler = None
+    ) -> 'ProfilingVirtualMachine':
+    """
+    Runs a given bytecode under the profiler and returns the profiler.
+    """
+
+    if io_handler is None:
+        io_handler = NativeHandler()
+
+    vm = ProfilingVirtualMachine(
+        io_handler, *load_file_rep(read_bytecode(code))
+    )
+    vm.run()
+
+    return vm
+
+
+class ProfilingVirtualMachine(VirtualMachine):
+    """
+    The reference engine, timing and counting every instruction it executes.
+
+    This is a separate engine so that the other engines pay nothing for it.
+    Times are measured around each instruction, so they include the
+    overhead of the reference engine but not the one of the profiler.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ProfilingVirtualMachine, self).__init__(*args, **kwargs)
+
+        # by function name
+        self.calls = collections.Counter()
+        self.self_time = collections.Counter()
+
+        self.op_counts = collections.Counter()
+        # by (function name, pc)
+        self.pc_counts = collections.Counter()
+
+        # Call stacks are interned as nodes of a tree: node i is the call
+        # of function 'names[i]' from the stack 'parents[i]' (-1 for none).
+        # Deep recursion would make tuples of names quadratic in memory.
+        self.nodes = {}
+        self.parents = []
+        self.names = []
+
+        # by call stack node
+        self.stack_counts = collections.Counter()
+        self.stack_time = collections.Counter()
+
+        # the call stack node of every frame
+        self.stacks = []
+
+    def run(self):
+        self.prep_func(self.main)
+        self.enter(self.get_curr_frame().func)
+
+        while self.frame_stack:
+            self.execute()
+
+    def enter(self, func):
+        self.calls[func.name] += 1
+
+        key = (self.stacks[-1] if self.stacks else -1, func.name)
+        if key not in self.nodes:
+            self.nodes[key] = len(self.names)
+            self.parents.append(key[0])
+            self.names.append(key[1])
+
+        self.stacks.append(self.nodes[key])
+
+    def stack_names(self, node: int) -> [str]:
+        """
+        The function names of a call stack node, outermost first.
+        """
+
+        names = []
+        while node != -1:
+            names.append(self.names[node])
+            node = self.parents[node]
+
+        return names[::-1]
+
+    def total_time(self) -> collections.Counter:
+        """
+        The time spent in every function and the functions it called, by
+        function name. Recursive calls are only counted once.
+        """
+
+        # parents are always created before their children
+        on_stack = []
+        for node, name in enumerate(self.names):
+            parent = self.parents[node]
+            names = on_stack[parent] if parent != -1 else frozenset()
+            on_stack.append(names if name in names else names | {name})
+
+        total = collections.Counter()
+        for node, elapsed in self.stack_time.items():
+            for name in on_stack[node]:
+                total[name] += elapsed
+
+        return total
+
+    def execute(self):
+        frame = self.get_curr_frame()
+        func = frame.func
+        pc = frame.pc
+        op = func.code[pc][0]
+        depth = len(self.frame_stack)
+
+        start = time.perf_counter_ns()
+        super(ProfilingVirtualMachine, self).execute()
+        end = time.perf_counter_ns()
+
+        elapsed = end - start
+        stack = self.stacks[-1]
+
+        self.self_time[func.name] += elapsed
+        self.op_counts[op] += 1
+        self.pc_counts[func.name, pc] += 1
+        self.stack_counts[stack] += 1
+        self.stack_time[stack] += elapsed
+
+        if op == 'tcall':
+            self.stacks.pop()
+            self.enter(self.get_curr_frame().func)
+
+        elif len(self.frame_stack) > depth:
+            self.enter(self.get_curr_frame().func)
+
+        elif len(self.frame_stack) < depth:
+            self.stacks.pop()
+
+    def format_instr(self, instr: list) -> str:
+        if instr[0] in ('call', 'tcall'):
+            return f'{instr[0]} {self.funcs[instr[1]].name}'
+
+        return ' '.join(str(i) for i in instr)
+
+    def report(self, top: int = 10) -> [str]:
+        """
+        The per-function times, the per-opcode counts and the 'top' most
+        executed instructions, as readable lines.
+        """
+
+        total = sum(self.self_time.values()) or 1
+        total_time = self.total_time()
+        instructions = sum(self.op_counts.values()) or 1
+        by_name = {i.name: i for i in self.funcs}
+
+        lines = ['%-24s %8s %10s %7s %10s %7s' % (
+            'function', 'calls', 'self ms', 'self %', 'total ms', 'total %'
+        )]
+        for name, self_time in self.self_time.most_common():
+            lines.append('%-24s %8d %10.2f %6.1f%% %10.2f %6.1f%%' % (
+                name,
+                self.calls[name],
+                self_time / 1e6,
+                100 * self_time / total,
+                total_time[name] / 1e6,
+                100 * total_time[name] / total
+            ))
+
+        lines += ['', '%-24s %10s %7s' % ('opcode', 'count', '%')]
+        for op, count in self.op_counts.most_common():
+            lines.append('%-24s %10d %6.1f%%' % (
+                op, count, 100 * count / instructions
+            ))
+
+        lines += ['', '%-24s %-24s %10s' % ('pc', 'instruction', 'count')]
+        for (name, pc), count in self.pc_counts.most_common(top):
+            instr = self.format_instr(by_name[name].code[pc])
+            lines.append('%-24s %-24s %10d' % (f'{name}:{pc}', instr, count))
+
+        return lines
+
+    def folded_stacks(self, weight: str = 'instructions') -> [str]:
+        """
+        The call stacks in the folded format of flamegraph tools, weighted by
+        executed 'instructions' or by 'time' (in nanoseconds).
+        """
+
+        counts = self.stack_counts if weight == 'instructions' \
+                 else self.stack_time
+
+        return sorted(
+            f'{";".join(self.stack_names(node))} {count}'
+            for node, count in counts.items()
+        )
@@ -0,0 +1,291 @@
+import math
+
+from .simulation import InteractionHandler
+from .machine import Function
+from .fusion import JUMPS, fuse_with_map
+from .decoded_machine import (
+    DecodedVirtualMachine, ENTRY, BACK_JMP, BACK_CJMP, decode_instr
+)
+from .compiled_machine import (
+    make_namespace, compile_function, python_stub, recursive_functions
+)
+
+
+# the representations a function goes through, from the cheapest to build
+BASELINE, FUSED, COMPILED = range(3)
+
+TIER_NAMES = ['baseline', 'fused', 'compiled']
+
+# 'None' disables a promotion
+DEFAULT_THRESHOLDS = {
+    # calls before a function is fused
+    'fuse_calls': 20,
+    # loop iterations (back edges taken) before a function is fused, which
+    # also replaces the running loop with its fused code
+    'fuse_loops': 500,
+    # calls before a function is compiled to Python
+    'compile_calls': 200
+}
+
+
+class TierState:
+    """
+    The counters and the current tier of a function.
+    """
+
+    def __init__(self, index: int, name: str):
+        self.index = index
+        self.name = name
+        self.tier = BASELINE
+        self.calls = 0
+        self.loops = 0
+
+        # the counts at which the function is looked at again
+        self.next_calls = math.inf
+        self.next_loops = math.inf
+
+        self.can_compile = True
+
+        # the fused function, and the fused pc of every baseline pc (minus
+        # one, for the 'entry' counter)
+        self.fused = None
+        self.pc_map = None
+
+
+class LazyFunctions(dict):
+    """
+    Functions by index, each built by 'factory' when it is first looked up.
+    """
+
+    def __init__(self, factory):
+        super(LazyFunctions, self).__init__()
+        self.factory = factory
+
+    def __missing__(self, index: int) -> Function:
+        func = self[index] = self.factory(index)
+        return func
+
+
+def shift_jumps(instr: list, offset: int) -> list:
+    if instr[0] in JUMPS:
+        return [instr[0], instr[1] + offset]
+
+    if len(instr) > 1 and isinstance(instr[1], list): # fused
+        return [instr[0]] + [shift_jumps(i, offset) for i in instr[1:]]
+
+    return instr
+
+
+def add_entry(code: [list]) -> [list]:
+    """
+    Prepends the call counter to a preprocessed code.
+    """
+
+    return [['entry']] + [shift_jumps(i, 1) for i in code]
+
+
+def decode_tier(code: [list], state: TierState, count_loops: bool) -> list:
+    """
+    Decodes a preprocessed code, turning the 'entry' marker into the call
+    counter of 'state' and, if 'count_loops', the backward jumps into loop
+    counters.
+    """
+
+    out = []
+    for pc, instr in enumerate(code):
+        op = instr[0]
+
+        if op == 'entry':
+            out.append((ENTRY, state))
+
+        elif count_loops and op in JUMPS and instr[1] <= pc:
+            back_op = BACK_JMP if op == 'jmp' else BACK_CJMP
+            out.append((back_op, (state, instr[1])))
+
+        else:
+            out.append(decode_instr(instr))
+
+    return out
+
+
+class TieredVirtualMachine(DecodedVirtualMachine):
+    """
+    A virtual machine that only optimizes the functions that turn out to be
+    hot.
+
+    A function is decoded as is the first time it is called, with counters
+    on its entry and its loops. Once it crosses the thresholds, it is fused
+    (the loop that crossed the threshold continues in the fused code), then
+    compiled to Python as with the 'compiled' engine. Functions that are
+    never called are never decoded.
+
+    The counters stop once a function reaches its last tier. Functions that
+    can recurse through calls are never compiled (see recursive_functions),
+    so that promoting them cannot exceed Python's recursion limit.
+    """
+
+    # the loader must not fuse; hot functions are fused here
+    supports_fusion = False
+
+    def __init__(
+            self,
+            io: InteractionHandler,
+            glob_var_count: int,
+            funcs,
+            fuse_calls: int = DEFAULT_THRESHOLDS['fuse_calls'],
+            fuse_loops: int = DEFAULT_THRESHOLDS['fuse_loops'],
+            compile_calls: int = DEFAULT_THRESHOLDS['compile_calls']
+        ):
+        self.thresholds = {
+            'fuse_calls': fuse_calls,
+            'fuse_loops': fuse_loops,
+            'compile_calls': compile_calls
+        }
+        self.states = {} # by function index
+        self.promotions = []
+        self.compile_failures = []
+
+        super(TieredVirtualMachine, self).__init__(io, glob_var_count, funcs)
+
+    def decode_functions(self, funcs) -> {int: Function}:
+        # compiled functions call the others through their current tier
+        self.namespace = make_namespace(self)
+        self.recursive = recursive_functions(funcs)
+        for i, func in enumerate(funcs):
+            self.namespace[f'F_{func.name}'] = self.interpreted(i)
+
+        return LazyFunctions(self.baseline)
+
+    def interpreted(self, index: int):
+        def call(*args):
+            return self.run_function(self.decoded[index], list(args))
+
+        return call
+
+    def threshold(self, name: str):
+        value = self.thresholds[name]
+        return math.inf if value is None else value
+
+    def update_limits(self, state: TierState):
+        compile_calls = math.inf
+        if state.can_compile:
+            compile_calls = self.threshold('compile_calls')
+
+        if state.tier == BASELINE:
+            state.next_calls = min(self.threshold('fuse_calls'), compile_calls)
+            state.next_loops = self.threshold('fuse_loops')
+
+        elif state.tier == FUSED:
+            state.next_calls = compile_calls
+            state.next_loops = math.inf
+
+        else:
+            state.next_calls = state.next_loops = math.inf
+
+    def baseline(self, index: int) -> Function:
+        func = self.funcs[index]
+
+        state = self.states[index] = TierState(index, func.name)
+        state.can_compile = index not in self.recursive
+        self.update_limits(state)
+
+        code = decode_tier(add_entry(func.code), state, True)
+        return Function(func.param_count, func.local_count, code, func.name)
+
+    def promote(self, state: TierState, reason: str):
+        """
+        Moves a function whose counters crossed a threshold to the highest
+        tier they allow. 'reason' is either 'calls' or 'loops'.
+        """
+
+        start = state.tier
+
+        if reason == 'calls' and state.can_compile \
+                and state.calls >= self.threshold('compile_calls'):
+            self.compile(state)
+
+        if state.tier == BASELINE:
+            self.fuse(state)
+
+        if state.tier != start:
+            self.promotions.append({
+                'function': state.name,
+                'from': TIER_NAMES[start],
+                'to': TIER_NAMES[state.tier],
+                'reason': reason,
+                'calls': state.calls,
+                'loops': state.loops
+            })
+
+        self.update_limits(state)
+
+    def promote_loop(self, state: TierState, code: list, pc: int):
+        """
+        Promotes a function from one of its running loops. Returns the code
+        and the pc to continue with.
+        """
+
+        self.promote(state, 'loops')
+
+        if state.fused is None:
+            return code, pc
+
+        return state.fused.code, state.pc_map[pc - 1]
+
+    def fuse(self, state: TierState):
+        func = self.funcs[state.index]
+        code, new_index = fuse_with_map(func.code)
+
+        # keep counting calls if the function can still be compiled
+        offset = 0
+        if state.can_compile and self.threshold('compile_calls') < math.inf:
+            code = add_entry(code)
+            offset = 1
+
+        state.fused = Function(
+            func.param_count,
+            func.local_count,
+            decode_tier(code, state, False),
+            func.name
+        )
+        state.pc_map = [i + offset for i in new_index]
+        state.tier = FUSED
+
+        self.decoded[state.index] = state.fused
+
+    def compile(self, state: TierState):
+        compiled = compile_function(state.index, self.funcs, self.namespace)
+        if compiled is None:
+            state.can_compile = False
+            self.compile_failures.append(state.name)
+            return
+
+        # interpreted callers reach the Python function through a stub
+        params = self.funcs[state.index].param_count
+
+        state.tier = COMPILED
+        self.decoded[state.index] = python_stub(compiled, params)
+
+    def stats(self) -> dict:
+        """
+        Returns the thresholds, the counters and tier of every function that
+        was called, the promotions in the order they happened and the
+        functions that could not be compiled.
+        """
+
+        functions = {
+            state.name: {
+                'tier': TIER_NAMES[state.tier],
+                'calls': state.calls,
+                'loops': state.loops
+            }
+            for state in self.states.values()
+        }
+
+        return {
+            'thresholds': dict(self.thresholds),
+            'functions': functions,
+            'never_called': len(self.funcs) - len(functions),
+            'promotions': list(self.promotions),
+            'compile_failures': list(self.compile_failures)
+        }
@@ -0,0 +1,306 @@
+import os
+import json
+import hashlib
+
+import day1_lexer as lexer
+import day2_parser as parser
+import day5_virtual_machine as machine
+
+from day1_lexer import TokenType, ParserError
+from day1_lexer.token_stream import KIND_CODES
+from day2_parser.ast import *
+from day2_parser.traversal import walk, analyse, generate
+from day3_semantic_analysis import SemanticContext, GLOBAL, FUNCTION
+
+from compile_cache import write_atomic
+
+
+SYMBOL = KIND_CODES[TokenType.SYMBOL]
+
+# the format of the saved state, which is discarded when it changes
+STATE_VERSION = 2
+
+
+def split_declarations(tokens) -> [(int, int)]:
+    """
+    The (start, end) token ranges of the top level declarations of a token
+    stream: a 'decl' ends at the ';' and a function at the '}' outside of
+    any braces. Returns None if the braces do not balance.
+    """
+
+    ranges = []
+    start = depth = 0
+
+    for i in range(len(tokens)):
+        if tokens.kinds[i] != SYMBOL:
+            continue
+
+        symbol = tokens.text(i)
+        if symbol == '{':
+            depth += 1
+
+        elif symbol == '}':
+            depth -= 1
+            if depth < 0:
+                return None
+
+            if depth == 0:
+                ranges.append((start, i + 1))
+                start = i + 1
+
+        elif symbol == ';' and depth == 0:
+            ranges.append((start, i + 1))
+            start = i + 1
+
+    if start != len(tokens):
+        return None
+
+    return ranges
+
+
+def fingerprint(tokens, start: int, end: int) -> str:
+    """
+    A hash of the source text of the tokens from 'start' to 'end'.
+    """
+
+    last = end - 1
+    text = tokens.source[
+        tokens.starts[start] : tokens.starts[last] + tokens.lengths[last]
+    ]
+    if tokens.is_text:
+        text = text.encode('utf-8')
+
+    return hashlib.sha256(text).hexdigest()
+
+
+# the global variables (name: index) and the user functions (name: amount
+# of parameters) that an analysed function refers to
+
+
+def add_global(node, deps: dict) -> list:
+    if node.storage == GLOBAL:
+        deps['globals'][node.var if type(node) is Assign else node.name] = \
+            node.slot
+
+    return [node.value] if type(node) is Assign else []
+
+
+def add_call(node: FuncCall, deps: dict) -> list:
+    if node.storage == FUNCTION:
+        deps['calls'][node.name] = len(node.params)
+
+    return list(node.params)
+
+
+DEPENDENCIES = {
+    Declare: lambda node, deps: [],
+    Assign: add_global,
+    Return: lambda node, deps: [node.value],
+    Break: lambda node, deps: [],
+    Continue: lambda node, deps: [],
+    If: lambda node, deps: [node.cond, *node.if_code, *node.else_code],
+    While: lambda node, deps: [node.cond, *node.code],
+    FuncDecl: lambda node, deps: list(node.code),
+    BinOp: lambda node, deps: [node.left, node.right],
+    UnOp: lambda node, deps: [node.value],
+    Literal: lambda node, deps: [],
+    VarExp: add_global,
+    FuncCall: add_call,
+    ExpStmt: lambda node, deps: [node.value]
+}
+
+
+def dependencies(func: FuncDecl) -> dict:
+    deps = {'globals': {}, 'calls': {}}
+    walk(func, DEPENDENCIES, deps)
+
+    return deps
+
+
+class IncrementalCompiler:
+    """
+    Compiles a source again and again (e.g. while it is being edited),
+    analysing and generating only the functions that changed since the
+    last compilation. The state is saved as JSON at 'path' in between.
+
+    Every function is kept with the hash of its source, the globals and
+    functions it refers to, and its code. Its code is reused while its
+    source is the same, its globals are still declared at the same index
+    and its callees still take as many parameters. Global variables keep
+    their index for as long as the state does, even when declarations are
+    moved or removed, so that the code of the other functions stays valid.
+
+    With 'optimize', the code kept is that of the optimized tree: the
+    bytecode optimizer checks the jumps it threads against the functions
+    the 'compiled' engine can translate, which takes the whole program, so
+    it runs on the assembled code on every compilation.
+
+    The whole source is still lexed, and its global declarations parsed.
+    """
+
+    def __init__(self, path: str, parse=parser.parse_table_driven):
+        self.path = path
+        self.parse = parse
+
+        # the names of the functions compiled by the last 'compile'
+        self.recompiled = []
+
+    def load(self, options: dict) -> dict:
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            # missing or corrupted
+            state = None
+
+        if not isinstance(state, dict) or \
+           state.get('version') != STATE_VERSION or \
+           state.get('options') != options:
+            state = {'globals': {}, 'funcs': {}}
+
+        return state
+
+    def save(self, state: dict):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        write_atomic(self.path, json.dumps(state).encode('utf-8'))
+
+    def parse_range(self, tokens, start: int, end: int) -> Program:
+        reader = parser.Reader(tokens)
+        reader.pos, reader.len = start, end
+
+        return self.parse(reader)
+
+    def parse_all(self, tokens) -> Program:
+        """
+        Parses the whole source, to raise the same error as a full
+        compilation when a part of it does not parse.
+        """
+
+        return self.parse(parser.Reader(tokens))
+
+    def compile(
+            self,
+            source: str,
+            tail_calls: bool = True,
+            optimize: bool = False
+        ) -> [str]:
+        options = {'tail_calls': tail_calls, 'optimize': optimize}
+        state = self.load(options)
+
+        tokens = lexer.lex_stream(source)
+        ranges = split_declarations(tokens)
+        if ranges is None:
+            self.parse_all(tokens)
+            raise ParserError('Unbalanced braces')
+
+        # the global declarations, and the functions in order with their
+        # fingerprint, cached entry (or None) and range
+        declares = []
+        funcs = []
+        try:
+            for start, end in ranges:
+                if tokens.matches(start, 'decl'):
+                    declares += self.parse_range(tokens, start, end).var_decl
+                    continue
+
+                key = fingerprint(tokens, start, end)
+                cached = state['funcs'].get(key)
+
+                if cached is None:
+                    func = self.parse_range(tokens, start, end).func_decl[0]
+                else:
+                    # only its declaration is needed unless it is recompiled
+                    func = FuncDecl(cached['name'], cached['params'], None)
+
+                funcs.append((func, key, cached, start, end))
+
+        except (ParserError, IndexError):
+            self.parse_all(tokens)
+            raise
+
+        # the checks of Program.analysis_pass, in the same order
+        context = SemanticContext(tail_calls)
+        glob = context.enter_global(None)
+
+        for func, *_ in funcs:
+            func.register(context)
+
+        indices = state['globals']
+        for node in declares:
+            for name in node.vars:
+                context.add_var(name, indices.setdefault(name, len(indices)))
+
+        glob_var_count = glob.var_count()
+
+        self.recompiled = []
+        compiled = {}
+        code = []
+
+        for func, key, cached, start, end in funcs:
+            if cached is None or not self.is_valid(cached, glob):
+                if cached is not None:
+                    func = self.parse_range(tokens, start, end).func_decl[0]
+
+                cached = self.compile_func(
+                    func, context, glob_var_count, optimize
+                )
+                self.recompiled.append(func.func_name)
+
+            compiled[key] = cached
+            code += cached['code']
+
+        state['version'] = STATE_VERSION
+        state['options'] = options
+        state['funcs'] = compiled
+        self.save(state)
+
+        code = [str(glob_var_count), str(len(funcs))] + code
+        if optimize:
+            code = machine.optimize_code(code)
+
+        return code
+
+    def is_valid(self, cached: dict, glob) -> bool:
+        """
+        Whether the cached code of a function is still its code.
+        """
+
+        for name, index in cached['globals'].items():
+            if not glob.has_var(name) or glob.var_index(name) != index:
+                return False
+
+        for name, param_count in cached['calls'].items():
+            if not glob.has_func(name) or \
+               len(glob.get_func(name).params) != param_count:
+                return False
+
+        return True
+
+    def compile_func(
+            self,
+            func: FuncDecl,
+            context: SemanticContext,
+            glob_var_count: int,
+            optimize: bool
+        ) -> dict:
+        # the context is back to the global scope afterwards
+        analyse(func, context)
+        deps = dependencies(func)
+
+        if optimize:
+            parser.fold_constants(func)
+            parser.hoist_loop_invariants(func)
+            parser.eliminate_common_subexpressions(func)
+
+        program = Program([func])
+        program.glob_var_count = glob_var_count
+
+        code = generate(program)
+
+        return {
+            'name': func.func_name,
+            'params': func.params,
+            'globals': deps['globals'],
+            'calls': deps['calls'],
+            'code': code[2:]
+        }
@@ -1,3 +1,4 @@
+import sys
 import argparse
 
 import day1_lexer as lexer
@@ -6,20 +7,57 @@ import day3_semantic_analysis as semantics
 import day4_code_generation as codegen
 import day5_virtual_machine as machine
 
+from compile_cache import CompileCache, DEFAULT_DIR, DEFAULT_SIZE
+from incremental import IncrementalCompiler
+from batch import find_sources, output_paths, compile_batch, format_report
+
 
 def read_file(path: str) -> str:
     with open(path, 'r') as f:
         return f.read()
 
 
-def compile_code(code: str) -> [str]:
-    tokens = lexer.lex(code)
-    ast = parser.parse(parser.Reader(tokens))
-    semantics.analysis(ast)
+PARSERS = {
+    'table': parser.parse_table_driven,
+    'descent': parser.parse
+}
+
+
+def compile_code(
+        code: str,
+        tail_calls: bool = True,
+        parse=parser.parse_table_driven,
+        optimize: bool = False,
+        inline_budget: int = 0
+    ) -> [str]:
+    tokens = lexer.lex_stream(code)
+    ast = parse(parser.Reader(tokens))
+    semantics.analysis(ast, tail_calls)
+
+    if optimize:
+        parser.fold_constants(ast)
+
+    if inline_budget:
+        parser.inline_functions(ast, inline_budget)
+
+    if optimize:
+        parser.hoist_loop_invariants(ast)
+        parser.eliminate_common_subexpressions(ast)
+        return machine.optimize_code(codegen.generate(ast))
 
     return codegen.generate(ast)
 
 
+def write_output(code: [str], path: str, file_format: str):
+    if file_format == 'binary':
+        with open(path, 'wb') as f:
+            f.write(machine.encode_bytecode(code))
+
+    else:
+        with open(path, 'w+') as f:
+            f.write('\n'.join(code))
+
+
 if __name__ == '__main__':
     arg_parser = argparse.ArgumentParser()
     subparsers = arg_parser.add_subparsers(required=True, dest='action')
@@ -33,6 +71,18 @@ if __name__ == '__main__':
     run_parser = subparsers.add_parser(
         'run', help='runs a source file directly'
     )
+    profile_parser = subparsers.add_parser(
+        'profile', help='runs a source file under the profiler'
+    )
+    graph_parser = subparsers.add_parser(
+        'callgraph', help='links a bytecode file and prints its call graph'
+    )
+    opt_parser = subparsers.add_parser(
+        'optimize', help='optimizes the control flow of a bytecode file'
+    )
+    batch_parser = subparsers.add_parser(
+        'batch', help='compiles many source files on a pool of processes'
+    )
 
     comp_parser.add_argument(
         '--source',
@@ -41,14 +91,52 @@ if __name__ == '__main__':
         required=True,
         help='the source file to be compiled'
     )
-    comp_parser.add_argument(
-        "--output",
-        "-o",
+    opt_parser.add_argument(
+        '--byte',
+        '-b',
         type=str,
-        default='output.byte',
-        help='the path for the output file'
+        required=True,
+        help='the bytecode file to be optimized'
+    )
+
+    batch_parser.add_argument(
+        'sources',
+        nargs='+',
+        help='the source files, directories (searched for .code files) or '
+             'glob patterns to be compiled'
+    )
+    batch_parser.add_argument(
+        '--output-dir',
+        '-d',
+        type=str,
+        help='the directory of the output files, which are otherwise written '
+             'next to their source'
+    )
+    batch_parser.add_argument(
+        '--jobs',
+        '-j',
+        type=int,
+        help='the number of worker processes (one per CPU by default)'
     )
 
+    for i in (comp_parser, opt_parser):
+        i.add_argument(
+            "--output",
+            "-o",
+            type=str,
+            default='output.byte',
+            help='the path for the output file'
+        )
+
+    for i in (comp_parser, opt_parser, batch_parser):
+        i.add_argument(
+            '--format',
+            '-f',
+            choices=['text', 'binary'],
+            default='text',
+            help='the bytecode file format'
+        )
+
     exec_parser.add_argument(
         '--byte',
         '-b',
@@ -57,6 +145,14 @@ if __name__ == '__main__':
         help='the bytecode file to be ran'
     )
 
+    graph_parser.add_argument(
+        '--byte',
+        '-b',
+        type=str,
+        required=True,
+        help='the bytecode file to be linked'
+    )
+
     run_parser.add_argument(
         '--source',
         '-s',
@@ -65,18 +161,183 @@ if __name__ == '__main__':
         help='the source file to be ran directly'
     )
 
+    run_parser.add_argument(
+        '--no-cache',
+        dest='cache',
+        action='store_false',
+        help='compiles the source even if its bytecode is in the cache'
+    )
+    run_parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=DEFAULT_DIR,
+        help='the directory of the compile cache'
+    )
+    run_parser.add_argument(
+        '--cache-size',
+        type=float,
+        default=DEFAULT_SIZE / 2 ** 20,
+        help='the size of the compile cache in MB, past which the least '
+             'recently used programs are removed'
+    )
+
+    profile_parser.add_argument(
+        '--source',
+        '-s',
+        type=str,
+        required=True,
+        help='the source file to be profiled'
+    )
+    profile_parser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='the number of most executed instructions to report'
+    )
+    profile_parser.add_argument(
+        '--folded',
+        type=str,
+        help='writes the folded call stacks for flamegraph tools to a file'
+    )
+    profile_parser.add_argument(
+        '--weight',
+        choices=['instructions', 'time'],
+        default='instructions',
+        help='the weight of the folded call stacks'
+    )
+
+    for i in (comp_parser, run_parser, profile_parser, batch_parser):
+        i.add_argument(
+            '--no-tail-calls',
+            dest='tail_calls',
+            action='store_false',
+            help='compiles returns of function calls to a call and a return'
+        )
+        i.add_argument(
+            '--parser',
+            choices=sorted(PARSERS),
+            default='table',
+            help='the table-driven parser (no nesting limit) or the recursive '
+                 'descent one'
+        )
+        i.add_argument(
+            '-O',
+            dest='optimize',
+            action='store_true',
+            help='folds constant expressions and optimizes the control flow'
+        )
+        i.add_argument(
+            '--inline-budget',
+            type=int,
+            default=0,
+            metavar='N',
+            help='inlines the calls to user functions of at most N nodes '
+                 'that are not recursive (none by default)'
+        )
+
+    for i in (exec_parser, run_parser):
+        i.add_argument(
+            '--engine',
+            '-e',
+            choices=sorted(machine.ENGINES),
+            default='decoded',
+            help='the execution engine of the virtual machine'
+        )
+        i.add_argument(
+            '--no-fusion',
+            dest='fusion',
+            action='store_false',
+            help='disables the fusion of instructions into superinstructions'
+        )
+
     args = arg_parser.parse_args()
 
     if args.action == 'compile':
-        code = read_file(args.source)
+        code = compile_code(
+            read_file(args.source), args.tail_calls, PARSERS[args.parser],
+            args.optimize, args.inline_budget
+        )
+        write_output(code, args.output, args.format)
+
+    elif args.action == 'batch':
+        sources, errors = find_sources(args.sources)
+        failed = compile_batch(
+            sources,
+            output_paths(sources, args.output_dir),
+            compile_code,
+            args.jobs,
+            args.format == 'binary',
+            tail_calls=args.tail_calls,
+            parse=PARSERS[args.parser],
+            optimize=args.optimize,
+            inline_budget=args.inline_budget
+        )
 
-        with open(args.output, 'w+') as f:
-            f.write('\n'.join(compile_code(code)))
+        # a single report once every file is done
+        errors += failed
+        print(
+            '\n'.join(format_report(len(sources), len(failed), errors)),
+            file=sys.stderr
+        )
+
+        if errors:
+            sys.exit(1)
+
+    elif args.action == 'optimize':
+        # either format, so that old bytecode can be optimized again
+        file_rep = machine.load_bytecode_file(args.byte)
+        code = machine.write_bytecode(machine.optimize_file_rep(file_rep))
+        write_output(code, args.output, args.format)
 
     elif args.action == 'exec':
-        code = read_file(args.byte)
-        machine.run_code(code)
+        # the format is detected from the file header
+        file_rep = machine.load_bytecode_file(args.byte)
+        machine.run_file_rep(file_rep, engine=args.engine, fusion=args.fusion)
 
     elif args.action == 'run':
-        code = read_file(args.source)
-        machine.run_code(compile_code(code))
\ No newline at end of file
+        source = read_file(args.source)
+        options = {'tail_calls': args.tail_calls, 'optimize': args.optimize}
+        if args.inline_budget:
+            options['inline_budget'] = args.inline_budget
+
+        # both parsers build the same tree, so they share the cached bytecode
+        def compile_source(code: str, **options) -> [str]:
+            return compile_code(code, parse=PARSERS[args.parser], **options)
+
+        if args.cache:
+            cache = CompileCache(args.cache_dir, args.cache_size * 2 ** 20)
+
+            # a source missing from the cache is compiled incrementally from
+            # the last run of the same file, if any, unless functions are
+            # inlined: the code of a function then depends on the functions
+            # inlined into it, which the incremental compiler does not track
+            compile_missing = compile_source
+            if not args.inline_budget:
+                compile_missing = IncrementalCompiler(
+                    cache.state_path(args.source, options),
+                    PARSERS[args.parser]
+                ).compile
+
+            file_rep = cache.compile(source, compile_missing, **options)
+        else:
+            file_rep = machine.read_bytecode(compile_source(source, **options))
+
+        machine.run_file_rep(file_rep, engine=args.engine, fusion=args.fusion)
+
+    elif args.action == 'profile':
+        code = compile_code(
+            read_file(args.source), args.tail_calls, PARSERS[args.parser],
+            args.optimize, args.inline_budget
+        )
+        profiler = machine.profile_code(code)
+
+        # the program owns stdout
+        print('\n'.join(profiler.report(args.top)), file=sys.stderr)
+
+        if args.folded:
+            with open(args.folded, 'w') as f:
+                f.write('\n'.join(profiler.folded_stacks(args.weight)) + '\n')
+
+    elif args.action == 'callgraph':
+        linked = machine.link(machine.load_bytecode_file(args.byte))
+        print('\n'.join(machine.format_call_graph(linked)))
\ No newline at end of file
@@ -0,0 +1,483 @@
+# Checks that every execution engine behaves exactly like the reference
+# virtual machine. Runs standalone ('python test_engines.py') or under pytest.
+
+import os
+
+import day1_lexer as lexer
+import day5_virtual_machine as machine
+
+from day1_lexer import InvalidByteSyntaxError
+
+from day5_virtual_machine.byte_loader import read_bytecode, write_bytecode
+from day5_virtual_machine.binary_loader import read_binary_bytecode
+from day5_virtual_machine.machine import VirtualMachine, load_code
+from day5_virtual_machine.flat_machine import FlatVirtualMachine
+from day5_virtual_machine.compiled_machine import (
+    CompiledVirtualMachine, python_stub
+)
+from day5_virtual_machine.tiered_machine import TieredVirtualMachine
+from day5_virtual_machine.optimizer import optimize_function
+
+from run import compile_code
+
+
+CODE_DIR = 'test_code'
+
+# (file, inputs)
+PROGRAMS = [
+    ('structures.code', []),
+    ('fibonacci.code', []),
+    ('factorial.code', ['5']),
+    ('factorial.code', ['30']),
+    ('pyramid.code', ['10'])
+]
+
+# control flow that none of the files above covers
+LOOPS = '''
+decl total;
+
+count(n) {
+    decl i, j;
+    i = 0;
+
+    while (TRUE) {
+        i = i + 1;
+        if (i > n) {
+            break;
+        }
+
+        if (i / 2 * 2 == i) {
+            continue;
+        }
+
+        j = 0;
+        while (j < i) {
+            total = total + j;
+            j = j + 1;
+        }
+    }
+
+    return total;
+}
+
+main() {
+    total = 0;
+    print(count(str_to_int(input("n: "))));
+    print(-total + 1 - 2 * 3 != 4 || FALSE);
+}
+'''
+
+# tail calls to itself (also in a loop), to other functions and to natives
+TAIL_CALLS = '''
+decl calls;
+
+count(n, acc) {
+    decl unused;
+    calls = calls + 1;
+    if (n == 0) {
+        return acc;
+    }
+    return count(n - 1, acc + n);
+}
+
+is_even(n) {
+    if (n == 0) {
+        return TRUE;
+    }
+    return is_odd(n - 1);
+}
+
+is_odd(n) {
+    if (n == 0) {
+        return FALSE;
+    }
+    return is_even(n - 1);
+}
+
+search(n) {
+    while (n > 0) {
+        if (n / 7 * 7 == n) {
+            return search(n - 3);
+        }
+        n = n - 1;
+    }
+    return int_to_str(n);
+}
+
+main() {
+    calls = 0;
+    print(count(str_to_int(input("n: ")), 0));
+    print(calls);
+    print(is_even(51));
+    print(search(100));
+}
+'''
+
+# calls deeper than Python's recursion limit that are not tail calls
+DEEP_RECURSION = '''
+sum(n) {
+    if (n == 0) {
+        return 0;
+    }
+    return n + sum(n - 1);
+}
+
+main() {
+    print(sum(str_to_int(input("n: "))));
+}
+'''
+
+
+def compile_file(name: str) -> [str]:
+    return compile_code(lexer.load_source_file(os.path.join(CODE_DIR, name)))
+
+
+def run_outputs(code: [str], inputs: [str], **kwargs) -> [str]:
+    handler = machine.RecordingHandler(inputs)
+    machine.run_code(code, handler, **kwargs)
+
+    return handler.get_output()
+
+
+def test_engines_match_reference():
+    programs = [(compile_file(name), inputs) for name, inputs in PROGRAMS]
+    programs.append((compile_code(LOOPS), ['25']))
+    programs.append((compile_code(TAIL_CALLS), ['300']))
+    programs.append((compile_code(TAIL_CALLS, tail_calls=False), ['300']))
+    programs.append((compile_code(DEEP_RECURSION), ['5000']))
+
+    for code, inputs in programs:
+        expected = run_outputs(code, inputs, engine='reference')
+
+        for engine in machine.ENGINES:
+            for fusion in (False, True):
+                output = run_outputs(
+                    code, inputs, engine=engine, fusion=fusion
+                )
+                assert output == expected, \
+                    f'{engine} engine (fusion {fusion}): {inputs}'
+
+
+def test_binary_bytecode_round_trip():
+    sources = [compile_file(name) for name, _ in PROGRAMS]
+    sources.append(compile_code('''
+        decl g;
+        main() {
+            g = -1 - 300 + 123456789012345678901234567890;
+            print("tab\\t and unicode \u00e9");
+            print(g * -70000);
+        }
+    '''))
+
+    for code in sources:
+        binary = machine.encode_bytecode(code)
+        assert read_binary_bytecode(binary) == read_bytecode(code)
+
+
+def test_compiled_fallback():
+    # a do-while loop, which the code generator never emits
+    code = '''
+        0
+        2
+        main 0 1
+            lint 3
+            lstore 0
+            lload 0
+            call show
+            pop
+            lload 0
+            lint 1
+            subtract
+            lstore 0
+            lload 0
+            cjmp 2
+            lnon
+            ret
+        :main
+        show 1 1
+            lload 0
+            ncall 0
+            ret
+        :show
+    '''.splitlines()
+
+    handler = machine.RecordingHandler([])
+    vm = CompiledVirtualMachine(handler, *load_code(code))
+    vm.run()
+
+    assert [vm.funcs[i].name for i in vm.compiled] == ['show']
+    assert handler.get_output() == ['3', '2', '1']
+
+
+def test_tiered_promotions():
+    programs = [(compile_file(name), inputs) for name, inputs in PROGRAMS]
+    programs.append((compile_code(LOOPS), ['25']))
+
+    # low enough for every tier and on-stack replacement to happen
+    for code, inputs in programs:
+        expected = run_outputs(code, inputs, engine='reference')
+
+        for thresholds in ((2, 3, 4), (2, 3, None), (1, 1, 1)):
+            fuse_calls, fuse_loops, compile_calls = thresholds
+            output = run_outputs(
+                code,
+                inputs,
+                engine='tiered',
+                fuse_calls=fuse_calls,
+                fuse_loops=fuse_loops,
+                compile_calls=compile_calls
+            )
+            assert output == expected, f'tiered {thresholds}: {inputs}'
+
+    handler = machine.RecordingHandler(['25'])
+    vm = machine.run_code(
+        compile_code(LOOPS), handler, engine='tiered', fuse_loops=10
+    )
+    stats = vm.stats()
+
+    # 'main' is never fused, the loop of 'count' is replaced while running
+    assert stats['functions']['main']['tier'] == 'baseline'
+    assert stats['functions']['count'] == {
+        'tier': 'fused', 'calls': 1, 'loops': 10
+    }
+    assert stats['promotions'] == [{
+        'function': 'count',
+        'from': 'baseline',
+        'to': 'fused',
+        'reason': 'loops',
+        'calls': 1,
+        'loops': 10
+    }]
+    assert stats['thresholds']['fuse_loops'] == 10
+
+
+def test_tiered_cold_functions():
+    code = '''
+        0
+        3
+        main 0 0
+            lint 0
+            call twice
+            ncall 0
+            pop
+            lnon
+            ret
+        :main
+        twice 1 1
+            lload 0
+            lint 2
+            mul
+            ret
+        :twice
+        unused 0 0
+            nonsense
+        :unused
+    '''.splitlines()
+
+    handler = machine.RecordingHandler([])
+    vm = TieredVirtualMachine(handler, *load_code(code))
+    vm.run()
+
+    # 'unused' would not even decode
+    assert handler.get_output() == ['0']
+    assert sorted(vm.stats()['functions']) == ['main', 'twice']
+    assert vm.stats()['never_called'] == 1
+
+
+def test_tiered_deep_recursion():
+    handler = machine.RecordingHandler(['5000'])
+    vm = machine.run_code(compile_code(DEEP_RECURSION), handler, 'tiered')
+
+    # hot, but compiled it would exceed Python's recursion limit
+    assert handler.get_output() == ['12502500']
+    assert vm.stats()['functions']['sum']['tier'] == 'fused'
+
+
+def test_flat_deep_recursion():
+    code = compile_code('''
+        depth(n, a) {
+            decl b;
+            b = a + 1;
+            if (n == 0) {
+                return b;
+            }
+            return depth(n - 1, b) + 1;
+        }
+
+        main() {
+            print(depth(100000, 0));
+        }
+    ''')
+
+    assert run_outputs(code, [], engine='flat') == ['200001']
+
+    # the opcodes that do not touch frames run as in the decoded engine,
+    # e.g. a call to a Python function
+    code = compile_code('''
+        show(x) { print(x); }
+        main() { show(1); show(2); }
+    ''')
+
+    handler = machine.RecordingHandler([])
+    vm = FlatVirtualMachine(handler, *load_code(code))
+    shown = []
+    vm.decoded[0] = python_stub(shown.append, 1)
+    vm.run()
+
+    assert shown == [1, 2] and handler.get_output() == []
+
+
+def test_tail_calls_run_in_constant_space():
+    code = compile_code(TAIL_CALLS)
+    assert any(i.startswith('tcall') for i in code)
+
+    # including the compiled engine, which turns the tail calls of 'count'
+    # to itself into a loop
+    for engine in ('decoded', 'flat', 'compiled', 'tiered'):
+        output = run_outputs(code, ['1000000'], engine=engine)
+        assert output == ['500000500000', '1000001', 'False', '0'], engine
+
+    # the reference engine is too slow for a million calls
+    handler = machine.RecordingHandler(['2000'])
+    vm = VirtualMachine(handler, *load_code(code))
+    vm.prep_func(vm.main)
+
+    depth = 0
+    while vm.frame_stack:
+        depth = max(depth, len(vm.frame_stack))
+        vm.execute()
+
+    assert handler.get_output()[0] == '2001000'
+    assert depth == 2
+
+
+def test_link():
+    linked = machine.link(read_bytecode(compile_code(TAIL_CALLS)))
+    names = [i['name'] for i in linked['funcs']]
+    graph = linked['call_graph']
+
+    def named(indices):
+        return sorted(names[i] for i in indices)
+
+    assert names[linked['main']] == 'main'
+    assert all(
+        isinstance(i[1], int)
+        for func in linked['funcs'] for i in func['code']
+        if i[0] in ('call', 'tcall')
+    )
+
+    assert named(graph['callees'][linked['main']]) == \
+        ['count', 'is_even', 'search']
+    assert named(graph['callers'][names.index('is_odd')]) == ['is_even']
+    assert sorted(named(i) for i in graph['cycles']) == \
+        [['count'], ['is_even', 'is_odd'], ['search']]
+
+    code = '''
+        0
+        1
+        main 0 0
+            call missing
+            ret
+        :main
+    '''.splitlines()
+
+    try:
+        machine.run_code(code, machine.RecordingHandler([]))
+    except InvalidByteSyntaxError:
+        pass
+    else:
+        assert False, 'unknown call target'
+
+
+def test_profiler():
+    code = compile_code(TAIL_CALLS)
+    handler = machine.RecordingHandler(['10'])
+    profiler = machine.profile_code(code, handler)
+
+    assert handler.get_output() == run_outputs(code, ['10'])
+
+    # tail calls are calls, even though they reuse the frame
+    assert profiler.calls['count'] == 11
+    assert profiler.calls['main'] == 1
+
+    instructions = sum(profiler.op_counts.values())
+    assert sum(profiler.pc_counts.values()) == instructions
+    assert profiler.op_counts['tcall'] > 0
+
+    folded = profiler.folded_stacks()
+    assert sum(int(i.rsplit(' ', 1)[1]) for i in folded) == instructions
+    assert any(i.startswith('main;is_even ') for i in folded)
+
+    total = profiler.total_time()
+    assert total['main'] == sum(profiler.self_time.values())
+
+
+def translated(code: [str]) -> [str]:
+    vm = CompiledVirtualMachine(machine.RecordingHandler([]), *load_code(code))
+    return [vm.funcs[i].name for i in sorted(vm.compiled)]
+
+
+def test_bytecode_optimizer():
+    programs = [(compile_file(name), inputs) for name, inputs in PROGRAMS]
+    programs.append((compile_code(LOOPS), ['25']))
+    programs.append((compile_code(TAIL_CALLS, tail_calls=False), ['300']))
+
+    for code, inputs in programs:
+        assert write_bytecode(read_bytecode(code)) == code
+
+        expected = run_outputs(code, inputs, engine='reference')
+        optimized = machine.optimize_code(code)
+        assert len(optimized) < len(code)
+
+        for engine in machine.ENGINES:
+            output = run_outputs(optimized, inputs, engine=engine)
+            assert output == expected, f'{engine} engine: {inputs}'
+
+        # optimizing again changes nothing
+        assert machine.optimize_code(optimized) == optimized
+
+        # the jumps left are still those of an 'if' or a 'while', which the
+        # 'compiled' engine translates
+        assert translated(optimized) == translated(code)
+
+    for source in (LOOPS, TAIL_CALLS):
+        assert translated(compile_code(source, optimize=True)) == \
+               translated(compile_code(source))
+
+    # without 'main', the bytecode cannot be linked nor its functions checked,
+    # so they all keep their jumps
+    file_rep = read_bytecode(compile_code(LOOPS))
+    main = file_rep['funcs'].pop()
+    assert main['name'] == 'main'
+    optimized = machine.optimize_file_rep(file_rep)
+    for func, before in zip(optimized['funcs'], file_rep['funcs']):
+        assert func['code'] == optimize_function(before['code'], True)
+
+    optimized['funcs'].append(main)
+    code = write_bytecode(optimized)
+    assert translated(code) == translated(compile_code(LOOPS))
+
+    code = optimize_function([
+        ['lnon'], ['lstore', 0],                    # overwritten below
+        ['lint', 1], ['lstore', 0], ['lload', 0],   # stays on the stack
+        ['lint', 2], ['gstore', 0],                 # overwritten below
+        ['lint', 3], ['gstore', 0],
+        ['cjmp', 12],
+        ['lload', 1], ['lstore', 1],                # stores its own value
+        ['jmp', 14],                                # to a jump
+        ['lint', 4],                                # unreachable
+        ['jmp', 15],
+        ['ret']
+    ])
+    assert code == [
+        ['lint', 1], ['lint', 3], ['gstore', 0], ['pop'], ['ret']
+    ], code
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'Test Passed: {name}')
+
+    print('ALL TEST PASSED')
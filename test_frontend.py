@@ -0,0 +1,745 @@
+# Checks the alternative lexer and parser entry points, the iterative
+# analysis and code generation and the optimizations against the ones
+# covered by test.py. Runs standalone ('python test_frontend.py') or under
+# pytest.
+
+import io
+import os
+import sys
+import mmap
+import tempfile
+
+import day1_lexer as lexer
+import day2_parser as parser
+import day2_parser.grammar as grammar
+import day3_semantic_analysis as semantics
+import day4_code_generation as codegen
+import day5_virtual_machine as machine
+
+from day1_lexer import LexerError, ParserError, TokenType
+from day3_semantic_analysis import SemanticContext
+from day4_code_generation import Assembler
+
+from run import compile_code
+from compile_cache import CompileCache, COMPILER_MODULES, ROOT
+from batch import find_sources, output_paths, compile_batch, format_report
+from incremental import IncrementalCompiler
+
+
+CODE_DIR = 'test_code'
+
+# tokens split across reads, longest matches and word literals
+TRICKY = 'TRUEx TRUE iffy if x<=y&&z!=1 "a string, with {symbols}" 12ab\n'
+
+
+def source_files() -> [str]:
+    return sorted(
+        os.path.join(CODE_DIR, i) for i in os.listdir(CODE_DIR)
+        if i.endswith('.code')
+    )
+
+
+def expect_lexer_error(source, position: int):
+    try:
+        list(lexer.iter_tokens(source))
+    except LexerError as e:
+        assert f'position {position}:' in str(e), str(e)
+    else:
+        assert False, f'no error in {source!r}'
+
+
+def test_streaming_lexer():
+    sources = [lexer.load_source_file(i) for i in source_files()]
+    sources.append(TRICKY * 20)
+
+    for code in sources:
+        expected = lexer.lex(code)
+        assert list(lexer.iter_tokens(code)) == expected
+        assert list(lexer.iter_tokens(code.encode('utf-8'))) == expected
+
+        for chunk_size in (1, 2, 3, 7, 64):
+            text = io.StringIO(code)
+            assert list(lexer.iter_tokens(text, chunk_size)) == expected
+
+            binary = io.BytesIO(code.encode('utf-8'))
+            assert list(lexer.iter_tokens(binary, chunk_size)) == expected
+
+        with tempfile.TemporaryFile() as f:
+            f.write(code.encode('utf-8'))
+            f.flush()
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                assert list(lexer.iter_tokens(buffer)) == expected
+
+    assert lexer.lex('TRUEx TRUE iffy if') == [
+        ('TRUEx', TokenType.IDENTIFIER),
+        ('TRUE', TokenType.LITERAL),
+        ('iffy', TokenType.IDENTIFIER),
+        ('if', TokenType.KEYWORD)
+    ]
+
+
+def test_streaming_lexer_errors():
+    expect_lexer_error('a = 1 & 2;', 6)
+    expect_lexer_error(io.StringIO('a = "unterminated;'), 4)
+    expect_lexer_error(io.BytesIO(b'x;\n' * 100 + b'#'), 300)
+
+
+def parse_error(tokens, parse=parser.parse) -> str:
+    try:
+        parse(parser.Reader(tokens))
+    except ParserError as e:
+        return str(e)
+
+    assert False, 'no parser error'
+
+
+def test_token_stream():
+    sources = [lexer.load_source_file(i) for i in source_files()]
+    sources.append(TRICKY * 20)
+
+    for code in sources:
+        expected = lexer.lex(code)
+        assert list(lexer.lex_stream(code)) == expected
+        assert list(lexer.lex_stream(code.encode('utf-8'))) == expected
+
+    stream = lexer.lex_stream('main() {\n  x = "a\nb" + 1;\n}')
+    assert [stream.position(i) for i in (0, 4, 6, 7, 10)] == [
+        'line 1, column 1',
+        'line 2, column 3',
+        'line 2, column 7',
+        'line 3, column 4',
+        'line 4, column 1'
+    ]
+
+    code = 'main() {\n  x = 1 +;\n}'
+    assert 'at line 2, column 10 ' in parse_error(lexer.lex_stream(code))
+    assert 'at token 9 ' in parse_error(lexer.lex(code))
+
+    try:
+        lexer.lex_stream('main() {\n  x = 1 & 2;\n}')
+    except LexerError as e:
+        assert 'line 2, column 9:' in str(e), str(e)
+    else:
+        assert False, 'no lexer error'
+
+
+def test_table_parser():
+    with open('source_grammar.cf', 'r') as f:
+        generated = grammar.generate(f.read())
+
+    with open(os.path.join('day2_parser', 'parse_table.py'), 'r') as f:
+        assert f.read() == generated, 'parse_table.py is out of date'
+
+    for path in source_files():
+        code = lexer.load_source_file(path)
+
+        try:
+            expected = str(parser.parse(parser.Reader(lexer.lex(code))))
+        except ParserError:
+            parse_error(lexer.lex(code), parser.parse_table_driven)
+            continue
+
+        ast = parser.parse_table_driven(parser.Reader(lexer.lex(code)))
+        assert str(ast) == expected, path
+
+    # far beyond the recursion limit of the recursive descent parser
+    depth = 20000
+    code = (
+        'main() { x = ' + '(' * depth + '1' + ')' * depth + '; ' +
+        'if (x) { ' * depth + '}' * depth + ' }'
+    )
+    ast = parser.parse_table_driven(parser.Reader(lexer.lex_stream(code)))
+    assert str(ast.func_decl[0].code[0]) == "Assign('x', Literal('1'))"
+
+    error = parse_error(
+        lexer.lex_stream('main() {\n  x = 1 +;\n}'),
+        parser.parse_table_driven
+    )
+    assert 'at line 2, column 10 ' in error, error
+
+
+def left_spine(exp) -> [str]:
+    """
+    The operators and right operands down the left of a chain of BinOps,
+    which is too deep to be compared or printed recursively.
+    """
+
+    spine = []
+    while isinstance(exp, parser.BinOp):
+        spine.append(f'{exp.op} {exp.right}')
+        exp = exp.left
+
+    return spine + [str(exp)]
+
+
+def test_long_operator_chains():
+    terms = 5000
+    code = (
+        'main() { x = ' + ' + '.join(['a'] * terms) + ' * b - 1; ' +
+        ' || '.join(['f(c) < 2'] * terms) + '; }'
+    )
+
+    for parse in (parser.parse, parser.parse_table_driven):
+        ast = parse(parser.Reader(lexer.lex_stream(code)))
+        assign, statement = ast.func_decl[0].code
+
+        spine = left_spine(assign.value)
+        assert len(spine) == terms + 1
+        assert spine[:2] == ["- Literal('1')", "+ *(VarExp('a'), VarExp('b'))"]
+
+        # the innermost operand is a comparison too
+        spine = left_spine(statement.value)
+        assert len(spine) == terms + 1
+        assert spine[0] == "|| <(FuncCall('f', [VarExp('c')]), Literal('2'))"
+
+
+def test_iterative_passes():
+    for path in source_files():
+        code = lexer.load_source_file(path)
+
+        for tail_calls in (True, False):
+            results = []
+            for iterative in (True, False):
+                try:
+                    ast = parser.parse(parser.Reader(lexer.lex_stream(code)))
+
+                    if iterative:
+                        semantics.analysis(ast, tail_calls)
+                        results.append(codegen.generate(ast))
+                    else:
+                        ast.analysis_pass(SemanticContext(tail_calls))
+                        results.append(ast.generate_code(None))
+                except Exception as e:
+                    results.append(repr(e))
+
+            assert results[0] == results[1], path
+
+    # far beyond the recursion limit of the recursive methods
+    depth = 12000
+    code = (
+        'main() { decl x; x = 0; ' +
+        'while (TRUE) { decl y; if (TRUE) { ' * depth +
+        'x = ' + '(' * depth + 'x + 1' + ')' * depth + '; ' +
+        '} else { continue; } break; } ' * depth + 'print(x); }'
+    )
+    ast = parser.parse_table_driven(parser.Reader(lexer.lex_stream(code)))
+    semantics.analysis(ast, True)
+
+    handler = machine.RecordingHandler([])
+    machine.run_code(codegen.generate(ast), handler)
+    assert handler.outputs == ['1'], handler.outputs
+
+
+def test_ast_equality():
+    parse = lambda code: parser.parse_table_driven(
+        parser.Reader(lexer.lex_stream(code))
+    )
+
+    source = 'decl a, b; f() { return g(1); } decl c; g(x) { print(x); }'
+    ast = parse(source)
+
+    # declarations compare regardless of order, statements do not
+    reordered = parse('g(x) { print(x); } decl c; f() { return g(1); } '
+                      'decl b, a;')
+    assert ast == reordered and hash(ast) == hash(reordered)
+    assert ast != parse(source.replace('print(x)', 'print(a)'))
+    assert parse('f() { a; b; }') != parse('f() { b; a; }')
+
+    # usable as keys of structure, e.g. to memoize results by subtree
+    memo = {ast.func_decl[1].code[0]: 'print'}
+    assert memo[parse(source).func_decl[1].code[0]] == 'print'
+
+    # the hash is cached, and forgotten when a node below is rewritten in
+    # place, so that it stays the hash of a fresh parse
+    hashed = hash(ast)
+    statement = ast.func_decl[1].code[0]
+    assert ast._hash == hashed and statement._hash is not None
+
+    statement.value.params[0].name = 'y'
+    assert ast._hash is None and statement._hash is None
+    assert hash(ast) != hashed and ast != reordered
+    source = source.replace('print(x);', 'print(y);')
+    assert hash(ast) == hash(parse(source))
+
+    # also when the list of a field changes in place
+    ast.func_decl[1].code.append(parser.ast.copy_tree(statement))
+    twice = source.replace('print(y);', 'print(y); print(y);')
+    assert hash(ast) == hash(parse(twice))
+    del ast.func_decl[1].code[1:]
+    assert hash(ast) == hash(parse(source))
+    ast.func_decl[1].code = []
+    assert hash(ast) == hash(parse(source.replace('print(y);', '')))
+
+    # no recursion, as for the passes over the tree
+    depth = 12000
+    code = 'main() { return ' + '!(' * depth + '1' + ')' * depth + '; }'
+    assert parse(code) == parse(code)
+    assert parse(code) != parse(code.replace('1', '2'))
+
+
+def test_assembler():
+    for relative, expected in (
+            (False, ['lnon', 'jmp 4', 'lint 1', 'cjmp 2', 'ret']),
+            (True, ['lnon', 'jmp 3', 'lint 1', 'cjmp -1', 'ret'])
+        ):
+        asm = Assembler(relative)
+        loop, end = asm.new_label(), asm.new_label()
+
+        asm.emit('f')
+        asm.start_func()
+        asm.emit('lnon')
+        asm.jump('jmp', end)
+        asm.place(loop)
+        asm.emit('lint 1')
+        asm.jump('cjmp', loop)
+        asm.place(end)
+        asm.emit('ret')
+
+        # the jump forward is patched when its label is placed
+        assert asm.assemble()[1:] == expected, asm.code
+
+    asm = Assembler()
+    asm.jump('jmp', asm.new_label())
+    try:
+        asm.assemble()
+    except ValueError as e:
+        assert 'never placed' in str(e), str(e)
+    else:
+        assert False, 'no error for a label that is never placed'
+
+
+def run_outputs(
+        code: [str],
+        inputs: [str] = (),
+        engine: str = 'decoded'
+    ) -> [str]:
+    handler = machine.RecordingHandler(list(inputs))
+
+    try:
+        machine.run_code(code, handler, engine)
+    except Exception as e:
+        return handler.get_output() + [type(e).__name__]
+
+    return handler.get_output()
+
+
+def test_constant_folding():
+    values = ['0', '7', '-3', 'TRUE', 'FALSE', 'NONE', '"a\\n"', 'x', 'b']
+    exps = [
+        f'{a} {op} {b}' for a in values for b in values
+        for op in ('&&', '||', '+', '-', '*', '/', '<', '==')
+    ] + ['-(2 * 3) / 4', '!(1 < 2) || "s" * 3 == "sss"', '"ab" * 1000']
+
+    # the same outputs and errors as without folding
+    for exp in exps:
+        source = f'''
+            main() {{
+                decl x, b;
+                x = str_to_int(input(""));
+                b = x < 5;
+                print({exp});
+            }}
+        '''
+        code = compile_code(source)
+        folded = compile_code(source, optimize=True)
+
+        for inputs in (['3'], ['0']):
+            assert run_outputs(folded, inputs) == run_outputs(code, inputs), \
+                exp
+
+    source = 'main() { print(-(2 * 3) / 4); print("ab" * 1000); }'
+    code = compile_code(source, optimize=True)
+    assert 'lint -6' not in code and 'lint -2' in code
+    assert 'lstr "ab"' in code
+
+    # the condition of the loop is only 'b < 1000'
+    code = compile_code(
+        lexer.load_source_file(os.path.join(CODE_DIR, 'fibonacci.code')),
+        optimize=True
+    )
+    assert not {'and', 'or', 'lboo 1'} & set(code), code
+
+    code = compile_code('''
+        main() {
+            decl x;
+            x = 1 + 2 * 3;
+            if (2 > 3 && TRUE) { print(1); }
+            if (0) { print(2); } else { print(3); }
+            while (1 > 2) { print(4); }
+            1 + 1;
+            print(x);
+        }
+    ''', optimize=True)
+    assert 'lint 7' in code and code.count('ncall 0') == 2, code
+    assert run_outputs(code) == ['3', '7']
+
+
+def test_common_subexpressions():
+    source = '''
+        decl g;
+        f(x) { g = g + x; return g; }
+        main() {
+            decl a, b, c;
+            a = str_to_int(input("")); b = 4; g = 1;
+            print(a * b + a * b);
+            print((a + b) * (a - b) - (a + b) * (a - b) + (a + b) * (a - b));
+            print(g * 2 + f(1) + g * 2);
+            a = a * b; b = a * b; print(b);
+            if (a * b > 0) { print(a * b); } else { print(b / a); }
+            while (a * b < 1000) { a = a * b; print(a * b); }
+            print(b / a + b / a);
+            if (b > 0) { decl a; a = 1; print(a - b + (a - b)); }
+            print(a - b + (a - b));
+        }
+    '''
+    code = compile_code(source)
+    optimized = compile_code(source, optimize=True)
+
+    # the same outputs and errors, the division by zero included
+    for inputs in (['3'], ['0'], ['-7']):
+        assert run_outputs(optimized, inputs) == run_outputs(code, inputs), \
+            inputs
+
+    # after 'a', 'b', 'c' and the 'a' of the conditional, one hidden local
+    # per repeated operation
+    main = optimized[optimized.index(':f') + 1:]
+    assert main[0] == 'main 0 9', main[0]
+
+    # 'a * b' is computed once for two prints and the assignment to 'a', and
+    # '(a + b) * (a - b)' once for three uses
+    assert main.count('lstore 4') == 1 and main.count('lload 4') == 3
+    assert main.count('lstore 5') == 1 and main.count('lload 5') == 3
+    assert main.count('mul') == code.count('mul') - 4
+
+    # the global is read again after the call
+    assert main.count('gload 0') == 2
+
+    # folding splices the block of the 'if' into the one around it, with
+    # its own 'x'
+    source = '''
+        main() {
+            decl x, a, b;
+            x = 3;
+            if (TRUE) { decl x; x = 5; a = x * 2; }
+            b = x * 2;
+            print(a); print(b);
+        }
+    '''
+    for engine in ('decoded', 'compiled'):
+        assert run_outputs(
+            compile_code(source, optimize=True), [], engine
+        ) == ['10', '6'], engine
+
+
+def test_inlining():
+    source = '''
+        decl g;
+        square(x) { return x * x; }
+        maxi(a, b) { if (a > b) { return a; } return b; }
+        sign(a) {
+            if (a > 0) { return 1; }
+            if (a < 0) { return -1; }
+            return 0;
+        }
+        bump() { g = g + 1; }
+        first(n) { decl y; if (n) { y = 5; } return y; }
+        loop(n) {
+            decl i, s;
+            i = 0; s = 0;
+            while (TRUE) {
+                i = i + 1;
+                if (i > n) { break; }
+                if (i == 2) { continue; }
+                s = s + i;
+                if (s > 20) { return s; }
+            }
+            return s;
+        }
+        fact(n) { if (n < 2) { return 1; } return n * fact(n - 1); }
+        even(n) { if (n == 0) { return TRUE; } return odd(n - 1); }
+        odd(n) { if (n == 0) { return FALSE; } return even(n - 1); }
+        main() {
+            decl i, t;
+            i = str_to_int(input("")); t = 0; g = 0;
+            while (i < 5) {
+                t = t + square(i) + maxi(i, 3) * sign(i - 2);
+                bump();
+                print(first(i - 1));
+                print(loop(i * 3) / (3 - i));
+                i = i + 1;
+            }
+            print(t); print(g); print(fact(6)); print(even(7));
+            print(maxi(sign(-3), square(g)));
+            return maxi(sign(t), 0);
+        }
+    '''
+    code = compile_code(source)
+
+    # the same outputs and errors, with the other optimizations and on the
+    # engines that run it differently
+    for optimize in (False, True):
+        inlined = compile_code(source, optimize=optimize, inline_budget=100)
+
+        for engine in ('decoded', 'compiled'):
+            for inputs in (['0'], ['2'], ['4']):
+                assert run_outputs(inlined, inputs, engine) == \
+                       run_outputs(code, inputs), (optimize, engine, inputs)
+
+    calls = lambda code: {i for i in code if i.startswith(('call', 'tcall'))}
+
+    # only the recursive functions and the calls to 'maxi' and 'sign' that
+    # are not computed first are still called
+    inlined = compile_code(source, inline_budget=100)
+    assert calls(inlined) == {
+        'call maxi', 'call sign', 'call fact', 'call even', 'tcall even',
+        'tcall odd'
+    }, calls(inlined)
+
+    # the functions larger than the budget are called
+    inlined = compile_code(source, inline_budget=10)
+    assert 'call loop' in inlined and 'call square' not in inlined
+    assert compile_code(source, inline_budget=3) == code
+
+    # the returns that end a copy need no jump, so the 'compiled' engine
+    # still translates every function but the recursive ones
+    vm = machine.run_code(
+        compile_code(source, optimize=True, inline_budget=10),
+        machine.RecordingHandler(['5']), 'compiled'
+    )
+    untranslated = [
+        func.name for i, func in enumerate(vm.funcs) if i not in vm.compiled
+    ]
+    assert untranslated == ['fact', 'even', 'odd'], untranslated
+
+
+def test_loop_invariants():
+    source = '''
+        decl g;
+        f(x) { g = g + x; return x; }
+        main() {
+            decl i, n, s, t;
+            n = str_to_int(input("")); s = "ab"; i = 0; t = 0; g = 1;
+            while (i < n * 2 - 1) {
+                t = t + n * 3;
+                if (i == n) { print(s == "ab"); }
+                print(t / (n - 1));
+                i = i + 1;
+            }
+            while (i > 0) {
+                decl k;
+                k = i * g; i = i - 1; t = t + g * 2 + f(k);
+            }
+            while (i < 3) { print(s * n); i = i + 1; }
+            while (i < 0) { print(t / 0); }
+            while (i < 5 && s - 1) { i = i + 1; }
+        }
+    '''
+    code = compile_code(source)
+    optimized = compile_code(source, optimize=True)
+
+    # the same outputs and errors: the division by zero after a print, the
+    # one of a loop that never runs and the error of a condition
+    for engine in ('decoded', 'compiled'):
+        for inputs in (['0'], ['1'], ['3']):
+            assert run_outputs(optimized, inputs, engine) == \
+                   run_outputs(code, inputs), (engine, inputs)
+
+    # after 'i', 'n', 's', 't' and 'k', one hidden local for 'n * 2 - 1',
+    # 'n * 3', 's == "ab"', 's * n', 't / 0', 'i < 0' and 's - 1'
+    main = optimized[optimized.index(':f') + 1:]
+    assert main[0] == 'main 0 12', main[0]
+
+    def occurrences(code: [str], ops: [str]) -> int:
+        return sum(
+            code[i:i + len(ops)] == ops for i in range(len(code))
+        )
+
+    # the condition is copied before the loop, which loads the value
+    bound = ['lload 1', 'lint 2', 'mul', 'lint 1', 'subtract']
+    assert occurrences(main, bound) == 2
+    assert occurrences(main, bound + ['less']) == 1
+
+    # the global is read again after every call
+    assert occurrences(main, ['gload 0', 'lint 2', 'mul']) == 1
+    assert occurrences(main, ['lload 0', 'gload 0', 'mul']) == 1
+
+
+def test_compile_cache():
+    source = lexer.load_source_file(os.path.join(CODE_DIR, 'pyramid.code'))
+    compiled = []
+
+    def counting_compile(code: str, **options) -> [str]:
+        compiled.append(options)
+        return compile_code(code, **options)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CompileCache(tmp)
+
+        cold = cache.compile(source, counting_compile, optimize=False)
+        warm = cache.compile(source, counting_compile, optimize=False)
+        assert cold == warm and len(compiled) == 1
+        assert run_outputs(machine.write_bytecode(warm), ['3']) == \
+            run_outputs(compile_code(source), ['3'])
+
+        # other options or sources are other entries
+        cache.compile(source, counting_compile, optimize=True)
+        cache.compile(source + ' ', counting_compile, optimize=False)
+        assert len(compiled) == 3 and len(os.listdir(tmp)) == 3
+
+        # a corrupted entry is compiled again
+        with open(cache.path(cache.key(source, {'optimize': False})), 'w'):
+            pass
+        cache.compile(source, counting_compile, optimize=False)
+        assert len(compiled) == 4
+
+        # the least recently used entries go first
+        os.utime(cache.path(cache.key(source, {'optimize': True})), (0, 0))
+        cache.max_size = sum(
+            os.path.getsize(os.path.join(tmp, i)) for i in os.listdir(tmp)
+        ) - 1
+        cache.evict()
+        assert not os.path.exists(
+            cache.path(cache.key(source, {'optimize': True}))
+        )
+        assert len(os.listdir(tmp)) == 2
+
+    # the compiler version covers every top level module that 'run.py'
+    # compiles with
+    modules = {
+        os.path.basename(i.__file__) for i in list(sys.modules.values())
+        if getattr(i, '__file__', None) and
+        os.path.dirname(os.path.abspath(i.__file__)) == ROOT
+    }
+    assert {'run.py', 'incremental.py'} <= modules
+    assert {
+        i for i in modules if not i.startswith('test') and i != '__init__.py'
+    } <= set(COMPILER_MODULES)
+
+
+def test_batch_compile():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, 'src', 'nested'))
+        programs = {
+            'a.code': 'main() { print(1); }',
+            'nested/b.code': 'main() { print(2); }',
+            'nested/error.code': 'main() { print(x); }'
+        }
+        for name, code in programs.items():
+            with open(os.path.join(tmp, 'src', name), 'w') as f:
+                f.write(code)
+
+        sources, errors = find_sources([
+            os.path.join(tmp, 'src'), os.path.join(tmp, '*.none')
+        ])
+        assert len(sources) == 3 and len(errors) == 1
+
+        out = os.path.join(tmp, 'out')
+        outputs = output_paths(sources, out)
+        assert outputs[1] == os.path.join(out, 'nested', 'b.byte'), outputs
+
+        # on a pool of processes and in this one
+        for workers in (2, 1):
+            failed = compile_batch(sources, outputs, compile_code, workers)
+            assert [i[0] for i in failed] == [sources[2]], failed
+            assert 'UndeclaredIdentifierError' in failed[0][1]
+
+            with open(outputs[1]) as f:
+                assert f.read().splitlines() == \
+                    compile_code(programs['nested/b.code'])
+
+            assert sorted(os.listdir(os.path.join(out, 'nested'))) == \
+                ['b.byte']
+
+        report = format_report(len(sources), len(failed), errors + failed)
+        assert report[:2] == ['2 of 3 files compiled', '2 errors:'], report
+
+
+def test_incremental_compile():
+    source = """
+decl a, b;
+f(x) { a = a + x; return a; }
+g() { return f(2) + b; }
+main() { a = 0; b = 10; print(g()); print(f(1)); }
+"""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compiler = IncrementalCompiler(os.path.join(tmp, 'state'))
+
+        # from scratch, the same code as a full compilation
+        for optimize in (False, True):
+            assert compiler.compile(source, optimize=optimize) == \
+                compile_code(source, optimize=optimize)
+            assert compiler.recompiled == ['f', 'g', 'main']
+
+        compiler.compile(source, optimize=True)
+        assert compiler.recompiled == []
+
+        edited = source.replace('print(f(1))', 'print(f(5))')
+        code = compiler.compile(edited, optimize=True)
+        assert compiler.recompiled == ['main']
+        assert run_outputs(code, []) == ['12', '7']
+
+        # globals keep their index when declarations move, so that 'f' and
+        # 'g' are not compiled again
+        moved = edited.replace('decl a, b;', 'decl c;\ndecl b, a;')
+        code = compiler.compile(moved, optimize=True)
+        assert compiler.recompiled == [] and code[0] == '3'
+        assert run_outputs(code, []) == ['12', '7']
+
+        # the functions that refer to a changed declaration are checked again
+        for changed in (
+                moved.replace('decl b, a;', 'decl b;'),
+                moved.replace('f(x) {', 'f(x, y) {'),
+                moved + 'f() {}',
+                moved + 'h() {'
+            ):
+            errors = []
+            for compile_source in (compiler.compile, compile_code):
+                try:
+                    compile_source(changed)
+                except Exception as e:
+                    errors.append(f'{type(e).__name__}: {e}')
+
+            assert len(errors) == 2 and errors[0] == errors[1], errors
+
+    # the jumps of 'break' and 'continue' are only threaded where the
+    # 'compiled' engine still translates the function, which depends on the
+    # functions it calls
+    source = """
+decl total;
+h(i) { total = total + i; }
+f(n) {
+    decl i;
+    i = 0;
+    while (TRUE) {
+        i = i + 1;
+        if (i > n) { break; }
+        if (i / 2 * 2 == i) { continue; }
+        h(i);
+    }
+}
+main() { total = 0; f(10); print(total); }
+"""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compiler = IncrementalCompiler(os.path.join(tmp, 'state'))
+        expected = compile_code(source, optimize=True)
+
+        assert compiler.compile(source, optimize=True) == expected
+        assert compiler.compile(source, optimize=True) == expected
+        assert compiler.recompiled == []
+
+        edited = source.replace('f(10)', 'f(9)')
+        assert compiler.compile(edited, optimize=True) == \
+            compile_code(edited, optimize=True)
+        assert compiler.recompiled == ['main']
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'Test Passed: {name}')
+
+    print('ALL TEST PASSED')